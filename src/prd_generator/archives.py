@@ -0,0 +1,203 @@
+"""
+Streaming ZIP archives of the generated documents for /download-all.
+The archive is deflated on a background thread and streamed in chunks as it is
+written, while a copy is saved under a hash of its members' contents so later
+requests for the same documents are served from local disk (or answered with 304).
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+import zipfile
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from prd_generator.storage import DocumentStorage, StoredObject
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+ZIP_CACHE_DIR = Path(os.getenv("PRD_ZIP_CACHE_DIR", "outputs/.archives"))
+ZIP_CACHE_ENTRIES = int(os.getenv("PRD_ZIP_CACHE_ENTRIES", "8"))
+_QUEUE_CHUNKS = 8           # chunks buffered between the compressing thread and the response
+_POLL_SECONDS = 1.0         # how often either side of the queue checks for cancellation
+_DONE = object()
+
+
+class _ChunkSink:
+    """
+    Unseekable file object handed to ZipFile: collects compressed bytes and
+    passes them on in CHUNK_SIZE pieces, to the response and the cache file.
+    """
+
+    def __init__(self, emit, cache_file):
+        self._emit = emit
+        self._cache_file = cache_file
+        self._buffer = bytearray()
+
+    def write(self, data) -> int:
+        self._buffer += data
+        if len(self._buffer) >= CHUNK_SIZE:
+            self.flush()
+        return len(data)
+
+    def flush(self) -> None:
+        if self._buffer:
+            chunk = bytes(self._buffer)
+            self._buffer.clear()
+            if self._cache_file is not None:
+                self._cache_file.write(chunk)
+            self._emit(chunk)
+
+
+class _Cancelled(Exception):
+    """The client went away before the archive was complete."""
+
+
+class ZipArchiver:
+    """
+    Builds, streams and caches ZIP archives of the latest documents in storage.
+    """
+
+    def __init__(self, storage: DocumentStorage, cache_dir: Path = ZIP_CACHE_DIR, max_cached: int = ZIP_CACHE_ENTRIES):
+        """
+        Args:
+            storage: Document storage whose top-level *.md documents are archived
+            cache_dir: Where finished archives are kept, named by their key
+            max_cached: Number of archives kept; the least recently used are removed
+        """
+        self.storage = storage
+        self.cache_dir = Path(cache_dir)
+        self.max_cached = max_cached
+        # (key, size, mtime) -> sha256 of the content, for backends without content hashes
+        self._content_hashes: Dict[Tuple[str, int, float], str] = {}
+        self._lock = threading.Lock()
+
+    def members(self) -> List[StoredObject]:
+        """The documents the archive would contain, in archive order."""
+        return sorted((obj for obj in self.storage.list() if obj.key.endswith(".md")), key=lambda obj: obj.key)
+
+    def _content_hash(self, obj: StoredObject) -> str:
+        if obj.etag:
+            return obj.etag
+        key = (obj.key, obj.size, obj.modified)
+        with self._lock:
+            digest = self._content_hashes.get(key)
+        if digest is None:
+            digest = hashlib.sha256(self.storage.get(obj.key)).hexdigest()
+            with self._lock:
+                self._content_hashes = {k: v for k, v in self._content_hashes.items() if k[0] != obj.key}
+                self._content_hashes[key] = digest
+        return digest
+
+    def archive_key(self, members: List[StoredObject]) -> str:
+        """Hash of the member names and contents; identifies the archive and serves as its ETag."""
+        digest = hashlib.sha256()
+        for obj in members:
+            digest.update(f"{obj.key}\0{self._content_hash(obj)}\n".encode("utf-8"))
+        return digest.hexdigest()[:32]
+
+    def cached_path(self, key: str) -> Optional[Path]:
+        """Path of the finished archive for `key`, if cached."""
+        path = self.cache_dir / f"{key}.zip"
+        if not path.exists():
+            return None
+        path.touch()        # mtime orders the LRU eviction
+        return path
+
+    def _evict(self) -> None:
+        archives = sorted(self.cache_dir.glob("*.zip"), key=lambda path: path.stat().st_mtime, reverse=True)
+        for path in archives[self.max_cached:]:
+            path.unlink(missing_ok=True)
+
+    def _write(self, members: List[StoredObject], key: str, chunks: "queue.Queue", cancelled: threading.Event) -> None:
+        """Deflate the members into `chunks` (runs on a background thread)."""
+        def emit(chunk: bytes) -> None:
+            while True:
+                if cancelled.is_set():
+                    raise _Cancelled()
+                try:
+                    chunks.put(chunk, timeout=_POLL_SECONDS)
+                    return
+                except queue.Full:
+                    continue
+
+        cache_file, tmp_path = None, None
+        try:
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.cache_dir / f"{key}.{threading.get_ident()}.tmp"
+                cache_file = open(tmp_path, "wb")
+            except OSError as e:
+                logger.warning(f"Not caching archive {key}: {e}")
+
+            sink = _ChunkSink(emit, cache_file)
+            with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as archive:
+                for obj in members:
+                    info = zipfile.ZipInfo(obj.key, time.localtime(obj.modified)[:6])
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                    archive.writestr(info, self.storage.get(obj.key))
+            sink.flush()
+
+            if cache_file is not None:
+                cache_file.close()
+                tmp_path.replace(self.cache_dir / f"{key}.zip")
+                cache_file = None
+                self._evict()
+            emit(_DONE)
+        except _Cancelled:
+            pass
+        except Exception as e:
+            logger.exception(f"Failed to build archive {key}")
+            try:
+                emit(e)
+            except _Cancelled:
+                pass
+        finally:
+            if cache_file is not None:
+                cache_file.close()
+                tmp_path.unlink(missing_ok=True)
+
+    async def stream(self, members: List[StoredObject], key: str) -> AsyncIterator[bytes]:
+        """
+        Stream the archive while it is being compressed off the event loop.
+
+        At most a few chunks are buffered between the compressing thread and
+        the client; if the client disconnects, compression stops.
+        """
+        chunks: "queue.Queue" = queue.Queue(maxsize=_QUEUE_CHUNKS)
+        cancelled = threading.Event()
+        writer = threading.Thread(
+            target=self._write, args=(members, key, chunks, cancelled), name=f"zip-{key[:8]}", daemon=True
+        )
+        writer.start()
+        try:
+            while True:
+                chunk = await asyncio.to_thread(self._next_chunk, chunks, cancelled, writer)
+                if chunk is _DONE:
+                    return
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+        finally:
+            cancelled.set()
+
+    @staticmethod
+    def _next_chunk(chunks: "queue.Queue", cancelled: threading.Event, writer: threading.Thread) -> Any:
+        """
+        Wait for the next chunk, checking for cancellation between polls.
+
+        A disconnected client cancels the coroutine awaiting this call but not
+        the executor thread running it, so the thread must be able to return.
+        """
+        while not cancelled.is_set():
+            try:
+                return chunks.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                if not writer.is_alive() and chunks.empty():
+                    return RuntimeError("Archive writer exited without finishing")
+        return _DONE
@@ -0,0 +1,571 @@
+"""
+End-to-end performance benchmarks for the PRD Generator.
+Runs against the local LLM stand-in and records HTTP endpoint latency, per-task
+durations, crew construction time, cold-start time, jobs per minute at rising
+concurrency, full-text search latency at 100k documents, the cost of warm
+starts and tech stack ranking into a JSONL history file. `compare` flags regressions between runs.
+
+Usage:
+    python -m prd_generator.benchmark run [--history benchmarks/history.jsonl]
+    python -m prd_generator.benchmark compare [--threshold 0.1]
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_HISTORY = Path("benchmarks") / "history.jsonl"
+HIGHER_IS_BETTER_SUFFIXES = ("jobs_per_min", "per_second")
+
+BENCH_INPUTS = {
+    "idea_description": "A mobile app for tracking daily habits with social sharing and progress analytics",
+    "pricing_tier": "premium",
+    "selected_technologies": {},
+    "timestamp": "benchmark",
+}
+
+# Vocabulary of the synthetic documents indexed by the search scenario
+SEARCH_TECHNOLOGIES = [
+    "React", "React Native", "Flutter", "Vue", "Angular", "Svelte", "Next.js", "Django", "FastAPI", "Rails",
+    "Express", "Spring", "Supabase", "Firebase", "PostgreSQL", "MySQL", "MongoDB", "Redis", "DynamoDB",
+    "Elasticsearch", "Kafka", "RabbitMQ", "Docker", "Kubernetes", "Terraform", "AWS", "GCP", "Azure",
+    "Vercel", "Netlify", "Stripe", "Auth0", "Clerk", "GraphQL", "tRPC", "Prisma", "SQLite", "Swift", "Kotlin",
+]
+SEARCH_FEATURES = [
+    "offline sync", "push notifications", "social sharing", "progress analytics", "subscription billing",
+    "real-time chat", "role-based access control", "single sign-on", "audit logging", "data export",
+    "dark mode", "multi-tenant workspaces", "recommendation engine", "geolocation search", "calendar integration",
+    "payment processing", "content moderation", "image uploads", "two-factor authentication", "usage dashboards",
+]
+SEARCH_DOMAINS = ["habit", "fitness", "budget", "recipe", "travel", "learning", "marketplace", "clinic", "logistics", "events"]
+SEARCH_FILLER = (
+    "the user can should must will with for and to of in on a an as by this that each when from team product "
+    "requirement scope goal metric success release milestone phase risk assumption dependency stakeholder "
+    "priority backlog story acceptance criteria performance security reliability scalability availability "
+    "latency throughput storage api endpoint service database cache queue worker deployment monitoring "
+    "testing integration documentation onboarding feedback experience interface design mobile web platform "
+    "account profile settings notification report dashboard workflow permission admin customer support"
+).split()
+SEARCH_QUERIES = [
+    "supabase", "offline sync", '"offline sync"', "react native firebase", "analyt*",
+    "stripe OR paddle", "kubernetes NOT docker", "fitness dashboards", "habit tracker supabase offline",
+]
+
+
+def synthetic_documents(count: int, seed: int = 0) -> Iterator[Tuple[str, str, str, str, Optional[str], float]]:
+    """
+    PRD-like documents for the search benchmark, as SearchIndex.index_many tuples.
+
+    Each names a few technologies and features amid Zipf-distributed filler words,
+    so common terms match a large share of the corpus, as in real outputs.
+    """
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, len(SEARCH_FILLER) + 1)]
+    tasks = [("analyze_requirements", "requirements_analysis.md"), ("create_prd_document", "prd_document.md"),
+             ("recommend_tech_stack", "tech_stack_recommendations.md"), ("create_development_guide", "development_guide.md")]
+    for number in range(count):
+        domain = rng.choice(SEARCH_DOMAINS)
+        technologies = rng.sample(SEARCH_TECHNOLOGIES, 4)
+        features = rng.sample(SEARCH_FEATURES, 4)
+        task_name, filename = tasks[number % len(tasks)]
+        lines = [f"# {domain.title()} App {number}: {filename[:-3].replace('_', ' ').title()}", ""]
+        for section in range(6):
+            lines.append(f"## Section {section + 1}")
+            for _ in range(5):
+                words = rng.choices(SEARCH_FILLER, weights, k=rng.randint(12, 24))
+                words.insert(rng.randrange(len(words)), rng.choice(technologies + features))
+                lines.append(" ".join(words).capitalize() + ".")
+            lines.append("")
+        lines.append(f"Recommended stack: {', '.join(technologies)}. Key features: {', '.join(features)}.")
+        yield (
+            f"bench_{number // len(tasks)}", task_name, filename, "\n".join(lines),
+            rng.choice(["basic", "premium"]), 1_700_000_000 + number,
+        )
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Return the q-th percentile (0-100) of values using linear interpolation."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Summarize latency samples (seconds) as p50/p95/p99 in milliseconds."""
+    return {
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).parent
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+class BenchmarkRunner:
+    """
+    Runs the benchmark scenarios and collects a flat metrics dictionary.
+    """
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.metrics: Dict[str, float] = {}
+
+    def _time(self, func: Callable[[], Any], iterations: int) -> List[float]:
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - start)
+        return samples
+
+    def bench_crew_construction(self) -> None:
+        """Time building a PrdGenerator and its full crew."""
+        from prd_generator.crew import PrdGenerator
+
+        samples = self._time(lambda: PrdGenerator().crew(), self.args.construction_iterations)
+        for key, value in summarize(samples).items():
+            self.metrics[f"crew_construction.{key}"] = value
+
+    def bench_tasks(self) -> None:
+        """Run one full generation and record the duration of each task."""
+        from prd_generator.crew import PrdGenerator
+        from prd_generator.generation import GenerationService
+
+        marks: List[tuple] = []
+
+        class TimedGenerator(PrdGenerator):
+            def crew_for(self, task_names, cached_outputs=None, task_callback=None, memory=None):
+                def timed_callback(output):
+                    marks.append((output.name, time.perf_counter()))
+                    if task_callback:
+                        task_callback(output)
+                return super().crew_for(task_names, cached_outputs, timed_callback, memory=memory)
+
+        service = GenerationService(TimedGenerator)
+        start = time.perf_counter()
+        service.generate(dict(BENCH_INPUTS, session_id=f"bench_tasks_{int(time.time())}"))
+        total = time.perf_counter() - start
+
+        previous = start
+        for task_name, finished in marks:
+            self.metrics[f"task.{task_name}.seconds"] = round(finished - previous, 4)
+            previous = finished
+        self.metrics["job.total.seconds"] = round(total, 4)
+
+    def bench_throughput(self) -> None:
+        """Measure jobs per minute at rising concurrency, one crew per job."""
+        from prd_generator.crew import PrdGenerator
+        from prd_generator.generation import GenerationService
+
+        service = GenerationService(PrdGenerator)
+        counter = iter(range(1_000_000))
+        counter_lock = threading.Lock()
+
+        def run_job() -> None:
+            with counter_lock:
+                job_number = next(counter)
+            service.generate(dict(BENCH_INPUTS, session_id=f"bench_job_{job_number}"))
+
+        for concurrency in self.args.concurrency:
+            jobs = max(concurrency * self.args.jobs_per_worker, 1)
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                list(pool.map(lambda _: run_job(), range(jobs)))
+            elapsed = time.perf_counter() - start
+            self.metrics[f"throughput.c{concurrency}.jobs_per_min"] = round(jobs / elapsed * 60, 3)
+
+    def bench_startup(self, port: int) -> None:
+        """Measure cold start: importing the web app, then time until /live and /ready answer 200."""
+        import httpx
+
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+            filter(None, [str(Path(__file__).resolve().parents[1]), os.environ.get("PYTHONPATH")])
+        ))
+
+        import_samples = []
+        for _ in range(self.args.startup_iterations):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", "import prd_generator.main"], env=env, capture_output=True, check=True)
+            import_samples.append(time.perf_counter() - start)
+
+        # Largest imports of the web app, from the interpreter's own import timer
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import prd_generator.main"], env=env, capture_output=True, text=True
+        )
+        imports = []
+        for line in result.stderr.splitlines():
+            parts = line.removeprefix("import time:").split("|")
+            # Nested imports are indented below the module that triggered them
+            if len(parts) == 3 and parts[1].strip().isdigit() and not parts[2][1:].startswith(" "):
+                imports.append((int(parts[1]) / 1e6, parts[2].strip()))
+        for seconds, module in sorted(imports, reverse=True)[:8]:
+            print(f"    import {module}: {seconds:.3f}s")
+
+        live_samples, ready_samples = [], []
+        for _ in range(self.args.startup_iterations):
+            start = time.perf_counter()
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "prd_generator.main:app", "--port", str(port), "--log-level", "warning"],
+                env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            marks: Dict[str, float] = {}
+            try:
+                while len(marks) < 2 and server.poll() is None:
+                    for path in ("/live", "/ready"):
+                        if path in marks:
+                            continue
+                        try:
+                            if httpx.get(f"http://127.0.0.1:{port}{path}", timeout=1).status_code == 200:
+                                marks[path] = time.perf_counter() - start
+                        except httpx.HTTPError:
+                            pass
+                    time.sleep(0.02)
+            finally:
+                server.terminate()
+                server.wait(timeout=60)
+            live_samples.append(marks.get("/live", float("nan")))
+            ready_samples.append(marks.get("/ready", float("nan")))
+
+        self.metrics["startup.import_main.seconds"] = round(percentile(import_samples, 50), 3)
+        self.metrics["startup.live.seconds"] = round(percentile(live_samples, 50), 3)
+        self.metrics["startup.ready.seconds"] = round(percentile(ready_samples, 50), 3)
+
+    def bench_search(self) -> None:
+        """Index synthetic documents and measure /search query latency, unfiltered and filtered."""
+        from prd_generator.search import SearchIndex
+
+        index = SearchIndex(Path(tempfile.mkdtemp(prefix="prd_search_")) / "search.db")
+        start = time.perf_counter()
+        documents = synthetic_documents(self.args.search_documents)
+        while index.index_many(islice(documents, 5000)):     # one transaction per 5000 documents
+            pass
+        build_seconds = time.perf_counter() - start
+        self.metrics["search.index.docs_per_second"] = round(self.args.search_documents / build_seconds, 1)
+        self.metrics["search.index.mb"] = round(index.path.stat().st_size / 2**20, 1)
+
+        cases = {
+            "search": [dict(query=query) for query in SEARCH_QUERIES],
+            "search_tier": [dict(query=query, pricing_tier="premium") for query in SEARCH_QUERIES],
+            "search_session": [dict(query=query, session_id="bench_42") for query in SEARCH_QUERIES],
+        }
+        for name, queries in cases.items():
+            for kwargs in queries:  # warm the page cache
+                index.search(**kwargs)
+            samples = [
+                sample for kwargs in queries
+                for sample in self._time(lambda: index.search(**kwargs), self.args.search_iterations)
+            ]
+            for key, value in summarize(samples).items():
+                self.metrics[f"{name}.{key}"] = value
+        worst = max(self.metrics[f"{name}.p99_ms"] for name in cases)
+        verdict = "within" if worst < 10 else "over"
+        print(f"    search p99 at {self.args.search_documents} documents: {worst:.2f}ms ({verdict} the 10ms budget)")
+
+    def bench_warm_start(self) -> None:
+        """
+        Measure warm-start lookups in a populated index, and the LLM calls and
+        tokens of the warm-startable tasks for an idea run cold, then warm.
+        """
+        from prd_generator.crew import PrdGenerator
+        from prd_generator.generation import GenerationService
+        from prd_generator.runner import JobRequest, execute_job
+        from prd_generator.sessions import SessionStore
+        from prd_generator.warm_start import CONTEXT_INPUTS, WarmStartIndex
+
+        directory = Path(tempfile.mkdtemp(prefix="prd_warm_start_"))
+        index = WarmStartIndex(directory / "lookups.db")
+        rng = random.Random(0)
+        for number in range(self.args.warm_start_entries):
+            idea = f"A {rng.choice(SEARCH_DOMAINS)} app with " + ", ".join(rng.sample(SEARCH_FEATURES, 3))
+            for task_name in CONTEXT_INPUTS:
+                output = "\n".join(f"- {technology}" for technology in rng.sample(SEARCH_TECHNOLOGIES, 6))
+                index.add(f"bench_{number}", task_name, idea, output, BENCH_INPUTS["pricing_tier"])
+        index.context(BENCH_INPUTS, CONTEXT_INPUTS)     # load the vectors
+        samples = self._time(lambda: index.context(BENCH_INPUTS, CONTEXT_INPUTS), self.args.search_iterations)
+        for key, value in summarize(samples).items():
+            self.metrics[f"warm_start.lookup.{key}"] = value
+
+        # The second run of the same idea finds the first one's outputs
+        store = SessionStore(directory / "sessions", warm_start=WarmStartIndex(directory / "runs.db"))
+        service = GenerationService(PrdGenerator, session_store=store)
+        for run in ("cold", "warm"):
+            outcome = execute_job(JobRequest(
+                job_id=f"bench_warm_start_{run}",
+                inputs=dict(BENCH_INPUTS, session_id=f"bench_warm_start_{run}"),
+                documents=["technology_stack_recommendations.md"],
+            ), service)
+            for task_name in CONTEXT_INPUTS:
+                usage = outcome["usage"]["by_task"].get(task_name, {})
+                for key in ("calls", "prompt_tokens", "completion_tokens"):
+                    self.metrics[f"warm_start.{run}.{task_name}.{key}"] = usage.get(key, 0)
+        # The stand-in's canned outputs do not depend on the prompt, so only the
+        # prompt overhead shows here; /usage compares real runs by how they ran
+        added = sum(
+            self.metrics[f"warm_start.warm.{task_name}.prompt_tokens"] - self.metrics[f"warm_start.cold.{task_name}.prompt_tokens"]
+            for task_name in CONTEXT_INPUTS
+        )
+        print(f"    warm start context added {added} prompt tokens")
+
+    def bench_tech_catalog(self) -> None:
+        """Measure loading the technology catalog and ranking stacks, uncached and memoized."""
+        from prd_generator.tech_catalog import PLATFORMS, SCALES, TechCatalog
+        from prd_generator.tools.prd_tools import TechStackAdvisor
+
+        start = time.perf_counter()
+        catalog = TechCatalog.from_file()
+        self.metrics["tech_catalog.load_ms"] = round((time.perf_counter() - start) * 1000, 3)
+
+        selections = [{}, {"database": "supabase", "hosting": "railway"}, {"backend": "python", "devtools": "combined"}]
+        queries = [
+            (platform, scale, tier, selected)
+            for platform in PLATFORMS for scale in SCALES for tier in ("free", "premium") for selected in selections
+        ]
+        cases = {
+            # Bypasses the memo; platforms and scales are already normalized
+            "tech_catalog.rank": lambda query: catalog._rank(
+                query[0], query[1], query[2] == "free", tuple(sorted(query[3].values()))
+            ),
+            "tech_catalog.memoized": lambda query: catalog.recommend(*query),
+        }
+        for name, rank in cases.items():
+            samples = [
+                sample for query in queries
+                for sample in self._time(lambda: rank(query), self.args.catalog_iterations)
+            ]
+            for key, value in summarize(samples).items():
+                self.metrics[f"{name}.{key}"] = value
+
+        advisor = TechStackAdvisor()
+        samples = self._time(lambda: advisor._run("web", {"pricing_tier": "premium"}, "large"), self.args.catalog_iterations)
+        for key, value in summarize(samples).items():
+            self.metrics[f"tech_catalog.advisor.{key}"] = value
+        print(f"    ranked {len(queries)} queries: {self.metrics['tech_catalog.rank.p50_ms']:.3f}ms uncached, "
+              f"{self.metrics['tech_catalog.memoized.p50_ms']:.4f}ms memoized (p50)")
+
+    def bench_http(self, port: int) -> None:
+        """Measure latency of every HTTP endpoint of the web service."""
+        import httpx
+        import uvicorn
+
+        server = uvicorn.Server(uvicorn.Config("prd_generator.main:app", host="127.0.0.1", port=port, log_level="warning"))
+        thread = threading.Thread(target=server.run, name="bench-http", daemon=True)
+        thread.start()
+        while not server.started and thread.is_alive():
+            time.sleep(0.05)
+
+        try:
+            with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=600) as client:
+                generate_body = dict(BENCH_INPUTS, session_id=f"bench_http_{int(time.time())}")
+                generate_samples = self._time(
+                    lambda: client.post("/generate-prd", json=generate_body).raise_for_status(),
+                    self.args.generate_iterations,
+                )
+                filename = client.get("/files").json()["files"][0]["filename"]
+
+                endpoints = {
+                    "GET /health": lambda: client.get("/health"),
+                    "GET /": lambda: client.get("/"),
+                    "GET /files": lambda: client.get("/files"),
+                    "GET /download/{filename}": lambda: client.get(f"/download/{filename}"),
+                    "GET /copy/{filename}": lambda: client.get(f"/copy/{filename}"),
+                    "GET /download-all": lambda: client.get("/download-all"),
+                }
+                for name, request in endpoints.items():
+                    samples = self._time(lambda: request().raise_for_status(), self.args.http_iterations)
+                    for key, value in summarize(samples).items():
+                        self.metrics[f"http.{name}.{key}"] = value
+                for key, value in summarize(generate_samples).items():
+                    self.metrics[f"http.POST /generate-prd.{key}"] = value
+        finally:
+            server.should_exit = True
+            thread.join(timeout=10)
+
+
+def run_benchmarks(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run all scenarios against the stand-in and append the result to the history file."""
+    history_path = Path(args.history).resolve()
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="prd_bench_")).resolve()
+    workdir.mkdir(parents=True, exist_ok=True)
+
+    os.environ.update({
+        "OPENAI_API_KEY": "standin",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{args.standin_port}/v1",
+        "OTEL_SDK_DISABLED": "true",
+        "CREWAI_DISABLE_TELEMETRY": "true",
+    })
+    # main.py and the crew write to ./outputs, so keep benchmark artifacts out of the repo
+    os.chdir(workdir)
+
+    from prd_generator.llm_standin import StandinConfig, serve_in_thread
+
+    standin_config = StandinConfig(
+        ttft=args.ttft,
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens,
+        seed=0,
+    )
+    standin, _ = serve_in_thread(standin_config, port=args.standin_port)
+
+    runner = BenchmarkRunner(args)
+    scenarios = {
+        "construction": runner.bench_crew_construction,
+        "tasks": runner.bench_tasks,
+        "throughput": runner.bench_throughput,
+        "http": lambda: runner.bench_http(args.http_port),
+        "startup": lambda: runner.bench_startup(args.startup_port),
+        "search": runner.bench_search,
+        "warm_start": runner.bench_warm_start,
+        "tech_catalog": runner.bench_tech_catalog,
+    }
+    try:
+        for name in args.scenarios:
+            print(f"⏱️  Running benchmark scenario: {name}")
+            scenarios[name]()
+    finally:
+        standin.should_exit = True
+
+    record = {
+        "timestamp": datetime.now().isoformat(),
+        "commit": _git_commit(),
+        "config": {
+            "ttft": args.ttft,
+            "tokens_per_second": args.tokens_per_second,
+            "output_tokens": args.output_tokens,
+            "scenarios": args.scenarios,
+        },
+        "metrics": runner.metrics,
+    }
+    history_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(history_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+    for key, value in sorted(runner.metrics.items()):
+        print(f"  {key}: {value}")
+    print(f"📈 Results appended to {history_path}")
+    return record
+
+
+def load_history(path: Path) -> List[Dict[str, Any]]:
+    """Load all benchmark records from a JSONL history file."""
+    if not Path(path).exists():
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare_records(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """
+    Compare two benchmark records metric by metric.
+
+    Args:
+        baseline: Earlier record
+        current: Record to check
+        threshold: Relative change beyond which a worse value is a regression (0.1 = 10%)
+
+    Returns:
+        One entry per shared metric with the relative change and a regression flag
+    """
+    rows = []
+    for key in sorted(set(baseline["metrics"]) & set(current["metrics"])):
+        before, after = baseline["metrics"][key], current["metrics"][key]
+        change = (after - before) / before if before else 0.0
+        higher_is_better = key.endswith(HIGHER_IS_BETTER_SUFFIXES)
+        worse = -change if higher_is_better else change
+        rows.append({
+            "metric": key,
+            "baseline": before,
+            "current": after,
+            "change": round(change, 4),
+            "regression": worse > threshold,
+        })
+    return rows
+
+
+def compare_history(args: argparse.Namespace) -> int:
+    """Compare the latest run with a baseline run; returns a non-zero exit code on regression."""
+    history = load_history(Path(args.history))
+    if len(history) < 2:
+        print(f"Need at least two runs in {args.history} to compare (found {len(history)})")
+        return 0
+
+    current = history[-1]
+    baseline = history[args.baseline]
+    rows = compare_records(baseline, current, args.threshold)
+    regressions = [row for row in rows if row["regression"]]
+
+    print(f"Comparing {current.get('commit')} ({current['timestamp']}) against "
+          f"{baseline.get('commit')} ({baseline['timestamp']}), threshold {args.threshold:.0%}")
+    for row in rows:
+        flag = "❌ REGRESSION" if row["regression"] else "✅"
+        print(f"  {flag} {row['metric']}: {row['baseline']} -> {row['current']} ({row['change']:+.1%})")
+
+    if args.json:
+        print(json.dumps({"regressions": regressions, "compared": len(rows)}))
+    return 1 if regressions else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Benchmark command line entry point."""
+    parser = argparse.ArgumentParser(description="PRD Generator performance benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run benchmarks and append results to the history file")
+    run_parser.add_argument("--history", default=str(DEFAULT_HISTORY))
+    run_parser.add_argument("--workdir", help="Working directory for generated outputs (temporary if omitted)")
+    run_parser.add_argument("--scenarios", nargs="+", default=["construction", "tasks", "throughput", "http", "startup"],
+                            choices=["construction", "tasks", "throughput", "http", "startup", "search", "warm_start", "tech_catalog"])
+    run_parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 2, 4])
+    run_parser.add_argument("--jobs-per-worker", type=int, default=2)
+    run_parser.add_argument("--construction-iterations", type=int, default=5)
+    run_parser.add_argument("--http-iterations", type=int, default=50)
+    run_parser.add_argument("--generate-iterations", type=int, default=2)
+    run_parser.add_argument("--ttft", type=float, default=0.05)
+    run_parser.add_argument("--tokens-per-second", type=float, default=2000.0)
+    run_parser.add_argument("--output-tokens", type=int, default=300)
+    run_parser.add_argument("--standin-port", type=int, default=8011)
+    run_parser.add_argument("--http-port", type=int, default=8012)
+    run_parser.add_argument("--startup-iterations", type=int, default=3)
+    run_parser.add_argument("--startup-port", type=int, default=8013)
+    run_parser.add_argument("--search-documents", type=int, default=100_000)
+    run_parser.add_argument("--search-iterations", type=int, default=20)
+    run_parser.add_argument("--warm-start-entries", type=int, default=10_000)
+    run_parser.add_argument("--catalog-iterations", type=int, default=200)
+
+    compare_parser = subparsers.add_parser("compare", help="Flag regressions between benchmark runs")
+    compare_parser.add_argument("--history", default=str(DEFAULT_HISTORY))
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="Relative regression threshold")
+    compare_parser.add_argument("--baseline", type=int, default=-2, help="Index of the baseline run in the history")
+    compare_parser.add_argument("--json", action="store_true", help="Also print regressions as JSON")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        run_benchmarks(args)
+        return 0
+    return compare_history(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
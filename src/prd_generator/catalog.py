@@ -0,0 +1,402 @@
+"""
+SQLite catalog of generated documents.
+Every document a session stores is recorded with its task, size, hash, pricing
+tier and timestamps when it is written, so /files is an indexed query with
+session filters and cursor pagination instead of a scan of the outputs tree.
+"""
+
+import base64
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set
+
+if TYPE_CHECKING:
+    from prd_generator.sessions import SessionStore
+    from prd_generator.task_graph import TaskGraph
+
+logger = logging.getLogger(__name__)
+
+CATALOG_PATH = Path(os.getenv("PRD_CATALOG_PATH", "outputs/catalog.db"))
+MAX_PAGE_SIZE = 500
+# Reads of a session refresh its last access at most this often
+TOUCH_INTERVAL = 60.0
+
+# Columns /files can sort by; every listing is ordered by (column, session_id, task_name)
+SORT_COLUMNS = ("updated", "created", "size", "filename", "session_id")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    session_id TEXT NOT NULL,
+    task_name TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    pricing_tier TEXT,
+    source_session TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (session_id, task_name)
+);
+CREATE INDEX IF NOT EXISTS documents_updated ON documents (updated, session_id, task_name);
+CREATE INDEX IF NOT EXISTS documents_created ON documents (created, session_id, task_name);
+CREATE INDEX IF NOT EXISTS documents_size ON documents (size, session_id, task_name);
+CREATE INDEX IF NOT EXISTS documents_filename ON documents (filename, session_id, task_name);
+CREATE INDEX IF NOT EXISTS documents_tier ON documents (pricing_tier, updated);
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    last_access REAL NOT NULL,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    measured REAL,
+    evicted REAL,
+    evicted_reason TEXT
+);
+CREATE INDEX IF NOT EXISTS sessions_access ON sessions (evicted, last_access);
+CREATE INDEX IF NOT EXISTS sessions_bytes ON sessions (evicted, bytes);
+CREATE INDEX IF NOT EXISTS sessions_measured ON sessions (evicted, measured);
+"""
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded or was made for another sort."""
+
+
+def _encode_cursor(sort: str, order: str, row: sqlite3.Row) -> str:
+    payload = json.dumps([sort, order, row[sort], row["session_id"], row["task_name"]])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str, sort: str, order: str) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, cursor_order, *position = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor!r}") from e
+    if (cursor_sort, cursor_order) != (sort, order) or len(position) != 3:
+        raise InvalidCursorError("Cursor was issued for a different sort order")
+    return position
+
+
+class DocumentCatalog:
+    """
+    Document metadata in a SQLite database shared by the API and worker processes.
+    """
+
+    def __init__(self, path: Path = CATALOG_PATH):
+        self.path = Path(path)
+        self._local = threading.local()
+        self._touched: Dict[str, float] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        """Connection of the calling thread, created (with the schema) on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            # WAL lets readers run while a worker process records a document
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def record(
+        self,
+        session_id: str,
+        task_name: str,
+        filename: str,
+        path: Path,
+        size: int,
+        output_hash: str,
+        pricing_tier: Optional[str] = None,
+        source_session: Optional[str] = None,
+        updated: Optional[float] = None,
+    ) -> None:
+        """
+        Insert or update the document a session task wrote.
+
+        Failures are logged rather than raised: the document itself is already
+        stored, and the catalog can be rebuilt from the session manifests.
+        """
+        updated = updated or time.time()
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    """
+                    INSERT INTO documents (session_id, task_name, filename, path, size, hash, pricing_tier,
+                                           source_session, created, updated)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (session_id, task_name) DO UPDATE SET
+                        filename = excluded.filename, path = excluded.path, size = excluded.size,
+                        hash = excluded.hash, pricing_tier = excluded.pricing_tier,
+                        source_session = excluded.source_session, updated = excluded.updated
+                    """,
+                    (session_id, task_name, filename, str(path), size, output_hash, pricing_tier,
+                     source_session, updated, updated),
+                )
+                # A write is an access, and brings an evicted session id back to life
+                conn.execute(
+                    """
+                    INSERT INTO sessions (session_id, last_access, bytes)
+                    SELECT ?, ?, SUM(size) FROM documents WHERE session_id = ?
+                    ON CONFLICT (session_id) DO UPDATE SET
+                        last_access = MAX(last_access, excluded.last_access),
+                        bytes = MAX(bytes, excluded.bytes), evicted = NULL, evicted_reason = NULL
+                    """,
+                    (session_id, updated, session_id),
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to catalog {filename} of session {session_id}: {e}")
+
+    def get(self, session_id: str, filename: str) -> Optional[Dict[str, Any]]:
+        """Return the catalog entry of a session's document, if any."""
+        row = self._connect().execute(
+            "SELECT * FROM documents WHERE session_id = ? AND filename = ?", (session_id, filename)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def list(
+        self,
+        session_id: Optional[str] = None,
+        pricing_tier: Optional[str] = None,
+        sort: str = "updated",
+        order: str = "desc",
+        limit: int = 50,
+        cursor: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        List documents, one page at a time.
+
+        Args:
+            session_id: Only documents of this session
+            pricing_tier: Only documents generated in this pricing tier
+            sort: One of SORT_COLUMNS
+            order: "asc" or "desc"
+            limit: Page size (at most MAX_PAGE_SIZE)
+            cursor: `next_cursor` of the previous page
+
+        Returns:
+            Dict with the page's documents, the total matching count and the
+            cursor of the next page (None on the last page)
+
+        Raises:
+            ValueError: For an unknown sort column or order
+            InvalidCursorError: For a cursor that does not belong to this sort
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Unknown sort '{sort}'. Available: {list(SORT_COLUMNS)}")
+        if order not in ("asc", "desc"):
+            raise ValueError(f"Unknown order '{order}'. Use 'asc' or 'desc'")
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        filters, params = [], []
+        if session_id is not None:
+            filters.append("session_id = ?")
+            params.append(session_id)
+        if pricing_tier is not None:
+            filters.append("pricing_tier = ?")
+            params.append(pricing_tier)
+        count_where = f"WHERE {' AND '.join(filters)}" if filters else ""
+        count_params = list(params)
+
+        # Keyset pagination: continue strictly after the last row of the previous page
+        if cursor:
+            comparison = "<" if order == "desc" else ">"
+            filters.append(f"({sort}, session_id, task_name) {comparison} (?, ?, ?)")
+            params.extend(_decode_cursor(cursor, sort, order))
+        where = f"WHERE {' AND '.join(filters)}" if filters else ""
+        direction = order.upper()
+
+        conn = self._connect()
+        rows = conn.execute(
+            f"SELECT * FROM documents {where} "
+            f"ORDER BY {sort} {direction}, session_id {direction}, task_name {direction} LIMIT ?",
+            params + [limit + 1],
+        ).fetchall()
+        total = conn.execute(f"SELECT COUNT(*) FROM documents {count_where}", count_params).fetchone()[0]
+
+        page = rows[:limit]
+        return {
+            "documents": [dict(row) for row in page],
+            "total": total,
+            "next_cursor": _encode_cursor(sort, order, page[-1]) if len(rows) > limit else None,
+        }
+
+    def is_empty(self) -> bool:
+        return self._connect().execute("SELECT 1 FROM documents LIMIT 1").fetchone() is None
+
+    def backfill(self, session_store: "SessionStore", task_graph: "TaskGraph") -> int:
+        """
+        Catalog the documents of sessions stored before the catalog existed.
+
+        Returns:
+            Number of documents recorded
+        """
+        recorded = 0
+        if not session_store.root.exists():
+            return recorded
+        for session_dir in sorted(session_store.root.iterdir()):
+            try:
+                manifest = session_store.load_manifest(session_dir.name)
+            except (ValueError, OSError):
+                continue
+            pricing_tier = manifest.get("inputs", {}).get("pricing_tier")
+            for task_name, task_record in manifest.get("tasks", {}).items():
+                path = session_dir / f"{task_name}.md"
+                if not path.exists():
+                    continue
+                stat = path.stat()
+                self.record(
+                    session_dir.name, task_name, task_graph.document_for_task(task_name) or path.name, path,
+                    stat.st_size, task_record.get("output_hash") or "", pricing_tier,
+                    task_record.get("source_session"), stat.st_mtime,
+                )
+                recorded += 1
+        return recorded
+
+    # Session retention (see retention.py)
+
+    def touch(self, session_id: str, now: Optional[float] = None) -> None:
+        """Record a read of the session, at most once per TOUCH_INTERVAL."""
+        now = now or time.time()
+        if now - self._touched.get(session_id, 0.0) < TOUCH_INTERVAL:
+            return
+        if len(self._touched) > 10000:
+            self._touched.clear()
+        self._touched[session_id] = now
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "UPDATE sessions SET last_access = ? WHERE session_id = ? AND evicted IS NULL AND last_access < ?",
+                    (now, session_id, now),
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to record access to session {session_id}: {e}")
+
+    def eviction(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Return when and why the session was evicted, or None if it was not."""
+        row = self._connect().execute(
+            "SELECT evicted, evicted_reason FROM sessions WHERE session_id = ? AND evicted IS NOT NULL", (session_id,)
+        ).fetchone()
+        return {"evicted": row["evicted"], "reason": row["evicted_reason"]} if row else None
+
+    def register_sessions(self, sessions: Dict[str, float]) -> int:
+        """
+        Track sessions the catalog has not seen yet, e.g. ones with no documents.
+
+        Args:
+            sessions: Session id -> time of its last activity
+
+        Returns:
+            Number of sessions added
+        """
+        conn = self._connect()
+        with conn:
+            before = conn.total_changes
+            conn.execute(
+                """
+                INSERT OR IGNORE INTO sessions (session_id, last_access, bytes)
+                SELECT session_id, MAX(updated), SUM(size) FROM documents GROUP BY session_id
+                """
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO sessions (session_id, last_access) VALUES (?, ?)", sessions.items()
+            )
+            return conn.total_changes - before
+
+    def known_sessions(self) -> Set[str]:
+        """Ids of every tracked session, evicted or not."""
+        return {row[0] for row in self._connect().execute("SELECT session_id FROM sessions")}
+
+    def sessions_to_measure(self, limit: int) -> List[str]:
+        """Retained sessions whose size was measured longest ago (never measured first)."""
+        rows = self._connect().execute(
+            "SELECT session_id FROM sessions WHERE evicted IS NULL ORDER BY measured IS NOT NULL, measured LIMIT ?",
+            (limit,),
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def set_session_bytes(self, session_id: str, size: int, measured: Optional[float] = None) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "UPDATE sessions SET bytes = ?, measured = ? WHERE session_id = ? AND evicted IS NULL",
+                (size, measured or time.time(), session_id),
+            )
+
+    def retained_sessions(
+        self,
+        limit: int,
+        idle_before: Optional[float] = None,
+        larger_than: Optional[int] = None,
+        exclude: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Retained sessions, least recently accessed first.
+
+        Args:
+            limit: Maximum number of sessions
+            idle_before: Only sessions last accessed before this time
+            larger_than: Only sessions of more than this many bytes
+            exclude: Session ids to leave out
+        """
+        filters, params = ["evicted IS NULL"], []
+        if idle_before is not None:
+            filters.append("last_access < ?")
+            params.append(idle_before)
+        if larger_than is not None:
+            filters.append("bytes > ?")
+            params.append(larger_than)
+        if exclude:
+            filters.append(f"session_id NOT IN ({', '.join('?' * len(exclude))})")
+            params.extend(exclude)
+        rows = self._connect().execute(
+            f"SELECT session_id, last_access, bytes FROM sessions WHERE {' AND '.join(filters)} "
+            "ORDER BY last_access LIMIT ?",
+            params + [limit],
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def retained_totals(self) -> Dict[str, int]:
+        row = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM sessions WHERE evicted IS NULL"
+        ).fetchone()
+        return {"sessions": row[0], "bytes": row[1]}
+
+    def mark_evicted(self, session_id: str, reason: str, now: Optional[float] = None) -> List[str]:
+        """
+        Tombstone a session and drop its documents from the catalog.
+
+        Returns:
+            Task names of the documents the session had
+        """
+        conn = self._connect()
+        with conn:
+            tasks = [row[0] for row in conn.execute(
+                "SELECT task_name FROM documents WHERE session_id = ?", (session_id,)
+            )]
+            conn.execute("DELETE FROM documents WHERE session_id = ?", (session_id,))
+            conn.execute(
+                """
+                INSERT INTO sessions (session_id, last_access, bytes, evicted, evicted_reason) VALUES (?, ?, 0, ?, ?)
+                ON CONFLICT (session_id) DO UPDATE SET
+                    bytes = 0, evicted = excluded.evicted, evicted_reason = excluded.evicted_reason
+                """,
+                (session_id, now or time.time(), now or time.time(), reason),
+            )
+        self._touched.pop(session_id, None)
+        return tasks
+
+    def forget_evicted(self, before: float) -> int:
+        """Drop tombstones of sessions evicted before `before`; returns how many."""
+        conn = self._connect()
+        with conn:
+            return conn.execute("DELETE FROM sessions WHERE evicted < ?", (before,)).rowcount
@@ -0,0 +1,342 @@
+"""
+Content-addressed, compressed document storage.
+Wraps a storage backend so each distinct document body is stored once, as a
+blob named by its SHA-256 and compressed with zstd (or zlib) using a shared
+dictionary trained on earlier outputs; keys become small refs to blobs, so the
+boilerplate repeated across sessions' guides is stored once and compressed.
+That holds for what is written through this layer: documents already in the
+inner store as plain objects (written before compression was enabled, or the
+session files of a local store) stay as they are, and scans count them.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from collections import Counter, deque
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Set
+
+from prd_generator import metrics
+from prd_generator.storage import DocumentNotFoundError, DocumentStorage, StoredObject, check_key
+
+try:
+    import zstandard
+except ImportError:     # zlib with a preset dictionary instead
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+STORAGE_COMPRESSION = os.getenv("PRD_STORAGE_COMPRESSION", "auto")     # auto, zstd, zlib or none
+DICT_SIZE = int(os.getenv("PRD_STORAGE_DICT_KB", "64")) * 1024
+DICT_TRAIN_SAMPLES = int(os.getenv("PRD_STORAGE_DICT_SAMPLES", "32"))  # documents seen before training
+
+_PREFIX = "cas/"
+_NO_DICT = "0" * 16
+_LATENCY_SAMPLES = 1000
+
+
+def default_codec() -> str:
+    return "zstd" if zstandard is not None else "zlib"
+
+
+def build_zlib_dictionary(samples: List[bytes], size: int = 32 * 1024) -> bytes:
+    """
+    Preset dictionary of the lines shared by several samples, most frequent last.
+
+    zlib can only reference the last 32KB of a dictionary and codes nearer
+    matches more cheaply, so the most common lines go at the end.
+    """
+    counts = Counter(line for sample in samples for line in set(sample.splitlines(keepends=True)) if len(line) > 8)
+    chosen: List[bytes] = []
+    total = 0
+    for line, count in counts.most_common():
+        if count < 2:
+            break
+        if total + len(line) > size:
+            continue
+        chosen.append(line)
+        total += len(line)
+    return b"".join(reversed(chosen))
+
+
+class ContentAddressedStorage(DocumentStorage):
+    """
+    Dedup and compression layer over another DocumentStorage.
+
+    Layout in the inner store: `cas/refs/<key>` (JSON pointing at a blob),
+    `cas/blobs/<sha256[:2]>/<sha256>` (codec byte, dictionary id, compressed body) and
+    `cas/dicts/<id>` plus `cas/dicts/current`. Keys written before compression
+    was enabled are still read from the inner store as plain objects.
+    """
+
+    def __init__(self, inner: DocumentStorage, codec: str = STORAGE_COMPRESSION):
+        """
+        Args:
+            inner: Backend holding refs, blobs and dictionaries
+            codec: "zstd", "zlib" or "auto" (zstd if the zstandard package is installed)
+        """
+        if codec == "auto":
+            codec = default_codec()
+        if codec == "zstd" and zstandard is None:
+            raise ValueError("zstd compression needs the zstandard package")
+        if codec not in ("zstd", "zlib"):
+            raise ValueError(f"Unknown compression '{codec}'. Use zstd, zlib, auto or none")
+        self.inner = inner
+        self.codec = codec
+        self.name = f"{inner.name}+{codec}"
+        self._dicts: Dict[str, bytes] = {}
+        self._current_dict: Optional[str] = None
+        self._dict_checked = False
+        self._samples: Deque[bytes] = deque(maxlen=DICT_TRAIN_SAMPLES * 2)
+        self._new_blobs = 0
+        self._train_after = DICT_TRAIN_SAMPLES
+        self._gc_candidates: Set[str] = set()
+        self._read_latencies: Deque[float] = deque(maxlen=_LATENCY_SAMPLES)
+        self._lock = threading.Lock()
+        self.counters = {"writes": 0, "deduplicated": 0, "logical_bytes": 0, "stored_bytes": 0}
+
+    # Dictionaries
+
+    def _dictionary(self, dict_id: str) -> bytes:
+        with self._lock:
+            data = self._dicts.get(dict_id)
+        if data is None:
+            data = self.inner.get(f"{_PREFIX}dicts/{dict_id}")
+            with self._lock:
+                self._dicts[dict_id] = data
+        return data
+
+    def _load_current_dict(self) -> None:
+        if self._dict_checked:
+            return
+        try:
+            dict_id = self.inner.get(f"{_PREFIX}dicts/current").decode("ascii").strip()
+            self._dictionary(dict_id)
+            self._current_dict = dict_id
+        except DocumentNotFoundError:
+            pass
+        self._dict_checked = True
+
+    def train(self, samples: Optional[List[bytes]] = None) -> Optional[str]:
+        """
+        Train a dictionary on `samples` (recently written documents if omitted) and make it current.
+
+        Returns:
+            Id of the new dictionary, or None if the samples were not enough to train one
+        """
+        samples = list(samples if samples is not None else self._samples)
+        if self.codec == "zstd":
+            # zstd wants a dictionary well under the total sample size
+            size = min(DICT_SIZE, max(sum(map(len, samples)) // 10, 4096))
+            try:
+                data = zstandard.train_dictionary(size, samples).as_bytes()
+            except zstandard.ZstdError as e:
+                logger.info(f"Not enough samples to train a compression dictionary yet: {e}")
+                return None
+        else:
+            data = build_zlib_dictionary(samples, min(DICT_SIZE, 32 * 1024))
+        if not data:
+            return None
+        dict_id = hashlib.sha256(data).hexdigest()[:16]
+        self.inner.put(f"{_PREFIX}dicts/{dict_id}", data)
+        self.inner.put(f"{_PREFIX}dicts/current", dict_id.encode("ascii"))
+        with self._lock:
+            self._dicts[dict_id] = data
+            self._current_dict = dict_id
+        logger.info(f"Trained {self.codec} dictionary {dict_id} ({len(data)} bytes) on {len(samples)} documents")
+        return dict_id
+
+    # Blob encoding
+
+    def _compress(self, data: bytes) -> bytes:
+        dict_id = self._current_dict
+        dictionary = self._dictionary(dict_id) if dict_id else None
+        if self.codec == "zstd":
+            compressor = zstandard.ZstdCompressor(
+                level=19, dict_data=zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+            )
+            payload = compressor.compress(data)
+        else:
+            compressor = zlib.compressobj(9, zdict=dictionary) if dictionary else zlib.compressobj(9)
+            payload = compressor.compress(data) + compressor.flush()
+        return (b"s" if self.codec == "zstd" else b"z") + (dict_id or _NO_DICT).encode("ascii") + payload
+
+    def _decompress(self, blob: bytes) -> bytes:
+        codec, dict_id, payload = blob[:1], blob[1:17].decode("ascii"), blob[17:]
+        dictionary = self._dictionary(dict_id) if dict_id != _NO_DICT else None
+        if codec == b"s":
+            if zstandard is None:
+                raise RuntimeError("Stored document is zstd-compressed but zstandard is not installed")
+            decompressor = zstandard.ZstdDecompressor(
+                dict_data=zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+            )
+            return decompressor.decompress(payload)
+        if codec == b"z":
+            decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+            return decompressor.decompress(payload) + decompressor.flush()
+        raise ValueError(f"Unknown blob codec {codec!r}")
+
+    # DocumentStorage
+
+    def _ref(self, key: str) -> Optional[Dict]:
+        try:
+            return json.loads(self.inner.get(f"{_PREFIX}refs/{key}"))
+        except DocumentNotFoundError:
+            return None
+
+    def put(self, key: str, data: bytes) -> None:
+        check_key(key)
+        digest = hashlib.sha256(data).hexdigest()
+        blob_key = f"{_PREFIX}blobs/{digest[:2]}/{digest}"
+        self._load_current_dict()
+
+        stored = 0
+        # Always asked of the store: another process's garbage collection may have removed the blob
+        if self.inner.stat(blob_key) is not None:
+            with self._lock:
+                self.counters["deduplicated"] += 1
+        else:
+            blob = self._compress(data)
+            self.inner.put(blob_key, blob)
+            stored = len(blob)
+            self._samples.append(data)
+            self._new_blobs += 1
+        self.inner.put(f"{_PREFIX}refs/{key}", json.dumps({"hash": digest, "size": len(data), "modified": time.time()}).encode("utf-8"))
+
+        with self._lock:
+            self.counters["writes"] += 1
+            self.counters["logical_bytes"] += len(data)
+            self.counters["stored_bytes"] += stored
+        metrics.STORAGE_BYTES.inc(len(data), kind="logical")
+        metrics.STORAGE_BYTES.inc(stored, kind="stored")
+
+        if self._current_dict is None and self._new_blobs >= self._train_after and not self.train():
+            self._train_after += DICT_TRAIN_SAMPLES     # retry once more documents have been seen
+
+    def get(self, key: str) -> bytes:
+        start = time.perf_counter()
+        ref = self._ref(key)
+        if ref is None:
+            data = self.inner.get(key)      # written before compression was enabled
+        else:
+            digest = ref["hash"]
+            data = self._decompress(self.inner.get(f"{_PREFIX}blobs/{digest[:2]}/{digest}"))
+        duration = time.perf_counter() - start
+        self._read_latencies.append(duration)
+        metrics.STORAGE_READ_DURATION.observe(duration, backend=self.name)
+        return data
+
+    def stat(self, key: str) -> Optional[StoredObject]:
+        ref = self._ref(key)
+        if ref is None:
+            return self.inner.stat(key)
+        return StoredObject(key, ref["size"], ref["modified"], ref["hash"][:32])
+
+    def list(self, prefix: str = "", recursive: bool = False) -> List[StoredObject]:
+        objects = {
+            obj.key: obj for obj in self.inner.list(prefix, recursive)
+            if not obj.key.startswith(_PREFIX)
+        }
+        for obj in self.inner.list(f"{_PREFIX}refs/{prefix}", recursive):
+            key = obj.key[len(f"{_PREFIX}refs/"):]
+            objects[key] = self.stat(key) or obj
+        return sorted(objects.values(), key=lambda obj: obj.key)
+
+    def local_path(self, key: str) -> Optional[Path]:
+        # Only plain objects are files holding the document itself
+        return self.inner.local_path(key) if self._ref(key) is None else None
+
+    def stored_size(self, key: str) -> Optional[int]:
+        """Size of the compressed blob behind `key` (shared by keys with the same body)."""
+        ref = self._ref(key)
+        if ref is None:
+            return self.inner.stored_size(key)
+        digest = ref["hash"]
+        return self.inner.stored_size(f"{_PREFIX}blobs/{digest[:2]}/{digest}")
+
+    def delete(self, key: str) -> None:
+        # Blobs may be shared with other keys; unreferenced ones are left for a sweep
+        self.inner.delete(f"{_PREFIX}refs/{key}")
+        self.inner.delete(key)
+
+    def collect_garbage(self, min_age: float = 600.0) -> int:
+        """
+        Delete blobs no ref points to any more, in two passes.
+
+        A blob is only deleted once it was found unreferenced (and older than
+        `min_age` seconds) by the previous call as well, so a document written
+        while the refs are listed cannot lose its freshly deduplicated blob.
+
+        Returns:
+            Number of blobs deleted
+        """
+        referenced = set()
+        for obj in self.inner.list(f"{_PREFIX}refs/", recursive=True):
+            ref = self._ref(obj.key[len(f"{_PREFIX}refs/"):])
+            if ref:
+                referenced.add(ref["hash"])
+        cutoff = time.time() - min_age
+        unreferenced = {
+            obj.key for obj in self.inner.list(f"{_PREFIX}blobs/", recursive=True)
+            if obj.key.rsplit("/", 1)[-1] not in referenced and obj.modified < cutoff
+        }
+        doomed = unreferenced & self._gc_candidates
+        for blob_key in doomed:
+            self.inner.delete(blob_key)
+        self._gc_candidates = unreferenced - doomed
+        if doomed:
+            logger.info(f"Deleted {len(doomed)} unreferenced blobs")
+        return len(doomed)
+
+    # Stats
+
+    def stats(self, scan: bool = False) -> Dict:
+        """
+        Compression and read-path statistics of this process.
+
+        Args:
+            scan: Also walk the store for the totals of every stored document,
+                including those written by other processes and plain `.md`
+                objects; stored bytes then cover refs and dictionaries too
+        """
+        with self._lock:
+            counters = dict(self.counters)
+            latencies = sorted(self._read_latencies)
+
+        def percentile(q: float) -> Optional[float]:
+            return round(latencies[min(int(q * len(latencies)), len(latencies) - 1)] * 1000, 3) if latencies else None
+
+        report = {
+            "codec": self.codec,
+            "dictionary": self._current_dict,
+            "writes": counters["writes"],
+            "deduplicated_writes": counters["deduplicated"],
+            "compression_ratio": round(counters["logical_bytes"] / counters["stored_bytes"], 2) if counters["stored_bytes"] else None,
+            "reads": len(latencies),
+            "read_latency_ms": {"p50": percentile(0.5), "p95": percentile(0.95), "p99": percentile(0.99)},
+        }
+        if scan:
+            objects = self.inner.list(recursive=True)
+            refs = [obj for obj in objects if obj.key.startswith(f"{_PREFIX}refs/")]
+            ref_keys = {obj.key[len(f"{_PREFIX}refs/"):] for obj in refs}
+            raw = [obj for obj in objects if not obj.key.startswith(_PREFIX) and obj.key.endswith(".md")]
+            plain = [obj for obj in raw if obj.key not in ref_keys]
+            logical = sum(obj.size for obj in plain)
+            for key in ref_keys:
+                ref = self._ref(key)
+                logical += ref["size"] if ref else 0
+            # Raw copies shadowed by a ref take space without adding documents
+            stored = sum(obj.size for obj in objects if obj.key.startswith(_PREFIX)) + sum(obj.size for obj in raw)
+            report["store"] = {
+                "documents": len(refs) + len(plain),
+                "plain_documents": len(plain),
+                "unique_blobs": sum(obj.key.startswith(f"{_PREFIX}blobs/") for obj in objects),
+                "logical_bytes": logical,
+                "stored_bytes": stored,
+                "ratio": round(logical / stored, 2) if stored else None,
+            }
+        return report
@@ -1,7 +1,9 @@
 from crewai import Agent, Crew, Process, Task
 from crewai.project import CrewBase, agent, crew, task
 from crewai.agents.agent_builder.base_agent import BaseAgent
-from typing import List
+from crewai.tasks.task_output import TaskOutput
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from prd_generator.memory import SessionMemory
 from prd_generator.tools.prd_tools import (
     PRDTemplateGenerator,
     TechStackAdvisor,
@@ -69,70 +71,60 @@ class PrdGenerator():
     def generate_prd(self) -> Task:
         return Task(
             config=self.tasks_config['generate_prd'],
-            output_file='outputs/product_requirements_document.md'
         )
 
     @task
     def recommend_tech_stack(self) -> Task:
         return Task(
             config=self.tasks_config['recommend_tech_stack'],
-            output_file='outputs/technology_stack_recommendations.md'
         )
 
     @task
     def create_planning_setup(self) -> Task:
         return Task(
             config=self.tasks_config['create_planning_setup'],
-            output_file='outputs/planning_setup_guide.md'
         )
 
     @task
     def create_technical_architecture(self) -> Task:
         return Task(
             config=self.tasks_config['create_technical_architecture'],
-            output_file='outputs/technical_architecture_guide.md'
         )
 
     @task
     def create_development_environment(self) -> Task:
         return Task(
             config=self.tasks_config['create_development_environment'],
-            output_file='outputs/development_environment_guide.md'
         )
 
     @task
     def create_mvp_development(self) -> Task:
         return Task(
             config=self.tasks_config['create_mvp_development'],
-            output_file='outputs/mvp_development_guide.md'
         )
 
     @task
     def create_testing_quality(self) -> Task:
         return Task(
             config=self.tasks_config['create_testing_quality'],
-            output_file='outputs/testing_quality_guide.md'
         )
 
     @task
     def create_deployment_launch(self) -> Task:
         return Task(
             config=self.tasks_config['create_deployment_launch'],
-            output_file='outputs/deployment_launch_guide.md'
         )
 
     @task
     def create_post_launch_support(self) -> Task:
         return Task(
             config=self.tasks_config['create_post_launch_support'],
-            output_file='outputs/post_launch_support_guide.md'
         )
 
     @task
     def review_deliverables(self) -> Task:
         return Task(
             config=self.tasks_config['review_deliverables'],
-            output_file='outputs/quality_review_report.md'
         )
 
     @crew
@@ -146,6 +138,59 @@ class PrdGenerator():
             tasks=self.tasks, # Automatically created by the @task decorator
             process=Process.sequential,
             verbose=True,
-            memory=False,  # Disable ChromaDB memory to avoid compilation issues
+            memory=False,  # No ChromaDB memory; crew_for() attaches the session's in-process memory
             # process=Process.hierarchical, # In case you wanna use that instead https://docs.crewai.com/how-to/Hierarchical/
         )
+
+    def crew_for(
+        self,
+        task_names: Iterable[str],
+        cached_outputs: Optional[Dict[str, str]] = None,
+        task_callback: Optional[Callable[[TaskOutput], Any]] = None,
+        memory: Optional[SessionMemory] = None
+    ) -> Crew:
+        """
+        Creates a crew that runs only the given tasks.
+
+        Args:
+            task_names: Names of the tasks to run, from tasks.yaml
+            cached_outputs: Task name -> raw output for upstream tasks that are
+                reused instead of run; they are served to dependents as context
+            task_callback: Optional callback invoked after each task completes
+            memory: Session memory the agents recall passages and entities from
+
+        Returns:
+            Crew restricted to the requested tasks
+        """
+        full_crew = self.crew()
+        selected = set(task_names)
+        cached_outputs = cached_outputs or {}
+
+        tasks = []
+        for task in full_crew.tasks:
+            if task.name in selected:
+                task.output = None
+                tasks.append(task)
+            elif task.name in cached_outputs:
+                task.output = TaskOutput(
+                    name=task.name,
+                    description=task.description,
+                    expected_output=task.expected_output,
+                    raw=cached_outputs[task.name],
+                    agent=task.agent.role if task.agent else "",
+                )
+
+        agents = []
+        for task in tasks:
+            if task.agent is not None and task.agent not in agents:
+                agents.append(task.agent)
+
+        return Crew(
+            agents=agents,
+            tasks=tasks,
+            process=full_crew.process,
+            verbose=full_crew.verbose,
+            memory=full_crew.memory,
+            task_callback=task_callback,
+            **(memory.crew_memories() if memory else {}),
+        )
@@ -0,0 +1,183 @@
+"""
+Generation service for the PRD Generator crew.
+Plans which tasks a request needs, runs them and persists every task output
+per session so later requests can build on it.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from prd_generator.idea_classifier import classify_idea, idea_profile_scope
+from prd_generator.knowledge import KnowledgeBase
+from prd_generator.memory import AgentMemory
+from prd_generator.sessions import SessionStore
+from prd_generator.storage import BackgroundWriter, get_writer
+from prd_generator.task_graph import TaskGraph
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class GenerationResult:
+    """Outcome of a generation run."""
+    session_id: str
+    executed_tasks: List[str]
+    reused_tasks: List[str]
+    documents: List[str]
+    reused_from: Optional[str] = None
+    task_outputs: Dict[str, str] = field(default_factory=dict)
+    warm_start: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    idea_profile: Dict[str, Any] = field(default_factory=dict)     # see IdeaProfile
+
+
+class GenerationService:
+    """
+    Runs the crew for a request, restricted to the tasks it actually needs.
+    """
+
+    def __init__(self, crew_factory, session_store: Optional[SessionStore] = None,
+                 task_graph: Optional[TaskGraph] = None, writer: Optional[BackgroundWriter] = None,
+                 knowledge: Optional[KnowledgeBase] = None, memory: Optional[AgentMemory] = None):
+        """
+        Args:
+            crew_factory: Callable returning a PrdGenerator instance
+            session_store: Store for per-session task outputs (publishing them through `writer` if omitted)
+            task_graph: Task dependency graph (loaded from tasks.yaml if omitted)
+            writer: Publishes documents to the configured document storage
+            knowledge: Knowledge base whose relevant chunks are attached to the agents' prompts
+            memory: Per-session agent memory
+        """
+        self.crew_factory = crew_factory
+        self.writer = writer or get_writer()
+        self.session_store = session_store or SessionStore(writer=self.writer)
+        self.task_graph = task_graph or TaskGraph.from_yaml()
+        self.knowledge = knowledge or KnowledgeBase()
+        self.memory = memory or AgentMemory()
+
+    def generate(
+        self,
+        inputs: Dict[str, Any],
+        documents: Optional[List[str]] = None,
+        reuse_session_id: Optional[str] = None
+    ) -> GenerationResult:
+        """
+        Generate the requested documents for the given inputs.
+
+        Re-submitting against an existing session is incremental: only tasks
+        whose effective input hash changed (or whose context tasks changed)
+        run again, the rest are served from the session.
+
+        Args:
+            inputs: Crew inputs; must contain 'session_id'
+            documents: Document filenames to produce (all documents if None)
+            reuse_session_id: Earlier session whose task outputs may be reused
+                for upstream tasks instead of regenerating them
+
+        Returns:
+            GenerationResult describing what ran and what was reused
+        """
+        session_id = inputs["session_id"]
+
+        if reuse_session_id and reuse_session_id != session_id:
+            source_session = reuse_session_id
+            cached_outputs = self.session_store.load_task_outputs(reuse_session_id)
+            to_run, to_reuse = self.task_graph.plan(documents, cached=cached_outputs)
+        elif self.session_store.exists(session_id):
+            source_session = session_id
+            records = self.session_store.load_task_records(session_id)
+            cached_outputs = self.session_store.load_task_outputs(session_id)
+            fresh = self.task_graph.fresh_tasks(inputs, records) & set(cached_outputs)
+            to_run, to_reuse = self.task_graph.plan(documents, cached=fresh, regenerate_targets=False)
+        else:
+            source_session = None
+            cached_outputs = {}
+            to_run, to_reuse = self.task_graph.plan(documents)
+
+        reused_outputs = {name: cached_outputs[name] for name in to_reuse}
+        logger.info(
+            f"Session {session_id}: running {len(to_run)} tasks, "
+            f"reusing {len(to_reuse)} from {source_session or 'none'}"
+        )
+
+        # Output hashes of every task the run may depend on, starting from the
+        # source session's records and updated as tasks complete
+        output_hashes: Dict[str, str] = {
+            name: record["output_hash"]
+            for name, record in (self.session_store.load_task_records(source_session) if source_session else {}).items()
+            if record.get("output_hash")
+        }
+
+        self.session_store.start(session_id, inputs)
+        if source_session != session_id:
+            for task_name in self.task_graph.order:
+                if task_name not in reused_outputs:
+                    continue
+                output_hashes[task_name] = self.session_store.save_task_output(
+                    session_id, task_name, reused_outputs[task_name],
+                    source_session=source_session,
+                    input_hash=self._input_hash(task_name, inputs, output_hashes),
+                    document=self.task_graph.document_for_task(task_name)
+                )
+
+        # Reference context from similar past sessions; input hashes leave it out,
+        # so a session is not considered stale just because the index grew
+        reference_inputs, warm_start = self.session_store.warm_start.context(
+            inputs, to_run, exclude={session_id, reuse_session_id} - {None}
+        )
+
+        # Platform, domain and scale inferred locally, so agents need not spend a turn on them
+        profile = classify_idea(inputs.get("idea_description", ""))
+
+        task_outputs: Dict[str, str] = {}
+
+        def record_task_output(output) -> None:
+            task_outputs[output.name] = output.raw
+            output_hashes[output.name] = self.session_store.save_task_output(
+                session_id, output.name, output.raw,
+                input_hash=self._input_hash(output.name, inputs, output_hashes),
+                document=self.task_graph.document_for_task(output.name)
+            )
+            self._publish_latest(output.name, output.raw)
+
+        try:
+            if to_run:
+                crew = self.crew_factory().crew_for(
+                    to_run, cached_outputs=reused_outputs, task_callback=record_task_output,
+                    memory=self.memory.session(session_id, reused_outputs)
+                )
+                with idea_profile_scope(profile):
+                    crew.kickoff(inputs={
+                        **inputs, **reference_inputs, **self.knowledge.context(inputs), **profile.inputs()
+                    })
+        finally:
+            # Documents are readable from storage once the job reports completion
+            if not self.writer.flush(timeout=60):
+                logger.warning(f"Session {session_id}: documents still being written to {self.writer.storage.name} storage")
+
+        return GenerationResult(
+            session_id=session_id,
+            executed_tasks=to_run,
+            reused_tasks=to_reuse,
+            documents=[doc for doc in map(self.task_graph.document_for_task, to_run) if doc],
+            reused_from=source_session if to_reuse else None,
+            task_outputs=task_outputs,
+            warm_start=warm_start,
+            idea_profile=profile.to_dict(),
+        )
+
+    def _publish_latest(self, task_name: str, raw: str) -> None:
+        """
+        Queue the output of a task that ran in this generation for document
+        storage as the latest version of its document (the session store
+        publishes the session's own copy).
+        """
+        document = self.task_graph.document_for_task(task_name)
+        if document:
+            self.writer.write(document, raw.encode("utf-8"))
+
+    def _input_hash(self, task_name: str, inputs: Dict[str, Any], output_hashes: Dict[str, str]) -> Optional[str]:
+        """Hash a task's effective inputs, or None if a context output is unknown."""
+        if any(dep not in output_hashes for dep in self.task_graph.dependencies[task_name]):
+            return None
+        return self.task_graph.input_hash(task_name, inputs, output_hashes)
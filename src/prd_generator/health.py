@@ -0,0 +1,219 @@
+"""
+Load and saturation signals for /health.
+Every LLM call's latency and the provider's rate-limit headers are observed in
+whichever process runs the crew (worker processes forward them to the API
+process); queue, worker and disk figures are read on demand.
+"""
+
+import logging
+import math
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+EWMA_ALPHA = float(os.getenv("PRD_HEALTH_EWMA_ALPHA", "0.2"))
+TARGET_QUEUE_WAIT = float(os.getenv("PRD_TARGET_QUEUE_WAIT_SECONDS", "60"))   # scale out past this oldest-queued age
+MIN_FREE_DISK_MB = int(os.getenv("PRD_MIN_FREE_DISK_MB", "500"))
+MIN_RATELIMIT_HEADROOM = float(os.getenv("PRD_MIN_RATELIMIT_HEADROOM", "0.05"))  # fraction of the provider limit left
+RATELIMIT_WINDOW = 60.0     # seconds after which a rate-limit observation no longer says anything
+
+
+def parse_ratelimit_headers(headers: Mapping[str, Any]) -> Dict[str, Dict[str, int]]:
+    """Read x-ratelimit-limit-* / x-ratelimit-remaining-* pairs (requests, tokens) from response headers."""
+    limits: Dict[str, Dict[str, int]] = {}
+    for kind in ("requests", "tokens"):
+        try:
+            limit = int(headers[f"x-ratelimit-limit-{kind}"])
+            remaining = int(headers[f"x-ratelimit-remaining-{kind}"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        limits[kind] = {"limit": limit, "remaining": remaining}
+    return limits
+
+
+class LlmHealth:
+    """
+    EWMA of LLM call latency plus the latest rate-limit headroom reported by the provider.
+    """
+
+    def __init__(self, alpha: float = EWMA_ALPHA):
+        self.alpha = alpha
+        self.ewma_latency: Optional[float] = None
+        self.calls = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.ratelimit: Dict[str, Dict[str, int]] = {}
+        self.ratelimit_observed: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def apply(self, event: Dict[str, Any]) -> None:
+        """Record one LLM call event (see LlmCallObserver)."""
+        with self._lock:
+            self.calls += 1
+            if event["status"] == "rate_limited":
+                self.rate_limited += 1
+            elif event["status"] != "ok":
+                self.failures += 1
+            if event.get("latency") is not None and event["status"] == "ok":
+                latency = event["latency"]
+                self.ewma_latency = latency if self.ewma_latency is None else (
+                    self.alpha * latency + (1 - self.alpha) * self.ewma_latency
+                )
+            if event.get("ratelimit"):
+                self.ratelimit = event["ratelimit"]
+                self.ratelimit_observed = event.get("time", time.time())
+
+    def headroom(self) -> Optional[float]:
+        """Smallest remaining/limit fraction across request and token limits, if known."""
+        fractions = [value["remaining"] / value["limit"] for value in self.ratelimit.values() if value["limit"]]
+        return min(fractions) if fractions else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "latency_ewma_seconds": round(self.ewma_latency, 3) if self.ewma_latency is not None else None,
+                "calls": self.calls,
+                "failures": self.failures,
+                "rate_limited": self.rate_limited,
+                "ratelimit": dict(self.ratelimit),
+                "ratelimit_headroom": self.headroom(),
+                "ratelimit_age_seconds": round(time.time() - self.ratelimit_observed, 1) if self.ratelimit_observed else None,
+            }
+
+
+llm_health = LlmHealth()
+_forwarders: List[Callable[[Dict[str, Any]], None]] = []
+
+
+def add_forwarder(forward: Callable[[Dict[str, Any]], None]) -> None:
+    """Also pass every LLM call event to `forward` (used by worker processes to report to the API process)."""
+    _forwarders.append(forward)
+
+
+def record_llm_call(event: Dict[str, Any]) -> None:
+    llm_health.apply(event)
+    for forward in list(_forwarders):
+        try:
+            forward(event)
+        except Exception as e:
+            logger.debug(f"Failed to forward LLM call event: {e}")
+
+
+_installed = False
+_install_lock = threading.Lock()
+
+
+def install_crewai_handlers() -> None:
+    """Attach an LlmCallObserver to every agent execution (once per process)."""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        _installed = True
+
+    from crewai.events.event_bus import crewai_event_bus
+    from crewai.events.types.agent_events import AgentExecutionStartedEvent
+    from litellm.integrations.custom_logger import CustomLogger
+
+    class LlmCallObserver(CustomLogger):
+        """
+        LiteLLM logger recording latency and rate-limit headers of each call.
+
+        crewAI also calls `log_success_event` directly with only the usage
+        block; those calls are skipped since LiteLLM reports the full response.
+        """
+
+        def log_success_event(self, kwargs, response_obj, start_time, end_time):
+            if isinstance(response_obj, dict):
+                return
+            headers = (getattr(response_obj, "_hidden_params", None) or {}).get("additional_headers") or {}
+            record_llm_call({
+                "status": "ok",
+                "latency": (end_time - start_time).total_seconds(),
+                "ratelimit": parse_ratelimit_headers(headers),
+                "time": time.time(),
+            })
+
+        def log_failure_event(self, kwargs, response_obj, start_time, end_time):
+            exception = kwargs.get("exception")
+            status = "rate_limited" if getattr(exception, "status_code", None) == 429 else "error"
+            record_llm_call({"status": status, "latency": None, "ratelimit": {}, "time": time.time()})
+
+    # One shared instance: LiteLLM keeps every distinct logger it has seen in its
+    # global failure callbacks, so a new one per agent would pile up there
+    observer = LlmCallObserver()
+
+    @crewai_event_bus.on(AgentExecutionStartedEvent)
+    def on_agent_started(source, event):
+        executor = getattr(event.agent, "agent_executor", None)
+        if executor is None:
+            return
+        executor.callbacks = [
+            callback for callback in executor.callbacks or [] if callback is not observer
+        ] + [observer]
+
+
+def suggest_replica_delta(workers: int, running: int, queued: int, oldest_queued_age: Optional[float],
+                          headroom: Optional[float]) -> Dict[str, Any]:
+    """
+    Suggest how many replicas to add (positive) or remove (negative).
+
+    Scale out by enough replicas to absorb the queue once it is waiting longer
+    than TARGET_QUEUE_WAIT, but not while the provider's rate limit is nearly
+    exhausted (more replicas would only queue on the limit); scale in when idle.
+    """
+    if headroom is not None and headroom < MIN_RATELIMIT_HEADROOM:
+        return {"delta": 0, "reason": "llm_rate_limited"}
+    if queued and oldest_queued_age is not None and oldest_queued_age > TARGET_QUEUE_WAIT:
+        return {"delta": math.ceil(queued / max(workers, 1)), "reason": "queue_wait"}
+    if running == 0 and queued == 0:
+        return {"delta": -1, "reason": "idle"}
+    return {"delta": 0, "reason": "steady"}
+
+
+def load_report(job_stats: Dict[str, Any], oldest_queued_age: Optional[float], outputs_dir: Path,
+                worker_states: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Build the capacity section of /health.
+
+    Args:
+        job_stats: JobManager.stats()
+        oldest_queued_age: Seconds the oldest queued job has waited, if any
+        outputs_dir: Directory whose filesystem holds generated outputs
+        worker_states: States of the worker processes, if running in process mode
+    """
+    workers, running, queued = job_stats["workers"], job_stats["running"], job_stats["queued"]
+    llm = llm_health.snapshot()
+    try:
+        disk_free_mb = shutil.disk_usage(outputs_dir).free // 2**20
+    except OSError:
+        disk_free_mb = None
+
+    accepting = (
+        job_stats["accepting"]
+        and queued < job_stats["max_queued"]
+        and (disk_free_mb is None or disk_free_mb >= MIN_FREE_DISK_MB)
+    )
+    report = {
+        "accepting_work": accepting,
+        "workers": {"total": workers, "busy": running, "idle": max(workers - running, 0)},
+        "queue": {
+            "depth": queued,
+            "capacity": job_stats["max_queued"],
+            "oldest_age_seconds": round(oldest_queued_age, 1) if oldest_queued_age is not None else None,
+        },
+        "llm": llm,
+        "disk_free_mb": disk_free_mb,
+        "scaling": suggest_replica_delta(
+            workers, running, queued, oldest_queued_age,
+            llm["ratelimit_headroom"] if (llm["ratelimit_age_seconds"] or 0) < RATELIMIT_WINDOW else None,
+        ),
+    }
+    if worker_states is not None:
+        report["workers"]["processes"] = {state: worker_states.count(state) for state in sorted(set(worker_states))}
+    return report
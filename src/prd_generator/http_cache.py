@@ -0,0 +1,219 @@
+"""
+HTTP caching and compression for the document endpoints and web interface.
+Response bodies are kept in memory per file version with a strong ETag of their
+content, and their gzip/brotli variants are compressed once, so repeat requests
+are answered with 304, a byte range or a precompressed body without disk reads.
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
+from typing import Callable, Dict, Hashable, Iterable, Mapping, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:     # gzip only
+    brotli = None
+
+HTTP_CACHE_MB = int(os.getenv("PRD_HTTP_CACHE_MB", "64"))               # bodies and their compressed variants
+MAX_CACHED_BODY_MB = int(os.getenv("PRD_HTTP_MAX_CACHED_BODY_MB", "8"))  # larger files are streamed from disk
+MIN_COMPRESS_BYTES = 1024
+
+
+class RangeNotSatisfiable(ValueError):
+    """Raised when a Range header lies entirely outside the body."""
+
+
+class CachedBody:
+    """
+    One response body, its strong ETag and its compressed variants.
+    """
+
+    def __init__(self, content: bytes, media_type: str):
+        self.content = content
+        self.media_type = media_type
+        self.tag = hashlib.sha256(content).hexdigest()[:32]
+        self._variants: Dict[str, Optional[bytes]] = {}
+        self._lock = threading.Lock()
+
+    def etag(self, encoding: Optional[str] = None) -> str:
+        """Strong ETag of the body, or of its `encoding` variant (each representation has its own)."""
+        return f'"{self.tag}-{encoding}"' if encoding else f'"{self.tag}"'
+
+    @property
+    def etags(self) -> Tuple[str, ...]:
+        return (self.etag(), self.etag("br"), self.etag("gzip"))
+
+    @property
+    def size(self) -> int:
+        return len(self.content) + sum(len(variant or b"") for variant in self._variants.values())
+
+    def variant(self, encoding: str) -> Optional[bytes]:
+        """
+        The body compressed with `encoding`, compressed on first use.
+
+        Returns:
+            The compressed bytes, or None if compression does not make the body smaller
+        """
+        with self._lock:
+            if encoding not in self._variants:
+                if encoding == "br":
+                    compressed = brotli.compress(self.content, quality=11 if len(self.content) <= 2**20 else 5)
+                else:
+                    compressed = gzip.compress(self.content, compresslevel=9, mtime=0)
+                self._variants[encoding] = compressed if len(compressed) < len(self.content) else None
+            return self._variants[encoding]
+
+
+class BodyCache:
+    """
+    LRU cache of CachedBody objects bounded by their total size.
+    """
+
+    def __init__(self, max_bytes: int = HTTP_CACHE_MB * 2**20):
+        self.max_bytes = max_bytes
+        self._bodies: "OrderedDict[Hashable, CachedBody]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, load: Callable[[], bytes], media_type: str) -> CachedBody:
+        """
+        Return the cached body for `key`, loading it on a miss.
+
+        Args:
+            key: Identifies the body's version, e.g. the document key, size and mtime
+            load: Produces the body
+            media_type: Content type of the body
+        """
+        with self._lock:
+            body = self._bodies.get(key)
+            if body is not None:
+                self._bodies.move_to_end(key)
+                return body
+        body = CachedBody(load(), media_type)
+        with self._lock:
+            self._bodies[key] = body
+            while len(self._bodies) > 1 and sum(cached.size for cached in self._bodies.values()) > self.max_bytes:
+                self._bodies.popitem(last=False)
+        return body
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._bodies), "bytes": sum(body.size for body in self._bodies.values())}
+
+
+def content_disposition(filename: str) -> str:
+    """Content-Disposition header value for downloading `filename` (RFC 6266 for non-ASCII names)."""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+def etag_matches(if_none_match: Optional[str], etags: Iterable[str]) -> bool:
+    """Whether an If-None-Match header value matches any of `etags` (weak comparison)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return any(etag in candidates for etag in etags)
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header by q-value, preferring br on ties."""
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    available = ("br", "gzip") if brotli is not None else ("gzip",)
+    scored = [(weights.get(name, weights.get("*", 0.0)), -i, name) for i, name in enumerate(available)]
+    q, _, best = max(scored)
+    return best if q > 0 else None
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range `bytes=` Range header.
+
+    Returns:
+        Inclusive (start, end) offsets, or None to send the whole body (no,
+        malformed or multi-range header)
+
+    Raises:
+        RangeNotSatisfiable: If the range starts past the end of the body, or
+            is an empty suffix or a suffix of an empty body
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start, sep, end = header[len("bytes="):].strip().partition("-")
+    if not sep or not (start or end):
+        return None
+    try:
+        first = int(start) if start else None
+        last = int(end) if end else size - 1
+    except ValueError:
+        return None
+    if first is None:
+        if last <= 0 or size == 0:
+            raise RangeNotSatisfiable(header)
+        return max(size - last, 0), size - 1
+    if first >= size:
+        raise RangeNotSatisfiable(header)
+    if last < first:
+        return None
+    return first, min(last, size - 1)
+
+
+def cached_response(request: Request, body: CachedBody, headers: Optional[Mapping[str, str]] = None,
+                    allow_range: bool = False) -> Response:
+    """
+    Build the response for `body` honouring If-None-Match, Range/If-Range and Accept-Encoding.
+
+    Args:
+        request: Incoming request
+        body: Cached body to send
+        headers: Extra response headers (Cache-Control, Content-Disposition, ...)
+        allow_range: Whether byte ranges of the uncompressed body may be requested
+    """
+    headers = {"Vary": "Accept-Encoding", **(headers or {})}
+    if allow_range:
+        headers["Accept-Ranges"] = "bytes"
+
+    encoding = choose_encoding(request.headers.get("accept-encoding")) if len(body.content) >= MIN_COMPRESS_BYTES else None
+    compressed = body.variant(encoding) if encoding else None
+    etag = body.etag(encoding) if compressed is not None else body.etag()
+
+    if etag_matches(request.headers.get("if-none-match"), body.etags):
+        return Response(status_code=304, headers={**headers, "ETag": etag})
+
+    if_range = request.headers.get("if-range")
+    if allow_range and "range" in request.headers and (if_range is None or if_range.strip() == body.etag()):
+        size = len(body.content)
+        try:
+            byte_range = parse_range(request.headers["range"], size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            return Response(
+                body.content[start:end + 1], status_code=206, media_type=body.media_type,
+                headers={**headers, "ETag": body.etag(), "Content-Range": f"bytes {start}-{end}/{size}"},
+            )
+
+    if compressed is not None:
+        return Response(compressed, media_type=body.media_type, headers={**headers, "ETag": etag, "Content-Encoding": encoding})
+    return Response(body.content, media_type=body.media_type, headers={**headers, "ETag": etag})
@@ -0,0 +1,263 @@
+"""
+Local idea classifier.
+Tags an idea description with its platform (web, mobile or desktop), domain and
+scale without an LLM call. Keyword rules decide where the idea says so
+explicitly; otherwise a softmax linear model over the hashed word vectors of
+the warm start index does. The model is trained from config/idea_examples.yaml
+and stored as NumPy arrays in config/idea_classifier.npz.
+
+The resulting profile pre-fills the {project_type}, {project_domain} and
+{project_scale} task inputs and the Tech Stack Advisor's arguments.
+
+Usage:
+    python -m prd_generator.idea_classifier train
+    python -m prd_generator.idea_classifier classify "A habit tracker for iOS"
+"""
+
+import argparse
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+
+import numpy as np
+import yaml
+
+from prd_generator.tech_catalog import PLATFORMS, SCALES
+from prd_generator.warm_start import DIMENSIONS, vectorize
+
+logger = logging.getLogger(__name__)
+
+IDEA_EXAMPLES_PATH = Path(__file__).parent / "config" / "idea_examples.yaml"
+IDEA_MODEL_PATH = Path(os.getenv("PRD_IDEA_MODEL", Path(__file__).parent / "config" / "idea_classifier.npz"))
+# A model prediction is used only when its probability is this many times chance
+# (1 / number of labels); otherwise the head falls back to its default
+MIN_LIFT = float(os.getenv("PRD_IDEA_MIN_LIFT", "2.0"))
+
+HEADS = ("platform", "domain", "scale")
+DEFAULTS = {"platform": "web", "domain": "other", "scale": "medium"}
+PROFILE_INPUTS = {"platform": "project_type", "domain": "project_domain", "scale": "project_scale"}
+
+# First matching rule wins, so more specific labels come first
+_RULES: Dict[str, List[Tuple[re.Pattern, str]]] = {
+    head: [(re.compile(pattern), label) for pattern, label in rules]
+    for head, rules in {
+        "platform": [
+            (r"\b(ios|iphone|ipad|android|mobile|react native|flutter|app store|play store|smartphone)\b", "mobile"),
+            (r"\b(desktop|windows app|macos|mac app|linux app|electron|tray app)\b", "desktop"),
+            (r"\b(website|web app|web-based|web application|saas|browser|chrome extension|web portal)\b", "web"),
+        ],
+        "scale": [
+            (r"\b(enterprise|millions of|nationwide|worldwide|high[- ]traffic|large[- ]scale|multi[- ]region|fortune 500)\b", "large"),
+            (r"\b(mvp|prototype|proof of concept|personal|side project|hobby|single user|for myself|my family)\b", "small"),
+            (r"\b(thousands of|mid[- ]sized|growing startup|regional)\b", "medium"),
+        ],
+        "domain": [
+            (r"\b(marketplace|peer[- ]to[- ]peer)\b", "marketplace"),
+            (r"\b(e-?commerce|online store|storefront|shopping cart|checkout)\b", "ecommerce"),
+            (r"\b(banking|fintech|budget(ing)?|invoic(e|ing)|crypto|trading|loans?|expenses?)\b", "fintech"),
+            (r"\b(health|fitness|medical|patients?|clinic|workouts?|nutrition|therapy|wellness)\b", "health"),
+            (r"\b(students?|courses?|teachers?|tutor(ing)?|school|learning|lessons?)\b", "education"),
+            (r"\b(itinerar(y|ies)|hotels?|flights?|travel(ers)?|trips?|tourism)\b", "travel"),
+            (r"\b(deliver(y|ies)|couriers?|fleet|warehouse|shipping|freight|logistics)\b", "logistics"),
+            (r"\b(developers?|api monitoring|sdks?|ci/cd|pull requests?|code review)\b", "developer_tools"),
+        ],
+    }.items()
+}
+
+_profile: contextvars.ContextVar[Optional["IdeaProfile"]] = contextvars.ContextVar("prd_idea_profile", default=None)
+
+
+@dataclass(frozen=True)
+class IdeaProfile:
+    """
+    Platform, domain and scale of an idea, with where each came from.
+
+    Immutable, since the classifier hands the same memoized instance to every
+    job with the same idea.
+    """
+    platform: str = DEFAULTS["platform"]
+    domain: str = DEFAULTS["domain"]
+    scale: str = DEFAULTS["scale"]
+    confidence: Mapping[str, float] = field(default_factory=lambda: MappingProxyType({}))
+    source: Mapping[str, str] = field(default_factory=lambda: MappingProxyType({}))     # head -> "rule", "model" or "default"
+
+    def inputs(self) -> Dict[str, str]:
+        """Crew inputs holding the profile."""
+        return {PROFILE_INPUTS[head]: getattr(self, head) for head in HEADS}
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            **{head: getattr(self, head) for head in HEADS},
+            "confidence": dict(self.confidence),
+            "source": dict(self.source),
+        }
+
+
+def current_idea_profile() -> Optional[IdeaProfile]:
+    """Return the profile of the idea whose generation runs on this thread, if any."""
+    return _profile.get()
+
+
+@contextmanager
+def idea_profile_scope(profile: IdeaProfile) -> Iterator[IdeaProfile]:
+    """Make `profile` the current idea profile on this thread for the duration of the block."""
+    token = _profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _profile.reset(token)
+
+
+def _load_examples(path: Path) -> Tuple[Dict[str, Tuple[str, ...]], List[Dict[str, str]], str]:
+    raw = path.read_bytes()
+    data = yaml.safe_load(raw)
+    labels = {"platform": PLATFORMS, "domain": tuple(data["domains"]), "scale": SCALES}
+    return labels, data["examples"], hashlib.sha256(raw).hexdigest()
+
+
+def train(examples_path: Path = IDEA_EXAMPLES_PATH) -> Dict[str, np.ndarray]:
+    """
+    Train the model on a labelled examples file.
+
+    Returns:
+        Model arrays: per head "<head>_weights", "<head>_bias" and "<head>_labels",
+        plus the hash of the examples file they were trained on
+    """
+    labels, examples, digest = _load_examples(examples_path)
+    return {**_fit(labels, examples), "examples_sha256": np.array(digest)}
+
+
+def _fit(labels: Dict[str, Tuple[str, ...]], examples: List[Dict[str, str]], dimensions: int = DIMENSIONS,
+         epochs: int = 400, learning_rate: float = 4.0, l2: float = 1e-4) -> Dict[str, np.ndarray]:
+    """Fit one softmax regression per head by full-batch gradient descent."""
+    features = np.stack([vectorize(example["idea"], dimensions) for example in examples])
+    model: Dict[str, np.ndarray] = {}
+    for head in HEADS:
+        targets = np.eye(len(labels[head]), dtype=np.float32)[[labels[head].index(example[head]) for example in examples]]
+        weights = np.zeros((dimensions, len(labels[head])), dtype=np.float32)
+        bias = np.zeros(len(labels[head]), dtype=np.float32)
+        for _ in range(epochs):
+            errors = _softmax(features @ weights + bias) - targets
+            weights -= learning_rate * (features.T @ errors / len(examples) + l2 * weights)
+            bias -= learning_rate * errors.mean(axis=0)
+        model[f"{head}_weights"], model[f"{head}_bias"] = weights, bias
+        model[f"{head}_labels"] = np.array(labels[head])
+    return model
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    exponentials = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return exponentials / exponentials.sum(axis=-1, keepdims=True)
+
+
+class IdeaClassifier:
+    """Keyword rules backed by a linear model over hashed word vectors."""
+
+    def __init__(self, model: Dict[str, np.ndarray]):
+        self.dimensions = model["platform_weights"].shape[0]
+        self.heads = {
+            head: (model[f"{head}_weights"], model[f"{head}_bias"], [str(label) for label in model[f"{head}_labels"]])
+            for head in HEADS
+        }
+        self.classify = lru_cache(maxsize=256)(self._classify)
+
+    @classmethod
+    def from_file(cls, path: Path = IDEA_MODEL_PATH, examples_path: Path = IDEA_EXAMPLES_PATH) -> "IdeaClassifier":
+        """
+        Load the trained model, retraining in memory if it is missing or older than the examples.
+        """
+        try:
+            with np.load(path) as arrays:
+                model = dict(arrays)
+            if examples_path.exists() and str(model["examples_sha256"]) != _load_examples(examples_path)[2]:
+                logger.warning(f"{path} was trained on other examples; retraining in memory "
+                               f"(run `python -m prd_generator.idea_classifier train` to update it)")
+                model = train(examples_path)
+        except (OSError, KeyError, ValueError):
+            logger.warning(f"No idea classifier model at {path}; training one in memory")
+            model = train(examples_path)
+        return cls(model)
+
+    def _classify(self, idea: str) -> IdeaProfile:
+        """Memoized through `self.classify`."""
+        text = idea.lower()
+        vector = vectorize(idea, self.dimensions)
+        labels_by_head: Dict[str, str] = {}
+        confidences: Dict[str, float] = {}
+        sources: Dict[str, str] = {}
+        for head in HEADS:
+            rule = next((label for pattern, label in _RULES[head] if pattern.search(text)), None)
+            if rule is not None:
+                label, confidence, source = rule, 1.0, "rule"
+            else:
+                weights, bias, labels = self.heads[head]
+                probabilities = _softmax(vector @ weights + bias)
+                best = int(probabilities.argmax())
+                label, confidence, source = labels[best], float(probabilities[best]), "model"
+                if confidence < MIN_LIFT / len(labels) or not vector.any():
+                    label, source = DEFAULTS[head], "default"
+            labels_by_head[head] = label
+            confidences[head] = round(confidence, 3)
+            sources[head] = source
+        return IdeaProfile(**labels_by_head, confidence=MappingProxyType(confidences), source=MappingProxyType(sources))
+
+
+@lru_cache(maxsize=None)
+def get_classifier() -> IdeaClassifier:
+    """The process-wide classifier, loaded on first use."""
+    return IdeaClassifier.from_file()
+
+
+def classify_idea(idea: str) -> IdeaProfile:
+    """Profile an idea description with the process-wide classifier."""
+    return get_classifier().classify(idea or "")
+
+
+def _cross_validate(examples_path: Path, folds: int = 5) -> Dict[str, float]:
+    """Accuracy of rules and model together on held-out examples."""
+    labels, examples, _ = _load_examples(examples_path)
+    correct = {head: 0 for head in HEADS}
+    for fold in range(folds):
+        classifier = IdeaClassifier(_fit(labels, [example for number, example in enumerate(examples) if number % folds != fold]))
+        for example in examples[fold::folds]:
+            profile = classifier.classify(example["idea"])
+            for head in HEADS:
+                correct[head] += getattr(profile, head) == example[head]
+    return {head: round(correct[head] / len(examples), 3) for head in HEADS}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Idea classifier command line entry point."""
+    parser = argparse.ArgumentParser(description="Train or try the local idea classifier")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    train_parser = subparsers.add_parser("train", help="Train the model on the labelled examples and save it")
+    train_parser.add_argument("--examples", default=str(IDEA_EXAMPLES_PATH))
+    train_parser.add_argument("--output", default=str(IDEA_MODEL_PATH))
+    classify_parser = subparsers.add_parser("classify", help="Print the profile of an idea")
+    classify_parser.add_argument("idea")
+    args = parser.parse_args(argv)
+
+    if args.command == "train":
+        examples_path = Path(args.examples)
+        accuracy = _cross_validate(examples_path)
+        model = train(examples_path)
+        with open(args.output, "wb") as f:
+            np.savez(f, **model)
+        print(f"Saved {args.output}; 5-fold cross-validated accuracy: {accuracy}")
+    else:
+        print(json.dumps(classify_idea(args.idea).to_dict(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
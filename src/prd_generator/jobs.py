@@ -0,0 +1,371 @@
+"""
+Background job queue for PRD generations.
+Generations run on a bounded pool of worker threads so the event loop keeps
+serving requests (including /health) while crews are busy. Unfinished jobs
+are journaled to disk so a restarted service picks them up again.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENT_JOBS = int(os.getenv("PRD_MAX_CONCURRENT_JOBS", "2"))
+MAX_QUEUED_JOBS = int(os.getenv("PRD_MAX_QUEUED_JOBS", "100"))
+MAX_FINISHED_JOBS = int(os.getenv("PRD_MAX_FINISHED_JOBS", "1000"))
+JOURNAL_DIR = Path(os.getenv("PRD_JOB_JOURNAL_DIR", "outputs/jobs"))
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("PRD_SHUTDOWN_DRAIN_SECONDS", "25"))
+MAX_JOB_RECOVERIES = int(os.getenv("PRD_MAX_JOB_RECOVERIES", "3"))   # restarts a job may be resumed across
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the job queue has no room for another job."""
+
+
+class ShuttingDownError(QueueFullError):
+    """Raised when the service is draining for shutdown and no longer accepts jobs."""
+
+
+@dataclass
+class Job:
+    """A queued or running generation."""
+    id: str
+    inputs: Dict[str, Any]
+    documents: Optional[List[str]] = None
+    reuse_session_id: Optional[str] = None
+    status: str = "queued"
+    created: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    usage: Optional[Dict[str, Any]] = None
+    profile: bool = False
+    profile_info: Optional[Dict[str, Any]] = None
+    recoveries: int = 0
+    done: Optional[asyncio.Event] = field(default=None, repr=False)
+
+    @property
+    def queue_wait(self) -> Optional[float]:
+        """Seconds the job waited in the queue before a worker picked it up."""
+        if self.started is None:
+            return None
+        return self.started - self.created
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the job for API responses."""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "session_id": self.inputs.get("session_id"),
+            "pricing_tier": self.inputs.get("pricing_tier"),
+            "documents": self.documents,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "queue_wait_seconds": self.queue_wait,
+            "duration_seconds": (self.finished - self.started) if self.finished and self.started else None,
+            "result": self.result,
+            "error": self.error,
+            "usage": self.usage,
+            "profile_url": f"/jobs/{self.id}/profile" if self.profile else None,
+            "recoveries": self.recoveries,
+        }
+
+    def to_record(self) -> Dict[str, Any]:
+        """Serialize what is needed to run the job again after a restart."""
+        return {
+            "id": self.id,
+            "inputs": self.inputs,
+            "documents": self.documents,
+            "reuse_session_id": self.reuse_session_id,
+            "profile": self.profile,
+            "created": self.created,
+            "started": self.started,
+            "status": self.status,
+            "recoveries": self.recoveries,
+        }
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "Job":
+        return cls(
+            id=record["id"],
+            inputs=record["inputs"],
+            documents=record.get("documents"),
+            reuse_session_id=record.get("reuse_session_id"),
+            profile=record.get("profile", False),
+            created=record.get("created", time.time()),
+            recoveries=record.get("recoveries", 0),
+        )
+
+
+class JobJournal:
+    """
+    One JSON file per unfinished job under outputs/jobs/.
+
+    A job's file is written when it is queued and when it starts, and removed
+    once it completes or fails; files left behind by a shutdown or crash are
+    the jobs to resume on the next start.
+    """
+
+    def __init__(self, directory: Path = JOURNAL_DIR):
+        self.directory = Path(directory)
+
+    def save(self, job: Job) -> None:
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.directory / f"{job.id}.json.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(job.to_record(), f)
+            tmp_path.replace(self.directory / f"{job.id}.json")
+        except OSError as e:
+            logger.warning(f"Failed to journal job {job.id}: {e}")
+
+    def remove(self, job_id: str) -> None:
+        (self.directory / f"{job_id}.json").unlink(missing_ok=True)
+
+    def load(self) -> List[Dict[str, Any]]:
+        """Return the journaled jobs, oldest first."""
+        records = []
+        for path in self.directory.glob("*.json"):
+            try:
+                records.append(json.loads(path.read_text(encoding="utf-8")))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable job journal entry {path}: {e}")
+        return sorted(records, key=lambda record: record.get("created", 0))
+
+
+class JobManager:
+    """
+    Bounded queue of generation jobs served by a fixed number of workers.
+    """
+
+    def __init__(
+        self,
+        run_job: Callable[[Job], Dict[str, Any]],
+        max_workers: int = MAX_CONCURRENT_JOBS,
+        max_queued: int = MAX_QUEUED_JOBS,
+        journal: Optional[JobJournal] = None
+    ):
+        """
+        Args:
+            run_job: Blocking function executing a job and returning its result
+            max_workers: Number of jobs allowed to run at the same time
+            max_queued: Number of jobs allowed to wait for a worker
+            journal: Where unfinished jobs are persisted for recovery (none if omitted)
+        """
+        self.run_job = run_job
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.journal = journal
+        self.jobs: Dict[str, Job] = {}
+        self.running = 0
+        self.accepting = True
+        self.drain_deadline: Optional[float] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._workers: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """Start the worker tasks; must be called from the event loop."""
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="prd-job")
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_workers)]
+
+    def begin_drain(self, timeout: float = SHUTDOWN_DRAIN_SECONDS) -> None:
+        """
+        Stop accepting and starting jobs; running jobs get `timeout` seconds to finish.
+
+        Safe to call from a signal handler on the event loop thread.
+        """
+        if self.accepting:
+            self.accepting = False
+            self.drain_deadline = time.time() + timeout
+            logger.info(f"Draining: {self.running} running, {self.queue_depth} queued jobs")
+
+    async def drain(self, timeout: float = SHUTDOWN_DRAIN_SECONDS) -> None:
+        """
+        Wait for running jobs until the drain deadline, then stop the workers.
+
+        Jobs still running or queued at that point stay in the journal; their
+        completed tasks are already checkpointed in the session store, so they
+        resume from there on the next start.
+        """
+        self.begin_drain(timeout)
+        while self.running and time.time() < self.drain_deadline:
+            await asyncio.sleep(0.2)
+        if self.running:
+            logger.warning(f"Drain deadline passed with {self.running} jobs running; they will resume on restart")
+        await self.stop()
+
+    async def stop(self) -> None:
+        """Cancel the workers and shut down the thread pool."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of jobs waiting for a worker."""
+        return self._queue.qsize() if self._queue else 0
+
+    def submit(
+        self,
+        inputs: Dict[str, Any],
+        documents: Optional[List[str]] = None,
+        reuse_session_id: Optional[str] = None,
+        profile: bool = False
+    ) -> Job:
+        """
+        Queue a generation job.
+
+        Args:
+            inputs: Crew inputs
+            documents: Document filenames to produce (all documents if None)
+            reuse_session_id: Earlier session whose outputs may be reused
+            profile: Run the job under the profiler
+
+        Raises:
+            QueueFullError: If the queue is full
+        """
+        if self._queue is None:
+            raise RuntimeError("Job manager has not been started")
+        if not self.accepting:
+            raise ShuttingDownError("Service is shutting down and not accepting jobs")
+
+        job = Job(
+            id=uuid.uuid4().hex,
+            inputs=inputs,
+            documents=documents,
+            reuse_session_id=reuse_session_id,
+            profile=profile,
+        )
+        return self._enqueue(job)
+
+    def recover(self) -> List[Job]:
+        """
+        Re-queue the jobs a previous run left unfinished in the journal.
+
+        Returns:
+            The re-queued jobs; jobs past MAX_JOB_RECOVERIES are marked failed instead
+        """
+        if self.journal is None:
+            return []
+        recovered = []
+        for record in self.journal.load():
+            job = Job.from_record(record)
+            job.recoveries += 1
+            if job.recoveries > MAX_JOB_RECOVERIES:
+                job.status, job.finished = "failed", time.time()
+                job.error = f"Job was interrupted {job.recoveries} times; giving up"
+                job.done = asyncio.Event()
+                job.done.set()
+                self.jobs[job.id] = job
+                self.journal.remove(job.id)
+                logger.warning(f"Not resuming job {job.id}: {job.error}")
+                continue
+            try:
+                recovered.append(self._enqueue(job))
+            except QueueFullError:
+                logger.warning(f"Job queue is full; job {job.id} stays journaled for the next start")
+                break
+        if recovered:
+            logger.info(f"Resuming {len(recovered)} interrupted jobs")
+        return recovered
+
+    def _enqueue(self, job: Job) -> Job:
+        job.done = asyncio.Event()
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Job queue is full ({self.max_queued} jobs waiting)")
+
+        self.jobs[job.id] = job
+        if self.journal:
+            self.journal.save(job)
+        self._prune()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return a job by id."""
+        return self.jobs.get(job_id)
+
+    async def wait(self, job: Job) -> Job:
+        """Wait until a job has finished."""
+        await job.done.wait()
+        return job
+
+    def oldest_queued_age(self) -> Optional[float]:
+        """Seconds the longest-waiting queued job has been waiting, or None if the queue is empty."""
+        queued = [job.created for job in self.jobs.values() if job.status == "queued"]
+        return time.time() - min(queued) if queued else None
+
+    def uses_session(self, session_id: str) -> bool:
+        """Return True if a queued or running job writes to or reuses the session."""
+        return any(
+            session_id in (job.inputs.get("session_id"), job.reuse_session_id)
+            for job in list(self.jobs.values()) if job.finished is None
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue and worker counters."""
+        return {
+            "workers": self.max_workers,
+            "running": self.running,
+            "queued": self.queue_depth,
+            "max_queued": self.max_queued,
+            "accepting": self.accepting,
+        }
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            if not self.accepting:
+                # Left in the journal to start after the restart
+                job.status = "interrupted"
+                job.error = "Service shut down before the job started; it resumes on restart"
+                job.done.set()
+                self._queue.task_done()
+                continue
+
+            job.status = "running"
+            job.started = time.time()
+            self.running += 1
+            if self.journal:
+                self.journal.save(job)
+            try:
+                job.result = await loop.run_in_executor(self._executor, self.run_job, job)
+                job.status = "completed"
+            except asyncio.CancelledError:
+                job.status = "interrupted"
+                job.error = "Service shut down while the job was running; it resumes on restart"
+                raise
+            except Exception as e:
+                logger.exception(f"Job {job.id} failed")
+                job.status = "failed"
+                job.error = str(e)
+            finally:
+                if self.journal and job.status != "interrupted":
+                    self.journal.remove(job.id)
+                self.running -= 1
+                job.finished = time.time()
+                job.done.set()
+                self._queue.task_done()
+
+    def _prune(self) -> None:
+        """Forget the oldest finished jobs beyond MAX_FINISHED_JOBS."""
+        finished = [job for job in self.jobs.values() if job.finished is not None]
+        for job in sorted(finished, key=lambda job: job.finished)[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self.jobs[job.id]
@@ -0,0 +1,248 @@
+"""
+Local knowledge base retrieval.
+Text and Markdown files under knowledge/ are split into chunks and embedded
+with the hashing vectorizer of the warm start index, so no embedding service or
+vector database is involved. The chunks most similar to an idea are attached
+to the agents' prompts.
+
+Chunks and vectors are cached per file content hash, and the combined index is
+kept as a .npy file that is memory-mapped on load, so a restart with unchanged
+files only stats them.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from prd_generator.warm_start import DIMENSIONS, vectorize
+
+logger = logging.getLogger(__name__)
+
+KNOWLEDGE_DIR = Path(os.getenv("PRD_KNOWLEDGE_DIR", "knowledge"))
+KNOWLEDGE_INDEX_DIR = Path(os.getenv("PRD_KNOWLEDGE_INDEX_DIR", "outputs/knowledge_index"))
+MAX_MATCHES = int(os.getenv("PRD_KNOWLEDGE_MATCHES", "3"))                  # 0 disables retrieval
+MIN_SIMILARITY = float(os.getenv("PRD_KNOWLEDGE_MIN_SIMILARITY", "0.1"))    # cosine similarity
+CONTEXT_CHARS = int(os.getenv("PRD_KNOWLEDGE_CHARS", "2000"))               # all retrieved chunks together
+CHUNK_WORDS = 200
+CHUNK_OVERLAP = 40
+FILE_SUFFIXES = (".txt", ".md", ".markdown")
+
+CONTEXT_INPUT = "knowledge_context"
+NO_KNOWLEDGE = "None."
+
+# Part of every cache file name, so changing how files are chunked or embedded invalidates the cache
+_CACHE_VERSION = f"v1-{CHUNK_WORDS}-{CHUNK_OVERLAP}-{DIMENSIONS}"
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+def chunk_text(text: str, words: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """
+    Split text into chunks of at most `words` words.
+
+    Whole paragraphs are packed together where they fit; a paragraph longer
+    than a chunk is cut into windows overlapping by `overlap` words.
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        tokens = paragraph.split()
+        if not tokens:
+            continue
+        if current and len(current) + len(tokens) > words:
+            chunks.append(" ".join(current))
+            current = []
+        if len(tokens) <= words:
+            current.extend(tokens)
+            continue
+        step = max(words - overlap, 1)
+        for start in range(0, len(tokens) - overlap, step):
+            chunks.append(" ".join(tokens[start:start + words]))
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def _file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_atomic(path: Path, write) -> None:
+    """Write a file through a temporary name, so readers in other processes never see it half written."""
+    temporary = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(temporary, "wb") as f:
+            write(f)
+        os.replace(temporary, path)
+    finally:
+        temporary.unlink(missing_ok=True)
+
+
+class KnowledgeBase:
+    """
+    Chunked, embedded knowledge files with a memory-mapped vector index.
+
+    `load` (re)builds the index when files changed; `context` returns the
+    crew input holding the chunks most similar to a query.
+    """
+
+    def __init__(self, directory: Path = KNOWLEDGE_DIR, index_dir: Path = KNOWLEDGE_INDEX_DIR):
+        """
+        Args:
+            directory: Directory of knowledge files, searched recursively
+            index_dir: Directory holding the per-file cache and the combined index
+        """
+        self.directory = Path(directory)
+        self.index_dir = Path(index_dir)
+        self._lock = threading.Lock()
+        self._files: Dict[str, Dict[str, Any]] = {}     # relative path -> {"hash", "size", "mtime_ns"}
+        self._chunks: List[Dict[str, Any]] = []
+        self._matrix = np.zeros((0, DIMENSIONS), dtype=np.float32)
+        self._loaded = False
+
+    def _scan(self) -> Dict[str, os.stat_result]:
+        if not self.directory.is_dir():
+            return {}
+        return {
+            path.relative_to(self.directory).as_posix(): path.stat()
+            for path in sorted(self.directory.rglob("*"))
+            if path.is_file() and path.suffix.lower() in FILE_SUFFIXES
+        }
+
+    def _embedded_file(self, relative: str, content_hash: str) -> Tuple[List[str], np.ndarray]:
+        """Chunks and vectors of one file, from the cache or computed and cached."""
+        cache = self.index_dir / "files"
+        chunks_path = cache / f"{content_hash}-{_CACHE_VERSION}.json"
+        vectors_path = cache / f"{content_hash}-{_CACHE_VERSION}.npy"
+        try:
+            chunks = json.loads(chunks_path.read_text(encoding="utf-8"))
+            return chunks, np.load(vectors_path)
+        except (OSError, ValueError):
+            pass
+
+        text = (self.directory / relative).read_text(encoding="utf-8", errors="replace")
+        chunks = chunk_text(text)
+        vectors = np.stack([vectorize(chunk) for chunk in chunks]) if chunks else np.zeros((0, DIMENSIONS), dtype=np.float32)
+        cache.mkdir(parents=True, exist_ok=True)
+        _write_atomic(vectors_path, lambda f: np.save(f, vectors))
+        _write_atomic(chunks_path, lambda f: f.write(json.dumps(chunks).encode("utf-8")))
+        return chunks, vectors
+
+    def load(self) -> Dict[str, Any]:
+        """
+        Bring the index up to date with the knowledge directory.
+
+        Unchanged files (same size and modification time) are not even read; files
+        whose content hash has a cache entry are not chunked or embedded again.
+
+        Returns:
+            Files, chunks and how many files had to be embedded
+        """
+        with self._lock:
+            stats = self._scan()
+            index_path = self.index_dir / "index.json"
+            matrix_path = self.index_dir / "index.npy"
+            if not self._loaded:
+                try:
+                    index = json.loads(index_path.read_text(encoding="utf-8"))
+                    if index.get("version") == _CACHE_VERSION:
+                        self._files, self._chunks = index["files"], index["chunks"]
+                        self._matrix = np.load(matrix_path, mmap_mode="r")
+                except (OSError, ValueError, KeyError):
+                    self._files, self._chunks = {}, []
+                self._loaded = True
+
+            unchanged = {
+                relative for relative, stat in stats.items()
+                if relative in self._files
+                and (self._files[relative]["size"], self._files[relative]["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns)
+            }
+            if unchanged == set(stats) == set(self._files):
+                return self.stats()
+
+            files: Dict[str, Dict[str, Any]] = {}
+            chunks: List[Dict[str, Any]] = []
+            matrices: List[np.ndarray] = []
+            embedded = 0
+            for relative, stat in stats.items():
+                content_hash = self._files[relative]["hash"] if relative in unchanged else _file_hash(self.directory / relative)
+                if relative not in unchanged:
+                    cached = (self.index_dir / "files" / f"{content_hash}-{_CACHE_VERSION}.npy").exists()
+                    embedded += 0 if cached else 1
+                try:
+                    file_chunks, vectors = self._embedded_file(relative, content_hash)
+                except OSError as e:
+                    logger.warning(f"Skipping knowledge file {relative}: {e}")
+                    continue
+                files[relative] = {"hash": content_hash, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+                chunks.extend({"file": relative, "text": chunk} for chunk in file_chunks)
+                matrices.append(vectors)
+
+            matrix = np.vstack(matrices).astype(np.float32) if matrices else np.zeros((0, DIMENSIONS), dtype=np.float32)
+            self.index_dir.mkdir(parents=True, exist_ok=True)
+            _write_atomic(matrix_path, lambda f: np.save(f, matrix))
+            _write_atomic(index_path, lambda f: f.write(
+                json.dumps({"version": _CACHE_VERSION, "files": files, "chunks": chunks}).encode("utf-8")
+            ))
+            self._files, self._chunks = files, chunks
+            self._matrix = np.load(matrix_path, mmap_mode="r")
+            logger.info(f"Knowledge index rebuilt: {len(chunks)} chunks from {len(files)} files ({embedded} embedded)")
+            return {**self.stats(), "embedded_files": embedded}
+
+    def stats(self) -> Dict[str, Any]:
+        return {"files": len(self._files), "chunks": len(self._chunks)}
+
+    def search(self, query: str, limit: int = MAX_MATCHES, min_similarity: float = MIN_SIMILARITY) -> List[Dict[str, Any]]:
+        """
+        Chunks most similar to `query`, most similar first.
+
+        Returns:
+            Dicts with the chunk's file, text and similarity
+        """
+        if limit <= 0:
+            return []
+        self.load()
+        with self._lock:
+            matrix, chunks = self._matrix, self._chunks
+        if not len(chunks):
+            return []
+        scores = np.asarray(matrix @ vectorize(query))
+        top = np.argsort(-scores)[:limit]
+        return [
+            {**chunks[position], "similarity": round(float(scores[position]), 4)}
+            for position in top if scores[position] >= min_similarity
+        ]
+
+    def context(self, inputs: Dict[str, Any]) -> Dict[str, str]:
+        """
+        Crew input with the knowledge chunks relevant to a generation's idea.
+
+        Failures only cost the context: they are logged and the crew runs without it.
+        """
+        query = inputs.get("idea_description", "")
+        if inputs.get("selected_technologies"):
+            query += " " + json.dumps(inputs["selected_technologies"])
+        try:
+            matches = self.search(query)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Knowledge retrieval failed: {e}")
+            matches = []
+
+        blocks, size = [], 0
+        for match in matches:
+            block = f"[{match['file']}] {match['text']}"
+            if blocks and size + len(block) > CONTEXT_CHARS:
+                break
+            blocks.append(block[:CONTEXT_CHARS])
+            size += len(block)
+        return {CONTEXT_INPUT: "\n\n".join(blocks) or NO_KNOWLEDGE}
@@ -0,0 +1,306 @@
+"""
+Local OpenAI-compatible LLM stand-in for load and latency testing.
+Speaks the chat-completions API (streaming and non-streaming) with configurable
+time-to-first-token, token rate, error/429 injection and canned outputs per task,
+so the crew and the HTTP service can run offline with repeatable numbers.
+
+Point the crew at it with:
+    OPENAI_API_KEY=standin OPENAI_BASE_URL=http://127.0.0.1:8001/v1
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import yaml
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from prd_generator.task_graph import TASKS_CONFIG_PATH
+
+_TOKEN_PATTERN = re.compile(r"\S+\s*|\s+")
+
+
+@dataclass
+class StandinConfig:
+    """Behaviour of the stand-in server."""
+    ttft: float = 0.2                   # seconds before the first token
+    tokens_per_second: float = 500.0    # completion token rate after the first token
+    error_rate: float = 0.0             # fraction of requests answered with a 500
+    rate_limit_rate: float = 0.0        # fraction of requests answered with a 429
+    retry_after: float = 1.0            # Retry-After seconds sent with 429s
+    output_tokens: int = 400            # approximate length of generated canned outputs
+    reasoning_tokens: int = 0           # reasoning tokens reported in usage
+    rate_limit_requests: int = 1000     # advertised x-ratelimit-limit-requests
+    canned_dir: Optional[Path] = None   # directory of <task_name>.md overrides
+    seed: Optional[int] = None          # seed for repeatable error injection
+    model: str = "gpt-oss-120b"
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into whitespace-delimited pseudo tokens that join back losslessly."""
+    return _TOKEN_PATTERN.findall(text)
+
+
+class CannedOutputs:
+    """
+    Canned task outputs, matched to requests by the task description in the prompt.
+    """
+
+    def __init__(self, config: StandinConfig, tasks_config_path: Path = TASKS_CONFIG_PATH):
+        with open(tasks_config_path, "r", encoding="utf-8") as f:
+            tasks_config = yaml.safe_load(f)
+
+        self.markers: List[Tuple[str, str]] = []
+        self.outputs: Dict[str, str] = {}
+        for name, task_config in tasks_config.items():
+            description = (task_config.get("description") or "").strip()
+            self.markers.append((description.splitlines()[0].split("{")[0].strip(), name))
+
+            override = config.canned_dir / f"{name}.md" if config.canned_dir else None
+            if override and override.exists():
+                self.outputs[name] = override.read_text(encoding="utf-8")
+            else:
+                self.outputs[name] = self._synthesize(name, task_config.get("expected_output") or "", config.output_tokens)
+
+        self.default = self._synthesize("response", "", config.output_tokens)
+
+    @staticmethod
+    def _synthesize(name: str, expected_output: str, output_tokens: int) -> str:
+        """Build a markdown document with one section per expected output item."""
+        headings = [
+            re.sub(r"^[\d.\-\s]+", "", line).strip()
+            for line in expected_output.splitlines()
+            if re.match(r"^\s*(\d+\.|-)\s+", line)
+        ] or ["Summary"]
+        words_per_section = max(output_tokens // len(headings), 10)
+        filler = ("This section is generated by the local LLM stand-in for "
+                  "load and latency testing and contains no real analysis. ").split()
+        lines = [f"# {name.replace('_', ' ').title()}", ""]
+        for heading in headings:
+            lines.append(f"## {heading}")
+            lines.append(" ".join(filler[i % len(filler)] for i in range(words_per_section)))
+            lines.append("")
+        return "\n".join(lines).strip()
+
+    def match(self, messages: List[Dict[str, Any]]) -> Tuple[str, str]:
+        """Return (task name, canned output) for the task found in the messages."""
+        prompt = "\n".join(str(message.get("content") or "") for message in messages)
+        for marker, name in self.markers:
+            if marker and marker in prompt:
+                return name, self.outputs[name]
+        return "unknown", self.default
+
+
+class LLMStandin:
+    """
+    Request handling for the stand-in, kept separate from the ASGI app for reuse.
+    """
+
+    def __init__(self, config: StandinConfig):
+        self.config = config
+        self.canned = CannedOutputs(config)
+        self.random = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.stats: Dict[str, int] = {"requests": 0, "errors": 0, "rate_limited": 0, "completion_tokens": 0}
+        self.requests_by_task: Dict[str, int] = {}
+
+    def _roll(self) -> Optional[str]:
+        with self.lock:
+            self.stats["requests"] += 1
+            roll = self.random.random()
+        if roll < self.config.rate_limit_rate:
+            return "rate_limited"
+        if roll < self.config.rate_limit_rate + self.config.error_rate:
+            return "errors"
+        return None
+
+    def _rate_limit_headers(self) -> Dict[str, str]:
+        remaining = max(self.config.rate_limit_requests - self.stats["requests"] % self.config.rate_limit_requests, 0)
+        return {
+            "x-ratelimit-limit-requests": str(self.config.rate_limit_requests),
+            "x-ratelimit-remaining-requests": str(remaining),
+        }
+
+    def completion(self, body: Dict[str, Any]) -> Tuple[str, str, Dict[str, Any]]:
+        """Pick the reply for a request and compute its usage block."""
+        messages = body.get("messages") or []
+        task_name, output = self.canned.match(messages)
+        content = f"Thought: I now can give a great answer\nFinal Answer: {output}"
+
+        prompt_tokens = sum(len(tokenize(str(message.get("content") or ""))) for message in messages)
+        completion_tokens = len(tokenize(content))
+        with self.lock:
+            self.stats["completion_tokens"] += completion_tokens
+            self.requests_by_task[task_name] = self.requests_by_task.get(task_name, 0) + 1
+
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "completion_tokens_details": {"reasoning_tokens": self.config.reasoning_tokens},
+        }
+        return task_name, content, usage
+
+    def create_app(self) -> FastAPI:
+        """Build the ASGI app."""
+        app = FastAPI(title="LLM Stand-in", description="Local OpenAI-compatible chat-completions server")
+        config = self.config
+
+        @app.get("/v1/models")
+        async def list_models():
+            return {"object": "list", "data": [{"id": config.model, "object": "model", "owned_by": "standin"}]}
+
+        @app.get("/stats")
+        async def stats():
+            return {**self.stats, "by_task": self.requests_by_task}
+
+        @app.post("/v1/chat/completions")
+        async def chat_completions(request: Request):
+            body = await request.json()
+            failure = self._roll()
+            if failure == "rate_limited":
+                with self.lock:
+                    self.stats["rate_limited"] += 1
+                return JSONResponse(
+                    status_code=429,
+                    headers={"Retry-After": str(config.retry_after), **self._rate_limit_headers()},
+                    content={"error": {"message": "Rate limit exceeded (stand-in)", "type": "rate_limit_error", "code": "rate_limit_exceeded"}},
+                )
+            if failure == "errors":
+                with self.lock:
+                    self.stats["errors"] += 1
+                return JSONResponse(
+                    status_code=500,
+                    content={"error": {"message": "Injected server error (stand-in)", "type": "server_error", "code": "internal_error"}},
+                )
+
+            _, content, usage = self.completion(body)
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+            created = int(time.time())
+            model = body.get("model") or config.model
+            headers = self._rate_limit_headers()
+
+            if body.get("stream"):
+                include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+                return StreamingResponse(
+                    self._stream(completion_id, created, model, content, usage if include_usage else None),
+                    media_type="text/event-stream",
+                    headers=headers,
+                )
+
+            await asyncio.sleep(config.ttft + usage["completion_tokens"] / config.tokens_per_second)
+            return JSONResponse(headers=headers, content={
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+
+        return app
+
+    async def _stream(self, completion_id: str, created: int, model: str, content: str,
+                      usage: Optional[Dict[str, Any]]):
+        """Yield server-sent events paced by the configured TTFT and token rate."""
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, **extra) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                **extra,
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        await asyncio.sleep(self.config.ttft)
+        yield chunk({"role": "assistant", "content": ""})
+
+        interval = 1.0 / self.config.tokens_per_second
+        start = time.perf_counter()
+        for i, token in enumerate(tokenize(content)):
+            # Sleep against the schedule rather than per token to avoid drift
+            delay = start + i * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield chunk({"content": token})
+
+        yield chunk({}, finish_reason="stop")
+        if usage is not None:
+            yield f"data: {json.dumps({'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model, 'choices': [], 'usage': usage})}\n\n"
+        yield "data: [DONE]\n\n"
+
+
+def create_app(config: Optional[StandinConfig] = None) -> FastAPI:
+    """Create the stand-in ASGI app."""
+    return LLMStandin(config or StandinConfig()).create_app()
+
+
+def serve_in_thread(config: Optional[StandinConfig] = None, host: str = "127.0.0.1", port: int = 8001):
+    """
+    Start the stand-in in a background thread.
+
+    Returns:
+        Tuple of (uvicorn server, thread); set server.should_exit to stop it
+    """
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(create_app(config), host=host, port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="llm-standin", daemon=True)
+    thread.start()
+    while not server.started and thread.is_alive():
+        time.sleep(0.05)
+    return server, thread
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the stand-in server from the command line."""
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible LLM stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--ttft", type=float, default=StandinConfig.ttft, help="Time to first token (seconds)")
+    parser.add_argument("--tokens-per-second", type=float, default=StandinConfig.tokens_per_second)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests failing with 429")
+    parser.add_argument("--retry-after", type=float, default=StandinConfig.retry_after)
+    parser.add_argument("--output-tokens", type=int, default=StandinConfig.output_tokens)
+    parser.add_argument("--reasoning-tokens", type=int, default=0)
+    parser.add_argument("--canned-dir", type=Path, help="Directory with <task_name>.md canned outputs")
+    parser.add_argument("--seed", type=int, help="Seed for repeatable error injection")
+    args = parser.parse_args(argv)
+
+    config = StandinConfig(
+        ttft=args.ttft,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        output_tokens=args.output_tokens,
+        reasoning_tokens=args.reasoning_tokens,
+        canned_dir=args.canned_dir,
+        seed=args.seed,
+    )
+
+    import uvicorn
+
+    print(f"🧪 LLM stand-in listening on http://{args.host}:{args.port}/v1")
+    print(f"   export OPENAI_API_KEY=standin OPENAI_BASE_URL=http://{args.host}:{args.port}/v1")
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""
+Load generator for the PRD Agent HTTP service.
+Drives generation (synchronously or through the job API), /files, /download/{filename}
+and /download-all with open-loop arrival rates or closed-loop concurrency ramps,
+while probing /health, and reports throughput, latency histograms, error rates
+and queueing delay per stage.
+
+Usage:
+    prd_generator loadtest --base-url http://localhost:8000 --mode closed --ramp 1 2 4 8
+    prd_generator loadtest --mode open --ramp 0.5 1 2 --mix generate=1,files=5,download=5
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from prd_generator.benchmark import percentile
+
+DEFAULT_MIX = "generate=1,files=5,download=5,download_all=1"
+HISTOGRAM_BOUNDS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000, 300000]
+# Final job statuses and the error each is recorded as (None for success)
+JOB_OUTCOMES = {"completed": None, "failed": "job_failed", "interrupted": "job_interrupted"}
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """Parse 'op=weight,op=weight' into a weight mapping."""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in LoadGenerator.OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation '{name}'; choose from {sorted(LoadGenerator.OPERATIONS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+@dataclass
+class StageStats:
+    """Measurements collected during one stage of the ramp."""
+    stage: float
+    duration: float = 0.0
+    latencies: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: Dict[str, Dict[str, int]] = field(default_factory=lambda: defaultdict(lambda: defaultdict(int)))
+    client_queue_delays: List[float] = field(default_factory=list)
+    server_queue_delays: List[float] = field(default_factory=list)
+    health_latencies: List[float] = field(default_factory=list)
+    health_failures: int = 0
+
+    def record(self, operation: str, latency: float, error: Optional[str] = None) -> None:
+        self.latencies[operation].append(latency)
+        if error is not None:
+            self.errors[operation][error] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        """Summarize the stage as a JSON-serializable dictionary."""
+        operations = {}
+        for operation, samples in self.latencies.items():
+            error_count = sum(self.errors[operation].values())
+            operations[operation] = {
+                "requests": len(samples),
+                "throughput_per_second": round(len(samples) / self.duration, 3) if self.duration else 0.0,
+                "error_rate": round(error_count / len(samples), 4) if samples else 0.0,
+                "errors": dict(self.errors[operation]),
+                "p50_ms": round(percentile(samples, 50) * 1000, 2),
+                "p95_ms": round(percentile(samples, 95) * 1000, 2),
+                "p99_ms": round(percentile(samples, 99) * 1000, 2),
+                "histogram_ms": histogram(samples),
+            }
+        return {
+            "stage": self.stage,
+            "duration_seconds": round(self.duration, 2),
+            "operations": operations,
+            "client_queue_delay_p95_ms": round(percentile(self.client_queue_delays, 95) * 1000, 2),
+            "server_queue_wait_p95_ms": round(percentile(self.server_queue_delays, 95) * 1000, 2),
+            "health": {
+                "probes": len(self.health_latencies),
+                "failures": self.health_failures,
+                "p95_ms": round(percentile(self.health_latencies, 95) * 1000, 2),
+            },
+        }
+
+
+def histogram(samples: List[float]) -> Dict[str, int]:
+    """Bucket latency samples (seconds) into fixed millisecond buckets."""
+    labels = [f"<={bound}" for bound in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}"]
+    counts = [0] * len(labels)
+    for sample in samples:
+        ms = sample * 1000
+        counts[next((i for i, bound in enumerate(HISTOGRAM_BOUNDS_MS) if ms <= bound), len(labels) - 1)] += 1
+    return {label: count for label, count in zip(labels, counts) if count}
+
+
+class LoadGenerator:
+    """
+    Issues a weighted mix of requests against the service and records the results.
+    """
+
+    OPERATIONS = ("generate", "files", "download", "download_all", "health")
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.mix = args.mix
+        self.random = random.Random(args.seed)
+        self.filenames: List[str] = []
+        self.sequence = 0
+
+    def _pick_operation(self) -> str:
+        operations = list(self.mix)
+        return self.random.choices(operations, weights=[self.mix[op] for op in operations])[0]
+
+    async def _request(self, client: httpx.AsyncClient, stats: StageStats, operation: str) -> None:
+        start = time.perf_counter()
+        error = None
+        try:
+            if operation == "generate":
+                error = await self._generate(client, stats)
+            elif operation == "files":
+                response = await client.get("/files")
+                if response.status_code == 200:
+                    self.filenames = [f["filename"] for f in response.json().get("files", [])] or self.filenames
+                error = None if response.status_code == 200 else str(response.status_code)
+            elif operation == "download":
+                if not self.filenames:
+                    response = await client.get("/files")
+                    if response.status_code == 200:
+                        self.filenames = [f["filename"] for f in response.json().get("files", [])]
+                    else:
+                        error = f"files_{response.status_code}"     # the listing failed, not a download
+                if self.filenames:
+                    response = await client.get(f"/download/{self.random.choice(self.filenames)}")
+                    error = None if response.status_code == 200 else str(response.status_code)
+                elif error is None:
+                    error = "no_files"
+            elif operation == "download_all":
+                response = await client.get("/download-all")
+                error = None if response.status_code == 200 else str(response.status_code)
+            elif operation == "health":
+                response = await client.get("/health")
+                error = None if response.status_code == 200 else str(response.status_code)
+        except httpx.TimeoutException:
+            error = "timeout"
+        except httpx.HTTPError as e:
+            error = type(e).__name__
+        stats.record(operation, time.perf_counter() - start, error)
+
+    def _generation_body(self) -> Dict[str, Any]:
+        self.sequence += 1
+        body = {
+            "idea_description": self.args.idea,
+            "pricing_tier": "premium",
+            "session_id": f"loadtest_{int(time.time())}_{self.sequence}",
+        }
+        if self.args.documents:
+            body["documents"] = self.args.documents
+        return body
+
+    async def _generate(self, client: httpx.AsyncClient, stats: StageStats) -> Optional[str]:
+        if self.args.generate_via == "sync":
+            response = await client.post("/generate-prd", json=self._generation_body(), timeout=self.args.job_timeout)
+            return None if response.status_code == 200 else str(response.status_code)
+
+        response = await client.post("/jobs", json=self._generation_body())
+        if response.status_code != 202:
+            return str(response.status_code)
+        try:
+            status_url = response.json()["status_url"]
+        except (ValueError, KeyError):
+            return "invalid_response"
+
+        deadline = time.perf_counter() + self.args.job_timeout
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(self.args.poll_interval)
+            response = await client.get(status_url)
+            if response.status_code == 404:
+                return "job_not_found"      # pruned from the job store
+            if response.status_code != 200:
+                return str(response.status_code)
+            try:
+                job = response.json()
+            except ValueError:
+                return "invalid_response"
+            if job.get("status") in JOB_OUTCOMES:
+                if job.get("queue_wait_seconds") is not None:
+                    stats.server_queue_delays.append(job["queue_wait_seconds"])
+                return JOB_OUTCOMES[job["status"]]
+        return "job_timeout"
+
+    async def _probe_health(self, client: httpx.AsyncClient, stats: StageStats, stop: asyncio.Event) -> None:
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                response = await client.get("/health", timeout=self.args.health_timeout)
+                if response.status_code != 200:
+                    stats.health_failures += 1
+            except httpx.HTTPError:
+                stats.health_failures += 1
+            stats.health_latencies.append(time.perf_counter() - start)
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=self.args.health_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _closed_stage(self, client: httpx.AsyncClient, stats: StageStats, concurrency: int) -> None:
+        deadline = time.perf_counter() + self.args.stage_duration
+
+        async def user() -> None:
+            while time.perf_counter() < deadline:
+                await self._request(client, stats, self._pick_operation())
+
+        await asyncio.gather(*(user() for _ in range(int(concurrency))))
+
+    async def _open_stage(self, client: httpx.AsyncClient, stats: StageStats, rate: float) -> None:
+        semaphore = asyncio.Semaphore(self.args.max_in_flight)
+        deadline = time.perf_counter() + self.args.stage_duration
+        in_flight = []
+
+        async def arrival(scheduled: float) -> None:
+            async with semaphore:
+                stats.client_queue_delays.append(time.perf_counter() - scheduled)
+                await self._request(client, stats, self._pick_operation())
+
+        next_arrival = time.perf_counter()
+        while next_arrival < deadline:
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            in_flight.append(asyncio.create_task(arrival(next_arrival)))
+            next_arrival += self.random.expovariate(rate)
+        await asyncio.gather(*in_flight)
+
+    async def run(self) -> List[Dict[str, Any]]:
+        """Run every stage of the ramp and return their summaries."""
+        limits = httpx.Limits(max_connections=self.args.max_in_flight + 4)
+        summaries = []
+        async with httpx.AsyncClient(base_url=self.args.base_url, timeout=self.args.timeout, limits=limits) as client:
+            for stage in self.args.ramp:
+                stats = StageStats(stage=stage)
+                stop = asyncio.Event()
+                prober = asyncio.create_task(self._probe_health(client, stats, stop))
+                start = time.perf_counter()
+                if self.args.mode == "closed":
+                    await self._closed_stage(client, stats, stage)
+                else:
+                    await self._open_stage(client, stats, stage)
+                stats.duration = time.perf_counter() - start
+                stop.set()
+                await prober
+
+                summary = stats.summary()
+                summaries.append(summary)
+                print_stage(summary, self.args.mode)
+        return summaries
+
+
+def print_stage(summary: Dict[str, Any], mode: str) -> None:
+    """Print a human-readable stage report."""
+    unit = "concurrency" if mode == "closed" else "arrivals/s"
+    health = summary["health"]
+    health_flag = "❌" if health["failures"] else "✅"
+    print(f"\n📊 Stage {unit}={summary['stage']} ({summary['duration_seconds']}s)")
+    print(f"   {health_flag} /health: {health['probes']} probes, {health['failures']} failures, p95 {health['p95_ms']}ms")
+    print(f"   queueing delay p95: client {summary['client_queue_delay_p95_ms']}ms, server job queue {summary['server_queue_wait_p95_ms']}ms")
+    for operation, data in summary["operations"].items():
+        print(f"   {operation:<13} {data['requests']:>6} req  {data['throughput_per_second']:>8}/s  "
+              f"err {data['error_rate']:.1%}  p50 {data['p50_ms']}ms  p95 {data['p95_ms']}ms  p99 {data['p99_ms']}ms")
+        total = max(sum(data["histogram_ms"].values()), 1)
+        for bucket, count in data["histogram_ms"].items():
+            print(f"      {bucket:>9}ms {'#' * max(int(40 * count / total), 1)} {count}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Load test command line entry point."""
+    parser = argparse.ArgumentParser(prog="prd_generator loadtest", description="Load generator for the PRD Agent HTTP service")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed",
+                        help="closed: fixed concurrency per stage; open: Poisson arrivals per second")
+    parser.add_argument("--ramp", nargs="+", type=float, default=[1, 2, 4],
+                        help="Concurrency (closed) or arrival rate (open) for each stage")
+    parser.add_argument("--stage-duration", type=float, default=60.0, help="Seconds per stage")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"Request mix as op=weight pairs (default {DEFAULT_MIX})")
+    parser.add_argument("--generate-via", choices=["jobs", "sync"], default="jobs",
+                        help="Use the job API (POST /jobs) or the blocking /generate-prd endpoint")
+    parser.add_argument("--idea", default="A mobile app for tracking daily habits with social sharing and progress analytics")
+    parser.add_argument("--documents", nargs="+", help="Only generate these documents")
+    parser.add_argument("--max-in-flight", type=int, default=64, help="Open mode: cap on concurrent requests")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout (seconds)")
+    parser.add_argument("--job-timeout", type=float, default=900.0, help="Timeout for a generation to finish")
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--health-interval", type=float, default=1.0)
+    parser.add_argument("--health-timeout", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, help="Seed for the request mix and arrivals")
+    parser.add_argument("--json-out", help="Write the stage summaries to this JSON file")
+    args = parser.parse_args(argv)
+
+    summaries = asyncio.run(LoadGenerator(args).run())
+
+    failing = [s["stage"] for s in summaries if s["health"]["failures"]]
+    if failing:
+        print(f"\n⚠️  /health started failing at stage {failing[0]}")
+    else:
+        print("\n✅ /health stayed healthy through every stage")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"mode": args.mode, "stages": summaries}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
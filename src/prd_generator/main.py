@@ -1,9 +1,13 @@
 #!/usr/bin/env python
+import json
 import sys
 import warnings
 import os
 import asyncio
-from typing import Dict, Any, Optional
+import signal
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
 
 # Load environment variables from .env file
 try:
@@ -15,44 +19,221 @@ except ImportError:
 
 from datetime import datetime
 from fastapi import FastAPI, Request, Form, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 
-from prd_generator.crew import PrdGenerator
+from prd_generator.archives import ZipArchiver
+from prd_generator.content_store import ContentAddressedStorage
+from prd_generator.generation import GenerationService
+from prd_generator.health import llm_health, load_report
+from prd_generator.http_cache import MAX_CACHED_BODY_MB, BodyCache, cached_response, content_disposition, etag_matches
+from prd_generator.jobs import SHUTDOWN_DRAIN_SECONDS, Job, JobJournal, JobManager, QueueFullError
+from prd_generator.idea_classifier import IdeaProfile
+from prd_generator.knowledge import CONTEXT_INPUT, NO_KNOWLEDGE
+from prd_generator import metrics
+from prd_generator.profiling import wants_profile
+from prd_generator.retention import RetentionSweeper
+from prd_generator.runner import JobRequest, execute_job, warm_crew
+from prd_generator.search import InvalidQueryError
+from prd_generator.sessions import InvalidSessionError
+from prd_generator.storage import DocumentNotFoundError, StoredObject, check_key, get_storage
+from prd_generator.task_graph import UnknownDocumentError
+from prd_generator.tracing import Span
+from prd_generator.usage import UsageLedger
+from prd_generator.warm_start import empty_context
+from prd_generator.workers import WORKER_MODE, WorkerPool, memory_stats
+
+if TYPE_CHECKING:
+    from prd_generator.crew import PrdGenerator
 
 warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 
 app = FastAPI(title="PRD Agent System", description="AI-powered PRD and Development Guide Generator")
 crew_instance = None
+# Set once crews and LLM clients are warm (see warm_up); /ready reports it
+warmup_state: Dict[str, Any] = {"ready": False, "seconds": None, "error": None}
+_warmup_task: Optional[asyncio.Task] = None
+_backfill_task: Optional[asyncio.Task] = None
+
+# Each job worker thread owns one PrdGenerator, since a crew mutates its tasks while running
+_worker_crews = threading.local()
+
+
+def new_crew() -> "PrdGenerator":
+    """Build a PrdGenerator; crewAI is only imported here since it dominates cold start."""
+    from prd_generator.crew import PrdGenerator
+    return PrdGenerator()
+
+
+def worker_crew() -> "PrdGenerator":
+    """Return the PrdGenerator owned by the current worker thread."""
+    if getattr(_worker_crews, "instance", None) is None:
+        _worker_crews.instance = new_crew()
+    return _worker_crews.instance
+
+
+generation_service = GenerationService(worker_crew)
+document_catalog = generation_service.session_store.catalog
+search_index = generation_service.session_store.search_index
+warm_start_index = generation_service.session_store.warm_start
+usage_ledger = UsageLedger()
 
 # Create static directories
 outputs_dir = Path("outputs")
 outputs_dir.mkdir(exist_ok=True)
 static_dir = Path("static")
 static_dir.mkdir(exist_ok=True, parents=True)
+document_storage = get_storage()
+zip_archiver = ZipArchiver(document_storage)
+body_cache = BodyCache()
+# The page only changes with a deploy; its ETag lets browsers revalidate once this expires
+UI_MAX_AGE = int(os.getenv("PRD_UI_MAX_AGE", "86400"))
 
 @app.on_event("startup")
-async def create_crew():
-    """Create crew instance on startup to avoid repeated initialization."""
+async def start_jobs():
+    """Start the job workers and warm crews in the background so the server listens right away."""
+    global _warmup_task, _backfill_task
+    if worker_pool is not None:
+        worker_pool.start()
+    await job_manager.start()
+    job_manager.recover()
+    install_drain_handler()
+    _warmup_task = asyncio.create_task(asyncio.to_thread(warm_up))
+    _backfill_task = asyncio.create_task(asyncio.to_thread(backfill_catalog))
+    retention_sweeper.start()
+
+
+def backfill_catalog() -> None:
+    """Catalog and index sessions stored before the document catalog and the indexes existed (when empty)."""
+    session_store, task_graph = generation_service.session_store, generation_service.task_graph
+    try:
+        if document_catalog.is_empty():
+            recorded = document_catalog.backfill(session_store, task_graph)
+            if recorded:
+                print(f"📚 Cataloged {recorded} existing session documents")
+    except Exception as e:
+        print(f"⚠️ Document catalog backfill failed: {e}")
+    try:
+        if search_index.is_empty():
+            indexed = search_index.backfill(session_store, task_graph)
+            if indexed:
+                print(f"🔎 Indexed {indexed} existing session documents for search")
+    except Exception as e:
+        print(f"⚠️ Search index backfill failed: {e}")
+    try:
+        if warm_start_index.is_empty():
+            indexed = warm_start_index.backfill(session_store)
+            if indexed:
+                print(f"🧭 Indexed {indexed} existing task outputs for warm starts")
+    except Exception as e:
+        print(f"⚠️ Warm start index backfill failed: {e}")
+
+
+def warm_up() -> None:
+    """Build crews and import the LLM client stack (worker processes do this themselves)."""
     global crew_instance
-    crew_instance = PrdGenerator()
+    start = time.perf_counter()
+    try:
+        if worker_pool is not None:
+            worker_pool.wait_ready()
+        else:
+            crew_instance = warm_crew()
+            knowledge = generation_service.knowledge.load()
+            print(f"📖 Knowledge base: {knowledge['chunks']} chunks from {knowledge['files']} files")
+    except Exception as e:
+        warmup_state["error"] = str(e)
+        print(f"❌ Warm-up failed: {e}")
+        return
+    warmup_state.update(ready=True, seconds=round(time.perf_counter() - start, 3))
+    print(f"✅ Crews and LLM clients warmed up in {warmup_state['seconds']:.1f}s")
+
+
+def install_drain_handler() -> None:
+    """Stop accepting jobs as soon as SIGTERM arrives, then let uvicorn's own handler shut down."""
+    if threading.current_thread() is not threading.main_thread():
+        return
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def on_sigterm(signum, frame):
+        job_manager.begin_drain()
+        if callable(previous):
+            previous(signum, frame)
+
+    signal.signal(signal.SIGTERM, on_sigterm)
+
+
+@app.on_event("shutdown")
+async def stop_jobs():
+    """Drain the job queue: running jobs get until the drain deadline, the rest resume on restart."""
+    await job_manager.drain()
+    if worker_pool is not None:
+        remaining = max(job_manager.drain_deadline - time.time(), 1.0)
+        await asyncio.to_thread(worker_pool.shutdown, remaining)
+    await asyncio.to_thread(generation_service.writer.flush, 10)
+    await asyncio.to_thread(retention_sweeper.stop)
+
+
+@app.middleware("http")
+async def record_http_metrics(request: Request, call_next):
+    """Count requests and time them by route template."""
+    start = time.perf_counter()
+    status = 500
+    metrics.HTTP_IN_FLIGHT.inc()
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.HTTP_IN_FLIGHT.inc(-1)
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        metrics.HTTP_REQUESTS.inc(method=request.method, route=path, status=str(status))
+        metrics.HTTP_DURATION.observe(time.perf_counter() - start, method=request.method, route=path)
+
+
+@app.get("/metrics", summary="Prometheus Metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Expose service metrics in the Prometheus text format."""
+    return Response(content=await asyncio.to_thread(metrics.REGISTRY.render), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/live", summary="Liveness Probe")
+async def liveness_probe():
+    """Answer as soon as the event loop is serving requests."""
+    return {"status": "alive"}
+
+
+@app.get("/ready", summary="Readiness Probe")
+async def readiness_probe():
+    """Report ready once crews and LLM clients are warm; not ready while warming up or draining."""
+    if not job_manager.accepting:
+        status = "draining"
+    elif warmup_state["error"]:
+        status = "warmup_failed"
+    else:
+        status = "ready" if warmup_state["ready"] else "warming_up"
+    return JSONResponse(
+        status_code=200 if status == "ready" else 503,
+        content={"status": status, "warmup_seconds": warmup_state["seconds"], "error": warmup_state["error"]},
+    )
 
 
-@app.get("/health", summary="Health Check", description="Check if the PRD Agent service is running")
+@app.get("/health", summary="Health Check", description="Check if the PRD Agent service is running and how loaded it is")
 async def health_check():
-    """Health check endpoint for Railway monitoring."""
+    """Health check endpoint for Railway monitoring, with capacity signals for autoscaling."""
     return {
         "status": "healthy",
         "service": "PRD Agent System",
         "version": "1.0.0",
         "timestamp": datetime.now().isoformat(),
-        "status_code": 200
+        "status_code": 200,
+        "load": await asyncio.to_thread(current_load)
     }
 
 
 @app.get("/", response_class=HTMLResponse, summary="PRD Agent Web Interface")
-async def web_interface():
+async def web_interface(request: Request):
     """Serve the main web interface."""
     html_content = """
     <!DOCTYPE html>
@@ -292,7 +473,7 @@ async def web_interface():
                     showStatus('success', `✅ PRD Generation Complete!\\n\\n📊 Documents saved:\\n• Product Requirements Document\\n• Technology Stack Recommendations\\n• Planning & Setup Guide\\n• Technical Architecture Guide\\n• Development Environment Guide\\n• MVP Development Guide\\n• Testing & Quality Guide\\n• Deployment & Launch Guide\\n• Post-Launch Support Guide\\n• Quality Review Report\\n\\nAll files generated successfully!`);
 
                     // Load and display generated files
-                    await loadFiles();
+                    await loadFiles(result.session_id);
 
                 } catch (error) {
                     console.error('Generation error:', error);
@@ -321,9 +502,9 @@ async def web_interface():
                 statusContent.innerHTML = message.replace(/\\n/g, '<br>');
             }
 
-            async function loadFiles() {
+            async function loadFiles(sessionId) {
                 try {
-                    const response = await fetch('/files');
+                    const response = await fetch(sessionId ? `/files?session_id=${encodeURIComponent(sessionId)}` : '/files');
                     const data = await response.json();
 
                     if (data.files && data.files.length > 0) {
@@ -337,8 +518,8 @@ async def web_interface():
                             fileItem.innerHTML = `
                                 <div class="file-name">${file.filename}</div>
                                 <div class="file-actions">
-                                    <button class="download-btn" onclick="downloadFile('${file.filename}')">📥 Download</button>
-                                    <button class="copy-btn" onclick="copyFile('${file.filename}')">📋 Copy</button>
+                                    <button class="download-btn" onclick="downloadFile('${file.download_url}', '${file.filename}')">📥 Download</button>
+                                    <button class="copy-btn" onclick="copyFile('${file.copy_url}')">📋 Copy</button>
                                 </div>
                             `;
 
@@ -352,18 +533,18 @@ async def web_interface():
                 }
             }
 
-            async function downloadFile(filename) {
+            async function downloadFile(url, filename) {
                 const link = document.createElement('a');
-                link.href = `/download/${filename}`;
+                link.href = url;
                 link.download = filename;
                 document.body.appendChild(link);
                 link.click();
                 document.body.removeChild(link);
             }
 
-            async function copyFile(filename) {
+            async function copyFile(url) {
                 try {
-                    const response = await fetch(`/copy/${filename}`);
+                    const response = await fetch(url);
                     const data = await response.json();
 
                     await navigator.clipboard.writeText(data.content);
@@ -399,7 +580,146 @@ async def web_interface():
     </html>
     """
 
-    return HTMLResponse(content=html_content)
+    body = await asyncio.to_thread(body_cache.get, ("web_interface",), html_content.encode, "text/html; charset=utf-8")
+    return await asyncio.to_thread(
+        cached_response, request, body, {"Cache-Control": f"public, max-age={UI_MAX_AGE}"}
+    )
+
+
+def parse_generation_request(data: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[List[str]], Optional[str]]:
+    """Validate a generation request body and build the crew inputs."""
+    idea_description = data.get("idea_description", "")
+    pricing_tier = data.get("pricing_tier", "premium")
+    selected_technologies = data.get("selected_technologies", {})
+    timestamp = data.get("timestamp", datetime.now().isoformat())
+    session_id = data.get("session_id", f"api_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    documents = data.get("documents")
+    reuse_session_id = data.get("reuse_session_id")
+
+    if not idea_description or len(idea_description.strip()) < 10:
+        raise HTTPException(status_code=400, detail="Idea description is required (minimum 10 characters)")
+
+    if documents is not None and (not isinstance(documents, list) or not documents):
+        raise HTTPException(status_code=400, detail="documents must be a non-empty list of filenames")
+
+    try:
+        for document in documents or []:
+            generation_service.task_graph.task_for_document(document)
+        generation_service.session_store.validate(session_id)
+        if reuse_session_id:
+            generation_service.session_store.validate(reuse_session_id)
+    except (UnknownDocumentError, InvalidSessionError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if reuse_session_id:
+        check_not_evicted(reuse_session_id)
+
+    inputs = {
+        'idea_description': idea_description.strip(),
+        'pricing_tier': pricing_tier,
+        'selected_technologies': selected_technologies,
+        'timestamp': timestamp,
+        'session_id': session_id
+    }
+    return inputs, documents, reuse_session_id
+
+
+def run_generation_job(job: Job) -> Dict[str, Any]:
+    """Run a queued generation on a worker process or thread (this may take several minutes)."""
+    print(f"🚀 Processing PRD request (Tier: {job.inputs['pricing_tier']}): {job.inputs['idea_description'][:100]}...")
+    if job.inputs['selected_technologies']:
+        print(f"Selected technologies: {job.inputs['selected_technologies']}")
+
+    request = JobRequest(
+        job_id=job.id,
+        inputs=job.inputs,
+        documents=job.documents,
+        reuse_session_id=job.reuse_session_id,
+        profile=job.profile,
+        queue_wait=job.queue_wait,
+        resumed=job.recoveries > 0,
+    )
+    if worker_pool is not None:
+        outcome = worker_pool.run(request)
+    else:
+        outcome = execute_job(request, generation_service)
+
+    for span in outcome["spans"]:
+        metrics.observe_span(Span.from_dict(span))
+    job.usage = usage_ledger.add(outcome["usage"])
+    job.profile_info = outcome["profile_info"]
+    print(f"🔢 Job {job.id} used {job.usage['total_tokens']} tokens (${job.usage['cost_usd']:.4f})")
+
+    if outcome["status"] != "completed":
+        raise RuntimeError(outcome["error"])
+    return {**outcome["result"], "usage": job.usage}
+
+
+job_manager = JobManager(run_generation_job, journal=JobJournal())
+# Crews run in recycled worker subprocesses unless PRD_WORKER_MODE=thread
+worker_pool = WorkerPool(job_manager.max_workers) if WORKER_MODE == "process" else None
+# Evicts sessions by age, size and LRU; sessions with a pending job are never touched
+retention_sweeper = RetentionSweeper(generation_service.session_store, document_storage, is_active=job_manager.uses_session)
+metrics.REGISTRY.gauge("prd_jobs_queued", "Jobs waiting for a worker", callback=lambda: [({}, job_manager.queue_depth)])
+metrics.REGISTRY.gauge("prd_jobs_running", "Jobs currently running", callback=lambda: [({}, job_manager.running)])
+metrics.REGISTRY.gauge("prd_job_workers", "Configured job workers", callback=lambda: [({}, job_manager.max_workers)])
+metrics.REGISTRY.gauge("prd_job_queue_capacity", "Maximum number of queued jobs", callback=lambda: [({}, job_manager.max_queued)])
+metrics.REGISTRY.gauge("prd_worker_rss_bytes", "Resident memory of each job worker process", ("worker",), callback=lambda: [
+    ({"worker": str(worker["worker_id"])}, worker["rss_mb"] * 2**20) for worker in (worker_pool.snapshot() if worker_pool else [])
+])
+metrics.REGISTRY.gauge("prd_process_rss_bytes", "Resident memory of the API process", callback=lambda: [({}, memory_stats()["rss_bytes"])])
+metrics.REGISTRY.gauge("prd_http_body_cache_bytes", "Cached response bodies and their compressed variants", callback=lambda: [
+    ({}, body_cache.stats()["bytes"])
+])
+metrics.REGISTRY.gauge("prd_retained_session_bytes", "Size of retained sessions as of the last retention sweep", callback=lambda: (
+    [({}, retention_sweeper.last_sweep["retained"]["bytes"])] if retention_sweeper.last_sweep else []
+))
+
+
+def current_load(poll_workers: bool = True) -> Dict[str, Any]:
+    """
+    Capacity and saturation signals reported by /health.
+
+    Reads the disk and, with `poll_workers`, the worker pipes: call it off the
+    event loop. Without it, worker states are the last ones observed.
+    """
+    if worker_pool is None:
+        worker_states = None
+    else:
+        workers = worker_pool.stats()["workers"] if poll_workers else worker_pool.snapshot()
+        worker_states = [worker["state"] for worker in workers]
+    return load_report(job_manager.stats(), job_manager.oldest_queued_age(), outputs_dir, worker_states)
+
+
+metrics.REGISTRY.gauge("prd_oldest_queued_job_age_seconds", "Age of the longest-waiting queued job", callback=lambda: [
+    ({}, job_manager.oldest_queued_age() or 0)
+])
+metrics.REGISTRY.gauge("prd_llm_latency_ewma_seconds", "Exponentially weighted moving average of LLM call latency", callback=lambda: (
+    [({}, llm_health.ewma_latency)] if llm_health.ewma_latency is not None else []
+))
+metrics.REGISTRY.gauge("prd_llm_ratelimit_headroom_ratio", "Fraction of the provider rate limit remaining", callback=lambda: (
+    [({}, llm_health.headroom())] if llm_health.headroom() is not None else []
+))
+metrics.REGISTRY.gauge("prd_suggested_replica_delta", "Replicas to add (or remove, if negative) suggested by /health", callback=lambda: [
+    ({}, current_load(poll_workers=False)["scaling"]["delta"])
+])
+
+
+def worker_stats() -> Dict[str, Any]:
+    """Per-worker memory and recycling stats."""
+    if worker_pool is not None:
+        return worker_pool.stats()
+    return {"mode": "thread", "workers": [{"pid": os.getpid(), **memory_stats()}]}
+
+
+def submit_generation_job(data: Dict[str, Any], profile: bool = False) -> Job:
+    """Validate a request body and queue it as a job."""
+    inputs, documents, reuse_session_id = parse_generation_request(data)
+
+    # Jobs submitted while warming up simply wait in the queue
+    try:
+        return job_manager.submit(inputs, documents=documents, reuse_session_id=reuse_session_id, profile=profile)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
 
 
 @app.post("/generate-prd", summary="Generate PRD", description="Generate a complete PRD and development guide for your idea")
@@ -407,99 +727,272 @@ async def generate_prd(request: Request):
     """Generate PRD and development guide for the given idea."""
     try:
         data = await request.json()
-        idea_description = data.get("idea_description", "")
-        pricing_tier = data.get("pricing_tier", "premium")
-        selected_technologies = data.get("selected_technologies", {})
-        timestamp = data.get("timestamp", datetime.now().isoformat())
-        session_id = data.get("session_id", f"api_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
-
-        if not idea_description or len(idea_description.strip()) < 10:
-            raise HTTPException(status_code=400, detail="Idea description is required (minimum 10 characters)")
-
-        print(f"🚀 Processing PRD request (Tier: {pricing_tier}): {idea_description[:100]}...")
-        if selected_technologies:
-            print(f"Selected technologies: {selected_technologies}")
-
-        # Prepare inputs
-        inputs = {
-            'idea_description': idea_description.strip(),
-            'pricing_tier': pricing_tier,
-            'selected_technologies': selected_technologies,
-            'timestamp': timestamp,
-            'session_id': session_id
-        }
+        job = await job_manager.wait(submit_generation_job(data, profile=wants_profile(request.headers)))
 
-        # Use the global crew instance
-        if crew_instance is None:
-            raise HTTPException(status_code=500, detail="PRD Generator service not initialized")
-
-        # Generate documents (this may take several minutes)
-        result = crew_instance.crew().kickoff(inputs=inputs)
-
-        tier_msg = " (Free Tier)" if pricing_tier == "free" else " (Premium)"
-        return {
-            "status": "completed",
-            "message": f"PRD and development guide generated successfully{tier_msg}",
-            "session_id": session_id,
-            "timestamp": timestamp,
-            "pricing_tier": pricing_tier,
-            "result_summary": f"Generated: PRD, Technology Stack, Planning Setup, Technical Architecture, Development Environment, MVP Development, Testing Quality, Deployment Launch, Post-Launch Support, Quality Review{tier_msg}"
-        }
+        if job.status == "interrupted":
+            raise HTTPException(status_code=503, detail=f"{job.error}; poll /jobs/{job.id}", headers={"Retry-After": "30"})
+        if job.status == "failed":
+            raise Exception(job.error)
+        return job.result
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ PRD Generation error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"PRD generation failed: {str(e)}")
 
 
+@app.post("/jobs", status_code=202, summary="Queue PRD Generation", description="Queue a generation job and return immediately")
+async def create_job(request: Request):
+    """Queue a generation job; poll /jobs/{job_id} for its status and result."""
+    data = await request.json()
+    job = submit_generation_job(data, profile=wants_profile(request.headers))
+    return {**job.to_dict(), "status_url": f"/jobs/{job.id}"}
+
+
+@app.get("/jobs/{job_id}", summary="Job Status")
+async def get_job(job_id: str):
+    """Return the status, queue wait and result of a generation job."""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}/profile", summary="Job Profile")
+async def get_job_profile(job_id: str, format: str = "text"):
+    """Return the profile of a profiled job as a text report, or the raw pstats file with format=pstats."""
+    job = job_manager.get(job_id)
+    if job is None or not job.profile:
+        raise HTTPException(status_code=404, detail="No profile for this job")
+    if job.finished is None:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}; the profile is written when it finishes")
+    info = job.profile_info or {}
+    path = info.get("pstats_path") if format == "pstats" else info.get("report_path") if format == "text" else None
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not available")
+    if not Path(path).exists():
+        # Profiles are stored with the session's outputs
+        check_not_evicted(job.inputs["session_id"])
+        raise HTTPException(status_code=404, detail="Profile not available")
+    if format == "pstats":
+        return FileResponse(path, media_type="application/octet-stream", filename=f"{job_id}.prof")
+    return PlainTextResponse(Path(path).read_text(encoding="utf-8"))
+
+
+@app.get("/jobs", summary="List Jobs")
+async def list_jobs():
+    """List known jobs with queue and worker counters."""
+    return {
+        "jobs": [job.to_dict() for job in job_manager.jobs.values()],
+        **job_manager.stats()
+    }
+
+
+@app.get("/workers", summary="Worker Stats")
+async def list_workers():
+    """Report memory, job counts and recycling of the job workers."""
+    return await asyncio.to_thread(worker_stats)
+
+
+@app.get("/usage", summary="Token Usage")
+async def token_usage(session_id: Optional[str] = None, pricing_tier: Optional[str] = None):
+    """
+    Aggregate token usage and cost of finished jobs per session, pricing tier and task,
+    and the LLM calls and tokens of warm-startable tasks with and without reference context.
+    """
+    return usage_ledger.aggregate(session_id=session_id, pricing_tier=pricing_tier)
+
+
+@app.get("/storage", summary="Document Storage Stats")
+async def storage_stats(scan: bool = False):
+    """
+    Document storage backend, background writer and compression stats.
+
+    Compression and read latency figures are this process's; `scan=true` also
+    totals every stored document's logical and compressed size.
+    """
+    report: Dict[str, Any] = {"backend": document_storage.name, "writer": generation_service.writer.stats()}
+    if isinstance(document_storage, ContentAddressedStorage):
+        report["compression"] = await asyncio.to_thread(document_storage.stats, scan)
+    return report
+
+
+@app.get("/retention", summary="Output Retention")
+async def retention_stats():
+    """Retention limits and the report of the last sweep (evictions, freed bytes, retained size)."""
+    return retention_sweeper.stats()
+
+
 @app.get("/files", summary="List Generated Files")
-async def list_generated_files():
-    """List all generated files in the outputs directory."""
+async def list_generated_files(
+    session_id: Optional[str] = None,
+    pricing_tier: Optional[str] = None,
+    sort: str = "updated",
+    order: str = "desc",
+    limit: int = 50,
+    cursor: Optional[str] = None,
+):
+    """
+    List generated documents from the document catalog, one page at a time.
+
+    Pass the returned `next_cursor` as `cursor` to get the next page; `sort`
+    is one of updated, created, size, filename or session_id.
+    """
     try:
-        files = []
-        if outputs_dir.exists():
-            for file_path in outputs_dir.glob("*.md"):
-                stat = file_path.stat()
-                files.append({
-                    "filename": file_path.name,
-                    "size": stat.st_size,
-                    "modified": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                    "download_url": f"/download/{file_path.name}",
-                    "copy_url": f"/copy/{file_path.name}"
-                })
-
-        return {
-            "files": files,
-            "total": len(files)
+        page = await asyncio.to_thread(
+            document_catalog.list, session_id=session_id, pricing_tier=pricing_tier,
+            sort=sort, order=order, limit=limit, cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to list files: {str(e)}")
+    if session_id is not None:
+        if not page["total"]:
+            check_not_evicted(session_id)
+        await asyncio.to_thread(document_catalog.touch, session_id)
+
+    files = [
+        {
+            "filename": document["filename"],
+            "session_id": document["session_id"],
+            "task": document["task_name"],
+            "size": document["size"],
+            "hash": document["hash"],
+            "pricing_tier": document["pricing_tier"],
+            "created": datetime.fromtimestamp(document["created"]).isoformat(),
+            "modified": datetime.fromtimestamp(document["updated"]).isoformat(),
+            "download_url": f"/download/{document['filename']}?session_id={document['session_id']}",
+            "copy_url": f"/copy/{document['filename']}?session_id={document['session_id']}"
         }
+        for document in page["documents"]
+    ]
+    return {
+        "files": files,
+        "total": page["total"],
+        "next_cursor": page["next_cursor"]
+    }
+
+
+@app.get("/search", summary="Search Documents")
+async def search_documents(
+    q: str,
+    session_id: Optional[str] = None,
+    pricing_tier: Optional[str] = None,
+    limit: int = 10,
+    offset: int = 0,
+):
+    """
+    Full-text search over generated documents, best matches first.
 
+    `q` supports "exact phrases", OR, NOT and prefix* terms; each result has a
+    snippet with the matched terms in <mark> tags and its download and copy URLs.
+    """
+    try:
+        page = await asyncio.to_thread(
+            search_index.search, q, session_id=session_id, pricing_tier=pricing_tier, limit=limit, offset=offset
+        )
+    except InvalidQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to list files: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+
+    results = [
+        {
+            **result,
+            "updated": datetime.fromtimestamp(result["updated"]).isoformat(),
+            "download_url": f"/download/{result['filename']}?session_id={result['session_id']}",
+            "copy_url": f"/copy/{result['filename']}?session_id={result['session_id']}"
+        }
+        for result in page["results"]
+    ]
+    return {
+        "query": q,
+        "results": results,
+        "has_more": page["has_more"],
+        "ranked_recent_only": page["ranked_recent_only"]
+    }
 
 
-@app.get("/download-all", summary="Download All Files as ZIP")
-async def download_all_files():
-    """Create and download a ZIP file containing all generated documents."""
+def check_not_evicted(session_id: str) -> None:
+    """Raise 410 Gone if the retention sweeper evicted the session."""
+    eviction = document_catalog.eviction(session_id)
+    if eviction is not None:
+        evicted = datetime.fromtimestamp(eviction["evicted"]).isoformat(timespec="seconds")
+        raise HTTPException(
+            status_code=410,
+            detail=f"Session {session_id} was evicted on {evicted} ({eviction['reason']}); generate it again"
+        )
+
+
+def document_missing(session_id: Optional[str]) -> HTTPException:
+    """410 if the document's session was evicted, else 404."""
+    if session_id is not None:
+        try:
+            check_not_evicted(session_id)
+        except HTTPException as e:
+            return e
+    return HTTPException(status_code=404, detail="File not found")
+
+
+def resolve_document(filename: str, session_id: Optional[str]) -> StoredObject:
+    """
+    Stored latest-run document `filename`, or a session's document when `session_id` is given.
+
+    Raises:
+        HTTPException: 400 for an invalid session id, 404 for an unknown document,
+            410 for a document of an evicted session
+    """
+    if session_id is None:
+        key = filename
+    else:
+        try:
+            generation_service.session_store.validate(session_id)
+        except InvalidSessionError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        document = document_catalog.get(session_id, filename)
+        key = f"sessions/{session_id}/{document['task_name']}.md" if document else None
     try:
-        import zipfile
-        import io
+        stored = document_storage.stat(check_key(key)) if key else None
+    except ValueError:
+        stored = None
+    if stored is None:
+        raise document_missing(session_id)
+    if session_id is not None:
+        document_catalog.touch(session_id)
+    return stored
 
-        # Create in-memory ZIP file
-        zip_buffer = io.BytesIO()
 
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            if outputs_dir.exists():
-                for file_path in outputs_dir.glob("*.md"):
-                    # Add file to ZIP with relative path
-                    zip_file.write(str(file_path), file_path.name)
+@app.get("/download-all", summary="Download All Files as ZIP")
+async def download_all_files(request: Request):
+    """
+    Download a ZIP file containing all generated documents.
 
-        zip_buffer.seek(0)
+    The archive is identified by a hash of its members' contents, sent as the
+    ETag; a previously built archive is served from disk, otherwise it is
+    compressed off the event loop and streamed while being written.
+    """
+    try:
+        members = await asyncio.to_thread(zip_archiver.members)
+        key = await asyncio.to_thread(zip_archiver.archive_key, members)
+        etag = f'"{key}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+        if etag_matches(request.headers.get("if-none-match"), [etag]):
+            metrics.ARCHIVE_CACHE.inc(result="not_modified")
+            return Response(status_code=304, headers=headers)
 
-        # Return ZIP file as response
-        from fastapi.responses import StreamingResponse
+        cached = await asyncio.to_thread(zip_archiver.cached_path, key)
+        if cached is not None:
+            metrics.ARCHIVE_CACHE.inc(result="hit")
+            return FileResponse(cached, media_type="application/zip", filename="prd_documents.zip", headers=headers)
+
+        metrics.ARCHIVE_CACHE.inc(result="miss")
         return StreamingResponse(
-            io.BytesIO(zip_buffer.getvalue()),
-            media_type='application/zip',
-            headers={"Content-Disposition": "attachment; filename=prd_documents.zip"}
+            zip_archiver.stream(members, key),
+            media_type="application/zip",
+            headers={**headers, "Content-Disposition": "attachment; filename=prd_documents.zip"},
         )
 
     except Exception as e:
@@ -507,47 +1000,69 @@ async def download_all_files():
 
 
 @app.get("/download/{filename}", summary="Download File")
-async def download_file(filename: str):
-    """Download a generated file."""
+async def download_file(filename: str, request: Request, session_id: Optional[str] = None):
+    """Download a generated file (of a session, if given); supports If-None-Match, Range and gzip/brotli."""
     try:
-        file_path = outputs_dir / filename
-        if not file_path.exists():
-            raise HTTPException(status_code=404, detail="File not found")
-
-        from fastapi.responses import FileResponse
-        return FileResponse(
-            path=str(file_path),
-            media_type='application/octet-stream',
-            filename=filename
+        stored = await asyncio.to_thread(resolve_document, filename, session_id)
+
+        local_path = document_storage.local_path(stored.key)
+        if stored.size > MAX_CACHED_BODY_MB * 2**20 and local_path is not None:
+            return FileResponse(path=str(local_path), media_type='application/octet-stream', filename=filename)
+
+        body = await asyncio.to_thread(
+            body_cache.get, ("download", stored.key, stored.size, stored.modified),
+            lambda: document_storage.get(stored.key), "application/octet-stream"
+        )
+        return await asyncio.to_thread(
+            cached_response, request, body,
+            {"Content-Disposition": content_disposition(filename), "Cache-Control": "no-cache"}, allow_range=True,
         )
 
+    except HTTPException:
+        raise
+    except DocumentNotFoundError:
+        # Deleted after it was resolved, e.g. by the retention sweeper
+        raise document_missing(session_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to download file: {str(e)}")
 
 
 @app.get("/copy/{filename}", summary="Copy File Content")
-async def copy_file(filename: str):
-    """Return file content for copying."""
+async def copy_file(filename: str, request: Request, session_id: Optional[str] = None):
+    """Return file content (of a session's document, if given) for copying."""
     try:
-        file_path = outputs_dir / filename
-        if not file_path.exists():
-            raise HTTPException(status_code=404, detail="File not found")
-
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        return JSONResponse(content={
-            "filename": filename,
-            "content": content,
-            "size": len(content)
-        })
+        stored = await asyncio.to_thread(resolve_document, filename, session_id)
+
+        def load() -> bytes:
+            content = document_storage.get(stored.key).decode('utf-8')
+            return json.dumps({
+                "filename": filename,
+                "content": content,
+                "size": len(content)
+            }).encode("utf-8")
+
+        body = await asyncio.to_thread(
+            body_cache.get, ("copy", stored.key, stored.size, stored.modified), load, "application/json"
+        )
+        return await asyncio.to_thread(cached_response, request, body, {"Cache-Control": "no-cache"})
 
+    except HTTPException:
+        raise
+    except DocumentNotFoundError:
+        raise document_missing(session_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to copy file content: {str(e)}")
 
 
 def run():
-    """Run the web service."""
+    """Run the web service, the load generator (`prd_generator loadtest ...`) or the trace viewer (`prd_generator trace ...`)."""
+    if len(sys.argv) > 1 and sys.argv[1] == "loadtest":
+        from prd_generator.loadtest import main as loadtest_main
+        sys.exit(loadtest_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "trace":
+        from prd_generator.tracing import main as trace_main
+        sys.exit(trace_main(sys.argv[2:]))
+
     print("🚀 Starting PRD Agent Web Service...")
     import uvicorn
 
@@ -563,7 +1078,9 @@ def run():
         host=host,
         port=port,
         log_level="info",
-        reload=False
+        reload=False,
+        # Requests waiting on a running job get the same deadline as the job drain
+        timeout_graceful_shutdown=int(SHUTDOWN_DRAIN_SECONDS)
     )
 
 
@@ -571,13 +1088,18 @@ def train():
     """Train the crew for a given number of iterations."""
     inputs = {
         "idea_description": "Training session for PRD generation",
+        'pricing_tier': 'premium',
+        'selected_technologies': {},
         'timestamp': datetime.now().isoformat(),
-        'session_id': f"train_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        'session_id': f"train_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+        **empty_context(),
+        CONTEXT_INPUT: NO_KNOWLEDGE,
+        **IdeaProfile().inputs()
     }
     try:
         global crew_instance
         if crew_instance is None:
-            crew_instance = PrdGenerator()
+            crew_instance = new_crew()
         crew_instance.crew().train(n_iterations=int(sys.argv[1]), filename=sys.argv[2], inputs=inputs)
 
     except Exception as e:
@@ -589,7 +1111,7 @@ def replay():
     try:
         global crew_instance
         if crew_instance is None:
-            crew_instance = PrdGenerator()
+            crew_instance = new_crew()
         crew_instance.crew().replay(task_id=sys.argv[1])
 
     except Exception as e:
@@ -600,14 +1122,19 @@ def test():
     """Test the crew execution and returns the results."""
     inputs = {
         "idea_description": "Test session for PRD generation",
+        'pricing_tier': 'premium',
+        'selected_technologies': {},
         'timestamp': datetime.now().isoformat(),
-        'session_id': f"test_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        'session_id': f"test_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+        **empty_context(),
+        CONTEXT_INPUT: NO_KNOWLEDGE,
+        **IdeaProfile().inputs()
     }
 
     try:
         global crew_instance
         if crew_instance is None:
-            crew_instance = PrdGenerator()
+            crew_instance = new_crew()
         crew_instance.crew().test(n_iterations=int(sys.argv[1]), eval_llm=sys.argv[2], inputs=inputs)
 
     except Exception as e:
@@ -0,0 +1,280 @@
+"""
+Per-session agent memory without an embedding service.
+CrewAI's built-in memory needs ChromaDB and an embedder, and only fills entity
+memory through an extra LLM evaluation call per task. These storages plug into
+CrewAI's short-term and entity memory instead: task outputs are split into
+passages, facts are read from their Markdown structure, and both are recalled
+with the hashing vectorizer of the warm start index.
+
+Each session's memory is a pair of bounded NumPy matrices held in process; the
+least recently used sessions are dropped first. A session's memory is rebuilt
+from the task outputs a generation reuses, so it does not depend on which
+process ran the earlier tasks.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from prd_generator.warm_start import DIMENSIONS, vectorize
+
+logger = logging.getLogger(__name__)
+
+MEMORY_ENABLED = os.getenv("PRD_AGENT_MEMORY", "true").lower() == "true"
+MAX_SESSIONS = int(os.getenv("PRD_MEMORY_SESSIONS", "64"))               # sessions kept per process
+MAX_PASSAGES = int(os.getenv("PRD_MEMORY_PASSAGES", "200"))              # short-term items per session
+MAX_ENTITIES = int(os.getenv("PRD_MEMORY_ENTITIES", "300"))              # entities per session
+MAX_RESULTS = int(os.getenv("PRD_MEMORY_RESULTS", "3"))                  # per memory type and task prompt
+MIN_SIMILARITY = float(os.getenv("PRD_MEMORY_MIN_SIMILARITY", "0.15"))   # cosine similarity
+PASSAGE_CHARS = 600
+ENTITY_CHARS = 240
+
+_HEADING = re.compile(r"^#{1,6}\s+(.+?)\s*#*\s*$")
+# "- **Name**: description", "- **Name** - description" or "- Name: description"
+_FACT = re.compile(r"^\s*(?:[-*+]|\d+\.)\s+(?:\*\*(.+?)\*\*\s*:?\s*[:\-–—]?|([A-Z][\w .+/#&()-]{1,40}):)\s*(.+)$")
+_LIST_ITEM = re.compile(r"^\s*(?:[-*+]|\d+\.)\s+(.{3,80})$")
+
+
+def split_passages(text: str, chars: int = PASSAGE_CHARS) -> List[str]:
+    """
+    Split text into passages of about `chars` characters.
+
+    Paragraphs are packed together where they fit and kept verbatim, so a passage
+    can be recognized inside a prompt that already quotes its document.
+    """
+    passages: List[str] = []
+    current = ""
+    for paragraph in text.split("\n\n"):
+        if not paragraph.strip():
+            continue
+        if current and len(current) + len(paragraph) + 2 > chars:
+            passages.append(current)
+            current = ""
+        if len(paragraph) > chars:
+            passages.extend(paragraph[start:start + chars] for start in range(0, len(paragraph), chars))
+            continue
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        passages.append(current)
+    return passages
+
+
+def extract_entities(text: str) -> List[Dict[str, str]]:
+    """
+    Facts stated as list items, typed by the heading they appear under.
+
+    A labelled item ("- **Redis**: session cache") names its entity; a short
+    unlabelled item ("- Redis for caching") is an entity of its own.
+
+    Returns:
+        Dicts with the entity's name, type and description (empty for unlabelled items)
+    """
+    entities = []
+    section = "Fact"
+    for line in text.splitlines():
+        heading = _HEADING.match(line)
+        if heading:
+            section = heading.group(1).strip("*_ ")
+            continue
+        fact = _FACT.match(line)
+        if fact:
+            name = (fact.group(1) or fact.group(2)).strip(" :*")
+            description = fact.group(3).strip()
+            if name and description:
+                entities.append({"name": name, "type": section, "description": description[:ENTITY_CHARS]})
+            continue
+        item = _LIST_ITEM.match(line)
+        if item:
+            entities.append({"name": item.group(1).strip(" *_"), "type": section, "description": ""})
+    return entities
+
+
+class VectorMemory:
+    """
+    Bounded CrewAI memory storage of texts and their hashed vectors.
+
+    Implements CrewAI's storage interface (save, search, reset) without
+    subclassing it, so importing this module does not load CrewAI.
+
+    Items are keyed; saving a key replaces its item, and once `capacity` is
+    reached the least recently saved item is evicted.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._matrix = np.zeros((capacity, DIMENSIONS), dtype=np.float32)
+        self._slots: "OrderedDict[str, int]" = OrderedDict()    # key -> matrix row, least recent first
+        self._items: Dict[int, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __bool__(self) -> bool:
+        # CrewAI memories fall back to ChromaDB storage when given a falsy one
+        return True
+
+    def put(self, key: str, content: str, metadata: Optional[Dict[str, Any]] = None) -> None:
+        vector = vectorize(content)
+        with self._lock:
+            if key in self._slots:
+                slot = self._slots.pop(key)
+            elif len(self._slots) >= self.capacity:
+                _, slot = self._slots.popitem(last=False)
+            else:
+                slot = len(self._slots)
+            self._slots[key] = slot
+            self._matrix[slot] = vector
+            self._items[slot] = {"content": content, "metadata": metadata or {}}
+
+    def discard(self, predicate) -> None:
+        """Remove every item whose metadata matches `predicate`, compacting the matrix."""
+        with self._lock:
+            kept = [(key, slot) for key, slot in self._slots.items() if not predicate(self._items[slot]["metadata"])]
+            if len(kept) == len(self._slots):
+                return
+            rows = [slot for _, slot in kept]
+            self._matrix[:len(rows)] = self._matrix[rows]
+            self._items = {new: self._items[old] for new, old in enumerate(rows)}
+            self._slots = OrderedDict((key, new) for new, (key, _) in enumerate(kept))
+
+    def save(self, value: Any, metadata: Dict[str, Any]) -> None:
+        key = hashlib.sha1(str(value).encode("utf-8")).hexdigest()
+        self.put(key, str(value), metadata)
+
+    def search(self, query: str, limit: int = MAX_RESULTS, score_threshold: float = MIN_SIMILARITY) -> List[Dict[str, Any]]:
+        """
+        Items most similar to `query` that the query does not already contain.
+
+        CrewAI's thresholds are meant for neural embeddings; hashed bag-of-words
+        vectors score lower, so `MIN_SIMILARITY` and `MAX_RESULTS` apply instead.
+        Recalling a passage the prompt already quotes would only repeat it.
+        """
+        vector = vectorize(query)
+        with self._lock:
+            if not self._slots:
+                return []
+            scores = self._matrix[:len(self._slots)] @ vector
+            items = dict(self._items)
+        results = []
+        for slot in np.argsort(-scores):
+            if scores[slot] < MIN_SIMILARITY or len(results) >= min(limit, MAX_RESULTS):
+                break
+            item = items[int(slot)]
+            if item["metadata"].get("quote", item["content"]) in query:
+                continue
+            results.append({**item, "score": round(float(scores[slot]), 4)})
+        return results
+
+    def reset(self) -> None:
+        with self._lock:
+            self._slots.clear()
+            self._items.clear()
+
+
+class SessionMemory:
+    """Short-term passages and entities remembered from one session's task outputs."""
+
+    def __init__(self, max_passages: int = MAX_PASSAGES, max_entities: int = MAX_ENTITIES):
+        self.passages = VectorMemory(max_passages)
+        self.entities = VectorMemory(max_entities)
+        self._remembered: Dict[str, str] = {}   # task name -> hash of the remembered output
+
+    def remember(self, task_name: str, output: str) -> None:
+        """Replace what is remembered of a task with its (new) output."""
+        digest = hashlib.sha1(output.encode("utf-8")).hexdigest()
+        if self._remembered.get(task_name) == digest:
+            return
+        self.passages.discard(lambda metadata: metadata.get("task") == task_name)
+        for number, passage in enumerate(split_passages(output)):
+            self.passages.put(f"{task_name}:{number}", passage, {"task": task_name})
+        for entity in extract_entities(output):
+            # Later tasks refine earlier facts about the same thing
+            content = f"{entity['name']} ({entity['type']})"
+            self.entities.put(
+                entity["name"].casefold(),
+                f"{content}: {entity['description']}" if entity["description"] else content,
+                {"task": task_name, "quote": entity["description"] or entity["name"]},
+            )
+        self._remembered[task_name] = digest
+
+    def crew_memories(self) -> Dict[str, Any]:
+        """Crew keyword arguments that give its agents this memory."""
+        from crewai.memory.entity.entity_memory import EntityMemory
+
+        return {
+            "short_term_memory": _task_short_term_memory_class()(storage=_SessionPassages(self)),
+            "entity_memory": EntityMemory(storage=self.entities),
+        }
+
+
+class _SessionPassages:
+    """Short-term storage that remembers each agent's final answer under its task."""
+
+    def __init__(self, memory: SessionMemory):
+        self.memory = memory
+
+    def save(self, value: Any, metadata: Dict[str, Any]) -> None:
+        if metadata.get("task"):
+            # Agents save their whole last message; the task output is the final answer
+            self.memory.remember(metadata["task"], str(value).split("Final Answer:", 1)[-1].strip())
+
+    def search(self, query: str, limit: int = MAX_RESULTS, score_threshold: float = MIN_SIMILARITY) -> List[Dict[str, Any]]:
+        return self.memory.passages.search(query, limit, score_threshold)
+
+    def reset(self) -> None:
+        self.memory.passages.reset()
+
+
+@lru_cache(maxsize=None)
+def _task_short_term_memory_class() -> type:
+    """The short-term memory class, defined on first use so CrewAI loads with the crew."""
+    from crewai.memory.short_term.short_term_memory import ShortTermMemory
+
+    class TaskShortTermMemory(ShortTermMemory):
+        """Short-term memory that tells its storage which task an answer belongs to."""
+
+        def save(self, value: Any, metadata: Optional[Dict[str, Any]] = None) -> None:
+            super().save(value, {**(metadata or {}), "task": self.task.name if self.task else None})
+
+    return TaskShortTermMemory
+
+
+class AgentMemory:
+    """Session memories of this process, least recently used dropped first."""
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, enabled: bool = MEMORY_ENABLED):
+        self.max_sessions = max_sessions
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, SessionMemory]" = OrderedDict()
+
+    def session(self, session_id: str, outputs: Optional[Dict[str, str]] = None) -> Optional[SessionMemory]:
+        """
+        Memory of a session, seeded with task outputs it reuses.
+
+        Args:
+            session_id: Session the generation runs in
+            outputs: Task name -> output reused by the generation
+
+        Returns:
+            The session's memory, or None if agent memory is disabled
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            memory = self._sessions.pop(session_id, None) or SessionMemory()
+            self._sessions[session_id] = memory
+            while len(self._sessions) > self.max_sessions:
+                evicted, _ = self._sessions.popitem(last=False)
+                logger.debug(f"Dropped agent memory of session {evicted}")
+        for task_name, output in (outputs or {}).items():
+            memory.remember(task_name, output)
+        return memory
@@ -0,0 +1,265 @@
+"""
+Prometheus metrics for the PRD service.
+A small in-process registry rendered in the Prometheus text exposition format
+at /metrics; job, task and LLM metrics are derived from finished trace spans.
+"""
+
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from prd_generator.tracing import Span
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LONG_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0)
+RATE_BUCKETS = (10.0, 25.0, 50.0, 100.0, 250.0, 500.0, 1000.0, 2500.0, 5000.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Add `amount` to the counter for the given labels."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        """Return the current count for the given labels."""
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """Point-in-time value, either set directly or read from a callback at scrape time."""
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], Iterable[Tuple[Dict[str, str], float]]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self.callback = callback
+
+    def set(self, value: float, **labels: str) -> None:
+        """Set the gauge for the given labels."""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Add `amount` (which may be negative) to the gauge."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        if self.callback is not None:
+            items = sorted((self._key(labels), value) for labels, value in self.callback())
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    """Bucketed distribution of observations."""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: Dict[LabelValues, List[float]] = {}    # bucket counts, then sum and count
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record one observation for the given labels."""
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = self.header()
+        for key, series in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = ("le", _format_value(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {_format_value(series[-1])}")
+        return lines
+
+
+class Registry:
+    """
+    Collection of metrics rendered together.
+    """
+
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (), callback=None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text format."""
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter("prd_http_requests_total", "HTTP requests by method, route and status", ("method", "route", "status"))
+HTTP_DURATION = REGISTRY.histogram("prd_http_request_duration_seconds", "HTTP request latency until response headers", ("method", "route"))
+HTTP_IN_FLIGHT = REGISTRY.gauge("prd_http_requests_in_flight", "HTTP requests currently being served")
+
+JOBS = REGISTRY.counter("prd_jobs_total", "Finished generation jobs by pricing tier and status", ("pricing_tier", "status"))
+JOB_DURATION = REGISTRY.histogram("prd_job_duration_seconds", "Generation job run time by pricing tier", ("pricing_tier",), LONG_BUCKETS)
+JOB_QUEUE_WAIT = REGISTRY.histogram("prd_job_queue_wait_seconds", "Time jobs waited for a worker", (), LONG_BUCKETS)
+
+TASK_DURATION = REGISTRY.histogram("prd_task_duration_seconds", "Crew task run time", ("task", "status"), LONG_BUCKETS)
+TASK_CACHE = REGISTRY.counter("prd_task_cache_total", "Tasks served from a session (hit) or executed (miss)", ("result",))
+
+LLM_CALLS = REGISTRY.counter("prd_llm_calls_total", "LLM calls by model and status", ("model", "status"))
+LLM_RETRIES = REGISTRY.counter("prd_llm_retries_total", "LLM calls made after a failed call in the same agent execution", ("model",))
+LLM_LATENCY = REGISTRY.histogram("prd_llm_call_duration_seconds", "LLM call latency", ("model",), LONG_BUCKETS)
+LLM_TTFT = REGISTRY.histogram("prd_llm_time_to_first_token_seconds", "Time to first streamed token", ("model",))
+LLM_TOKENS = REGISTRY.counter("prd_llm_tokens_total", "LLM tokens by model and type", ("model", "type"))
+LLM_THROUGHPUT = REGISTRY.histogram("prd_llm_output_tokens_per_second", "Completion tokens per second of generation time", ("model",), RATE_BUCKETS)
+
+TOOL_CALLS = REGISTRY.counter("prd_tool_calls_total", "Tool calls by tool, cache use and status", ("tool", "cached", "status"))
+ARCHIVE_CACHE = REGISTRY.counter("prd_archive_cache_total", "/download-all archives served from disk (hit), built (miss) or not modified", ("result",))
+STORAGE_BYTES = REGISTRY.counter("prd_storage_bytes_total", "Document bytes written (logical) and bytes of new compressed blobs (stored)", ("kind",))
+STORAGE_READ_DURATION = REGISTRY.histogram("prd_storage_read_duration_seconds", "Document reads from storage, including decompression", ("backend",))
+RETENTION_EVICTIONS = REGISTRY.counter("prd_retention_evictions_total", "Sessions evicted by the retention sweeper, by reason", ("reason",))
+RETENTION_FREED_BYTES = REGISTRY.counter("prd_retention_freed_bytes_total", "Bytes of evicted sessions and expired files")
+WORKER_RECYCLES = REGISTRY.counter("prd_worker_recycles_total", "Worker processes replaced, by reason", ("reason",))
+
+TOOL_RETRIES = REGISTRY.counter("prd_tool_retries_total", "Repeated tool call attempts", ("tool",))
+
+
+def _cache_ratios() -> Iterable[Tuple[Dict[str, str], float]]:
+    hits, misses = TASK_CACHE.value(result="hit"), TASK_CACHE.value(result="miss")
+    if hits + misses:
+        yield {"cache": "task_reuse"}, hits / (hits + misses)
+    with TOOL_CALLS._lock:
+        tool_counts = list(TOOL_CALLS._values.items())
+    cached = sum(value for key, value in tool_counts if key[1] == "true")
+    total = sum(value for _, value in tool_counts)
+    if total:
+        yield {"cache": "tool"}, cached / total
+    hits, misses = ARCHIVE_CACHE.value(result="hit") + ARCHIVE_CACHE.value(result="not_modified"), ARCHIVE_CACHE.value(result="miss")
+    if hits + misses:
+        yield {"cache": "archive"}, hits / (hits + misses)
+
+
+REGISTRY.gauge("prd_cache_hit_ratio", "Hit ratio of session task reuse, the crewAI tool cache and the archive cache", ("cache",), _cache_ratios)
+
+
+def observe_span(span: Span) -> None:
+    """Tracer listener turning finished job, task, LLM and tool spans into metrics."""
+    attrs = span.attributes
+    status = span.status
+    duration = span.duration or 0.0
+
+    if span.kind == "job":
+        tier = attrs.get("pricing_tier") or "unknown"
+        JOBS.inc(pricing_tier=tier, status="completed" if status == "ok" else "failed")
+        JOB_DURATION.observe(duration, pricing_tier=tier)
+        if attrs.get("job.queue_wait_seconds") is not None:
+            JOB_QUEUE_WAIT.observe(attrs["job.queue_wait_seconds"])
+        TASK_CACHE.inc(attrs.get("tasks.reused", 0), result="hit")
+        TASK_CACHE.inc(attrs.get("tasks.executed", 0), result="miss")
+
+    elif span.kind == "task":
+        TASK_DURATION.observe(duration, task=span.name, status=status)
+
+    elif span.kind == "llm":
+        model = attrs.get("llm.model") or "unknown"
+        LLM_CALLS.inc(model=model, status=status)
+        LLM_LATENCY.observe(duration, model=model)
+        if attrs.get("llm.retry"):
+            LLM_RETRIES.inc(model=model)
+        ttft = attrs.get("llm.ttft_seconds")
+        if ttft is not None:
+            LLM_TTFT.observe(ttft, model=model)
+        completion_tokens = attrs.get("tokens.completion", 0)
+        LLM_TOKENS.inc(attrs.get("tokens.prompt", 0), model=model, type="prompt")
+        LLM_TOKENS.inc(completion_tokens, model=model, type="completion")
+        generation_time = duration - (ttft or 0.0)
+        if completion_tokens and generation_time > 0:
+            LLM_THROUGHPUT.observe(completion_tokens / generation_time, model=model)
+
+    elif span.kind == "tool":
+        TOOL_CALLS.inc(tool=span.name, cached="true" if attrs.get("tool.from_cache") else "false", status=status)
+        if (attrs.get("tool.run_attempts") or 1) > 1:
+            TOOL_RETRIES.inc(tool=span.name)
@@ -0,0 +1,180 @@
+"""
+Opt-in profiling of generation jobs.
+A profiled job runs under cProfile (on its worker thread) and tracemalloc; the
+raw pstats file and a text report are stored with the session outputs.
+Enable per request with the `X-Profile: 1` header or for every job with PRD_PROFILE_JOBS=1.
+"""
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ALL_JOBS = os.getenv("PRD_PROFILE_JOBS", "").lower() in ("1", "true", "yes")
+TRACEMALLOC_FRAMES = int(os.getenv("PRD_PROFILE_TRACEMALLOC_FRAMES", "1"))
+
+# Areas whose own time is summed in the report, matched against code file paths
+PROFILE_AREAS: List[Tuple[str, Tuple[str, ...]]] = [
+    ("prd_generator tools", ("prd_generator/tools/",)),
+    ("crewAI agent loop", ("crewai/agents/", "crewai/agent.py", "crewai/utilities/agent_utils.py")),
+    ("templating (YAML, interpolation)", ("/yaml/", "crewai/utilities/string_utils.py", "prd_generator/task_graph.py")),
+    ("LLM client / HTTP", ("litellm/", "httpx/", "httpcore/", "openai/", "cerebras/")),
+    ("imports", ("<frozen importlib",)),
+]
+
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_cprofile_lock = threading.Lock()     # one cProfile at a time per process
+
+
+def wants_profile(headers: Mapping[str, str]) -> bool:
+    """Whether a request asked for profiling (or profiling is on for every job)."""
+    return PROFILE_ALL_JOBS or headers.get(PROFILE_HEADER, "").lower() in ("1", "true", "yes")
+
+
+def _start_tracemalloc() -> None:
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        _tracemalloc_users += 1
+
+
+def _stop_tracemalloc() -> None:
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def _area_times(stats: pstats.Stats) -> Dict[str, float]:
+    """Sum own (tottime) seconds per profile area."""
+    totals = {name: 0.0 for name, _ in PROFILE_AREAS}
+    totals["other"] = 0.0
+    for (filename, _, _), (_, _, tottime, _, _) in stats.stats.items():
+        path = filename.replace(os.sep, "/")
+        for name, markers in PROFILE_AREAS:
+            if any(marker in path for marker in markers):
+                totals[name] += tottime
+                break
+        else:
+            totals["other"] += tottime
+    return totals
+
+
+def _write_report(path: Path, job_id: str, stats: Optional[pstats.Stats], info: Dict[str, Any],
+                  memory_lines: List[str]) -> None:
+    out = io.StringIO()
+    out.write(f"Profile of job {job_id}\n")
+    out.write(f"wall time: {info['wall_seconds']:.3f}s   thread CPU time: {info['cpu_seconds']:.3f}s\n")
+    out.write(f"traced memory: peak {info['peak_memory_bytes'] / 1e6:.1f} MB, "
+              f"net {info['net_memory_bytes'] / 1e6:+.1f} MB "
+              f"(process-wide while tracing; includes other jobs running concurrently)\n\n")
+
+    if stats is None:
+        out.write(f"No CPU profile: {info['cpu_profile_skipped']}\n\n")
+    else:
+        out.write("Own time by area\n")
+        for name, seconds in sorted(info["areas"].items(), key=lambda item: -item[1]):
+            out.write(f"  {seconds:>9.3f}s  {name}\n")
+
+        out.write("\nTop functions by cumulative time\n")
+        stats.stream = out
+        stats.sort_stats("cumulative").print_stats(40)
+        out.write("Top functions by own time\n")
+        stats.sort_stats("tottime").print_stats(25)
+
+    out.write("Top memory allocations (net growth during the job)\n")
+    out.writelines(line + "\n" for line in memory_lines)
+    path.write_text(out.getvalue(), encoding="utf-8")
+
+
+def _enable_profiler(job_id: str, info: Dict[str, Any]) -> Optional[cProfile.Profile]:
+    """
+    Start cProfile on this thread, or return None if another job holds it.
+
+    Since Python 3.12 only one profiler can be active per process, so jobs
+    profiled concurrently in thread mode get memory figures but no CPU profile.
+    """
+    if not _cprofile_lock.acquire(blocking=False):
+        info["cpu_profile_skipped"] = "another job was being profiled"
+    else:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            return profiler
+        except ValueError as e:     # another profiling tool is active
+            _cprofile_lock.release()
+            info["cpu_profile_skipped"] = str(e)
+    logger.warning(f"Not CPU-profiling job {job_id}: {info['cpu_profile_skipped']}")
+    return None
+
+
+@contextmanager
+def profile_job(job_id: str, directory: Path) -> Iterator[Dict[str, Any]]:
+    """
+    Profile the block with cProfile and tracemalloc.
+
+    Args:
+        job_id: Job being profiled (used in file names)
+        directory: Where to write <job_id>.prof and <job_id>.txt
+
+    Yields:
+        Dict filled in on exit with the file paths and headline numbers
+    """
+    info: Dict[str, Any] = {}
+    profiler: Optional[cProfile.Profile] = None
+    tracing = False
+    wall_start, cpu_start = time.perf_counter(), time.thread_time()
+    try:
+        _start_tracemalloc()
+        tracing = True
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        start_memory = tracemalloc.get_traced_memory()[0]
+        profiler = _enable_profiler(job_id, info)
+        yield info
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _cprofile_lock.release()
+        if tracing:
+            wall, cpu = time.perf_counter() - wall_start, time.thread_time() - cpu_start
+            current_memory, peak_memory = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+            _stop_tracemalloc()
+            _save_profile(job_id, directory, profiler, info, {
+                "wall_seconds": wall,
+                "cpu_seconds": cpu,
+                "peak_memory_bytes": peak_memory,
+                "net_memory_bytes": current_memory - start_memory,
+            }, [str(stat) for stat in after.compare_to(before, "lineno")[:25]])
+
+
+def _save_profile(job_id: str, directory: Path, profiler: Optional[cProfile.Profile], info: Dict[str, Any],
+                  figures: Dict[str, Any], memory_lines: List[str]) -> None:
+    """Write the pstats file (if CPU-profiled) and the text report, recording them in `info`."""
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        report_path = directory / f"{job_id}.txt"
+        info.update(figures, report_path=str(report_path))
+        stats = None
+        if profiler is not None:
+            pstats_path = directory / f"{job_id}.prof"
+            profiler.dump_stats(str(pstats_path))
+            stats = pstats.Stats(profiler)
+            info.update(pstats_path=str(pstats_path), areas=_area_times(stats))
+        _write_report(report_path, job_id, stats, info, memory_lines)
+    except Exception as e:
+        logger.warning(f"Failed to write profile of job {job_id}: {e}")
@@ -0,0 +1,305 @@
+"""
+Retention of generated outputs.
+A background sweeper evicts whole sessions (their files, stored documents and
+catalog entries) once they go unread for too long, outgrow the per-session cap,
+or, least recently accessed first, while all sessions together exceed the quota.
+Evicted sessions keep a tombstone in the catalog so the API can answer 410 Gone.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from prd_generator import metrics
+from prd_generator.sessions import SessionStore
+from prd_generator.storage import DocumentStorage
+from prd_generator.tracing import TRACES_DIR
+
+logger = logging.getLogger(__name__)
+
+RETENTION_DAYS = float(os.getenv("PRD_RETENTION_DAYS", "30"))              # 0 keeps unread sessions forever
+OUTPUTS_QUOTA_MB = float(os.getenv("PRD_OUTPUTS_QUOTA_MB", "5120"))        # all sessions together; 0 for no quota
+SESSION_QUOTA_MB = float(os.getenv("PRD_SESSION_QUOTA_MB", "100"))         # one session; 0 for no cap
+SWEEP_INTERVAL = float(os.getenv("PRD_RETENTION_SWEEP_SECONDS", "300"))    # 0 disables the sweeper
+SWEEP_BATCH = int(os.getenv("PRD_RETENTION_BATCH", "25"))                  # sessions measured or evicted per step
+TOMBSTONE_DAYS = float(os.getenv("PRD_RETENTION_TOMBSTONE_DAYS", "90"))    # how long evicted sessions answer 410
+GARBAGE_MIN_AGE = 600.0     # seconds before an unreferenced blob may be deleted
+
+# Pause between steps, so a sweep never holds the catalog or the disk for long
+_STEP_PAUSE = 0.05
+_STARTUP_DELAY = 30.0
+
+
+def _tree_size(directory: Path) -> int:
+    """Total size of the files under `directory`, tolerating files deleted meanwhile."""
+    total = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            try:
+                total += os.stat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class RetentionSweeper:
+    """
+    Incremental sweeper enforcing age, per-session and total size limits on sessions.
+
+    Each sweep works in batches of `batch` sessions with a short pause in
+    between, on its own thread; sessions with a queued or running job are skipped.
+    """
+
+    def __init__(
+        self,
+        session_store: SessionStore,
+        storage: DocumentStorage,
+        is_active: Callable[[str], bool] = lambda session_id: False,
+        max_age_days: float = RETENTION_DAYS,
+        quota_mb: float = OUTPUTS_QUOTA_MB,
+        session_quota_mb: float = SESSION_QUOTA_MB,
+        interval: float = SWEEP_INTERVAL,
+        batch: int = SWEEP_BATCH,
+        traces_dir: Path = TRACES_DIR,
+    ):
+        """
+        Args:
+            session_store: Store of the sessions to sweep; its catalog tracks their access and size
+            storage: Document storage holding the sessions' published documents
+            is_active: Returns True for sessions a job is using, which are never evicted
+            max_age_days: Evict sessions not accessed for this long (0 to disable)
+            quota_mb: Evict least recently accessed sessions while all of them exceed this (0 to disable)
+            session_quota_mb: Evict sessions larger than this (0 to disable)
+            interval: Seconds between sweeps of the background thread
+            batch: Sessions measured or evicted per step
+            traces_dir: Trace files older than `max_age_days` are deleted too
+        """
+        self.session_store = session_store
+        self.catalog = session_store.catalog
+        self.storage = storage
+        self.is_active = is_active
+        self.max_age_days = max_age_days
+        self.quota_bytes = int(quota_mb * 2**20)
+        self.session_quota_bytes = int(session_quota_mb * 2**20)
+        self.interval = interval
+        self.batch = max(1, batch)
+        self.traces_dir = Path(traces_dir)
+        self.last_sweep: Dict[str, Any] = {}
+        self._collect_until = 0.0
+        self._collect_sweeps = 0
+        self._stop = threading.Event()
+        self._sweep_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start sweeping every `interval` seconds on a daemon thread."""
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="retention-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the sweeper thread; a sweep in progress stops after its current step."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        if self._stop.wait(min(_STARTUP_DELAY, self.interval)):
+            return
+        while True:
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Retention sweep failed")
+            if self._stop.wait(self.interval):
+                return
+
+    def _pause(self) -> bool:
+        """Yield between steps; True once the sweeper is stopping."""
+        return self._stop.wait(_STEP_PAUSE)
+
+    # Sessions
+
+    def session_size(self, session_id: str) -> int:
+        """
+        Bytes a session takes: its directory plus the stored size (compressed,
+        for a compressing store) of documents kept elsewhere.
+        """
+        directory = (self.session_store.root / session_id).resolve()
+        size = _tree_size(directory)
+        for obj in self.storage.list(f"sessions/{session_id}/", recursive=True):
+            local_path = self.storage.local_path(obj.key)
+            if local_path is None or directory not in local_path.resolve().parents:
+                size += self.storage.stored_size(obj.key) or 0
+        return size
+
+    def evict(self, session_id: str, reason: str) -> int:
+        """
+        Delete a session's outputs, leaving a tombstone in the catalog.
+
+        Returns:
+            Bytes freed
+        """
+        size = self.session_size(session_id)
+        # Tombstone first: from here on readers get 410 instead of a half-deleted session
+        self.catalog.mark_evicted(session_id, reason)
+        for obj in self.storage.list(f"sessions/{session_id}/", recursive=True):
+            self.storage.delete(obj.key)
+        self.session_store.delete(session_id)
+        metrics.RETENTION_EVICTIONS.inc(reason=reason)
+        metrics.RETENTION_FREED_BYTES.inc(size)
+        logger.info(f"Evicted session {session_id} ({reason}, {size} bytes)")
+        return size
+
+    def _register(self) -> int:
+        """Track session directories the catalog has no documents for (e.g. failed generations)."""
+        if not self.session_store.root.is_dir():
+            return 0
+        known = self.catalog.known_sessions()
+        unknown = {}
+        for entry in os.scandir(self.session_store.root):
+            if not entry.is_dir() or entry.name in known:
+                continue
+            try:
+                self.session_store.validate(entry.name)
+                unknown[entry.name] = entry.stat().st_mtime
+            except (ValueError, OSError):
+                pass
+        return self.catalog.register_sessions(unknown)
+
+    def _measure(self) -> int:
+        """Refresh the size of the `batch` sessions measured longest ago."""
+        measured = 0
+        for session_id in self.catalog.sessions_to_measure(self.batch):
+            self.catalog.set_session_bytes(session_id, self.session_size(session_id))
+            measured += 1
+        return measured
+
+    def _evict_batches(
+        self,
+        select: Callable[[List[str]], List[Dict[str, Any]]],
+        reason: str,
+        evicted: Counter,
+        skipped: Set[str],
+        enough: Callable[[], bool] = lambda: False,
+    ) -> int:
+        """Evict the sessions `select` returns, one batch per step, until none are left or `enough`."""
+        freed = 0
+        while not enough():
+            candidates = select(sorted(skipped))
+            if not candidates:
+                break
+            for session in candidates:
+                if enough():
+                    break
+                if self.is_active(session["session_id"]):
+                    skipped.add(session["session_id"])
+                    continue
+                freed += self.evict(session["session_id"], reason)
+                evicted[reason] += 1
+            if self._pause():
+                break
+        return freed
+
+    # Sweeping
+
+    def _expire_traces(self, cutoff: float) -> int:
+        if not self.traces_dir.is_dir():
+            return 0
+        deleted = 0
+        for entry in os.scandir(self.traces_dir):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    size = entry.stat().st_size
+                    os.unlink(entry.path)
+                    metrics.RETENTION_FREED_BYTES.inc(size)
+                    deleted += 1
+            except OSError:
+                continue
+            if deleted and deleted % self.batch == 0 and self._pause():
+                break
+        return deleted
+
+    def sweep(self) -> Dict[str, Any]:
+        """
+        Run one sweep: measure a batch of sessions, then evict by age, by
+        per-session size and by total size, least recently accessed first.
+
+        Returns:
+            Report of the sweep, also kept as `last_sweep`
+        """
+        with self._sweep_lock:
+            start = time.time()
+            evicted: Counter = Counter()
+            skipped: Set[str] = set()
+            registered = self._register()
+            measured = self._measure()
+            freed = 0
+
+            if self.max_age_days > 0:
+                idle_before = start - self.max_age_days * 86400
+                freed += self._evict_batches(
+                    lambda exclude: self.catalog.retained_sessions(self.batch, idle_before=idle_before, exclude=exclude),
+                    "age", evicted, skipped,
+                )
+            if self.session_quota_bytes > 0:
+                freed += self._evict_batches(
+                    lambda exclude: self.catalog.retained_sessions(
+                        self.batch, larger_than=self.session_quota_bytes, exclude=exclude
+                    ),
+                    "session_quota", evicted, skipped,
+                )
+            if self.quota_bytes > 0:
+                freed += self._evict_batches(
+                    lambda exclude: self.catalog.retained_sessions(self.batch, exclude=exclude),
+                    "quota", evicted, skipped,
+                    enough=lambda: self.catalog.retained_totals()["bytes"] <= self.quota_bytes,
+                )
+
+            # Blobs of evicted documents are only deleted once two sweeps in a row
+            # found them unreferenced and old enough (see collect_garbage)
+            blobs_deleted = 0
+            collect_garbage = getattr(self.storage, "collect_garbage", None)
+            if evicted:
+                self._collect_until = start + GARBAGE_MIN_AGE + 2 * max(self.interval, 0)
+                self._collect_sweeps = 2
+            if collect_garbage is not None and (start <= self._collect_until or self._collect_sweeps > 0):
+                blobs_deleted = collect_garbage(GARBAGE_MIN_AGE)
+                self._collect_sweeps -= 0 if evicted else 1
+
+            traces_deleted = self._expire_traces(start - self.max_age_days * 86400) if self.max_age_days > 0 else 0
+            tombstones_dropped = self.catalog.forget_evicted(start - TOMBSTONE_DAYS * 86400) if TOMBSTONE_DAYS > 0 else 0
+
+            self.last_sweep = {
+                "finished": time.time(),
+                "seconds": round(time.time() - start, 3),
+                "registered_sessions": registered,
+                "measured_sessions": measured,
+                "evicted_sessions": dict(evicted),
+                "skipped_active_sessions": len(skipped),
+                "freed_bytes": freed,
+                "blobs_deleted": blobs_deleted,
+                "traces_deleted": traces_deleted,
+                "tombstones_dropped": tombstones_dropped,
+                "retained": self.catalog.retained_totals(),
+            }
+            if evicted:
+                logger.info(f"Retention sweep evicted {sum(evicted.values())} sessions, freeing {freed} bytes")
+            return self.last_sweep
+
+    def stats(self) -> Dict[str, Any]:
+        """Configured limits and the report of the last sweep."""
+        return {
+            "max_age_days": self.max_age_days,
+            "quota_bytes": self.quota_bytes,
+            "session_quota_bytes": self.session_quota_bytes,
+            "sweep_interval_seconds": self.interval,
+            "last_sweep": self.last_sweep or None,
+        }
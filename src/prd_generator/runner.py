@@ -0,0 +1,157 @@
+"""
+Execution of a single generation job.
+Runs the same way on a job worker thread or inside a worker subprocess, and
+returns a picklable outcome that the main process applies to the job.
+"""
+
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from prd_generator import health
+from prd_generator.generation import GenerationResult, GenerationService
+from prd_generator.profiling import profile_job
+from prd_generator.tracing import Span, get_tracer
+from prd_generator.usage import JobUsage, TokenBudgetExceeded, install_crewai_handlers, job_usage_scope
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class JobRequest:
+    """Everything a worker needs to run a job."""
+    job_id: str
+    inputs: Dict[str, Any]
+    documents: Optional[List[str]] = None
+    reuse_session_id: Optional[str] = None
+    profile: bool = False
+    queue_wait: Optional[float] = None
+    resumed: bool = False
+
+
+def warm_crew():
+    """
+    Build a PrdGenerator with its full crew, load the technology catalog and
+    idea classifier, and pre-import the LLM client stack.
+
+    The OpenAI SDK imports its resource modules on the first request (about
+    0.8s), so doing it here keeps that cost off the first job.
+
+    Returns:
+        The warmed PrdGenerator
+    """
+    from prd_generator.crew import PrdGenerator
+    from prd_generator.idea_classifier import get_classifier
+    from prd_generator.tech_catalog import get_catalog
+    import openai.resources  # noqa: F401
+
+    get_catalog()
+    get_classifier()
+    crew = PrdGenerator()
+    crew.crew()
+    return crew
+
+
+def generation_response(inputs: Dict[str, Any], documents: Optional[List[str]], result: GenerationResult) -> Dict[str, Any]:
+    """Build the response body describing a completed generation."""
+    pricing_tier = inputs["pricing_tier"]
+    tier_msg = " (Free Tier)" if pricing_tier == "free" else " (Premium)"
+    if documents is None and not result.reused_tasks:
+        result_summary = f"Generated: PRD, Technology Stack, Planning Setup, Technical Architecture, Development Environment, MVP Development, Testing Quality, Deployment Launch, Post-Launch Support, Quality Review{tier_msg}"
+    else:
+        result_summary = f"Generated: {', '.join(result.documents) or 'nothing (all documents up to date)'}{tier_msg}"
+    return {
+        "status": "completed",
+        "message": f"PRD and development guide generated successfully{tier_msg}",
+        "session_id": inputs["session_id"],
+        "timestamp": inputs["timestamp"],
+        "pricing_tier": pricing_tier,
+        "documents": result.documents,
+        "executed_tasks": result.executed_tasks,
+        "reused_tasks": result.reused_tasks,
+        "reused_from": result.reused_from,
+        "idea_profile": result.idea_profile,
+        "result_summary": result_summary
+    }
+
+
+@contextmanager
+def _maybe_profile(request: JobRequest, service: GenerationService, profile_info: Dict[str, Any]):
+    """Profile the job if requested, storing the profile with its session outputs."""
+    if not request.profile:
+        yield
+        return
+    directory = service.session_store.root / request.inputs["session_id"] / "profiles"
+    info: Dict[str, Any] = {}
+    try:
+        with profile_job(request.job_id, directory) as info:
+            yield
+    finally:
+        # profile_job fills `info` in on exit, including when the job failed
+        profile_info.update(info)
+
+
+def execute_job(request: JobRequest, service: GenerationService) -> Dict[str, Any]:
+    """
+    Run one generation job under tracing, usage accounting and optional profiling.
+
+    Args:
+        request: Job to run
+        service: Generation service of the calling thread or process
+
+    Returns:
+        Outcome dict with status, result, error, the usage record, finished
+        spans and profile info; never raises for job failures
+    """
+    tracer = get_tracer()
+    install_crewai_handlers()
+    health.install_crewai_handlers()
+
+    inputs = request.inputs
+    reuse_session_id = request.reuse_session_id
+    if request.resumed and service.session_store.exists(inputs["session_id"]):
+        # Outputs reused from the other session were copied into this one before
+        # the interruption, so resuming only needs the job's own session
+        reuse_session_id = None
+        logger.info(f"Resuming job {request.job_id} from the completed tasks of session {inputs['session_id']}")
+    job_usage = JobUsage(request.job_id, inputs["session_id"], inputs["pricing_tier"])
+    spans: List[Dict[str, Any]] = []
+    profile_info: Dict[str, Any] = {}
+    outcome: Dict[str, Any] = {"status": "failed", "result": None, "error": None}
+
+    def collect(span: Span) -> None:
+        if span.trace_id == request.job_id:
+            spans.append(span.to_dict())
+
+    tracer.add_listener(collect)
+    try:
+        with tracer.job_span(request.job_id, {
+            "job.queue_wait_seconds": request.queue_wait,
+            "session.id": inputs["session_id"],
+            "pricing_tier": inputs["pricing_tier"],
+            "documents": ",".join(request.documents or []) or None,
+            "job.resumed": request.resumed,
+        }) as span, job_usage_scope(job_usage), _maybe_profile(request, service, profile_info):
+            result = service.generate(inputs, documents=request.documents, reuse_session_id=reuse_session_id)
+            span.attributes["tasks.executed"] = len(result.executed_tasks)
+            span.attributes["tasks.reused"] = len(result.reused_tasks)
+            span.attributes["tasks.warm_started"] = sum(1 for task in result.warm_start.values() if task["injected"])
+            for head in ("platform", "domain", "scale"):
+                span.attributes[f"idea.{head}"] = result.idea_profile.get(head)
+            job_usage.warm_start = result.warm_start
+        outcome.update(status="completed", result=generation_response(inputs, request.documents, result))
+    except TokenBudgetExceeded as e:
+        outcome.update(status="token_budget_exceeded", error=str(e))
+    except Exception as e:
+        logger.exception(f"Job {request.job_id} failed")
+        outcome["error"] = str(e)
+    finally:
+        tracer.remove_listener(collect)
+
+    outcome.update(
+        usage=job_usage.to_record(outcome["status"]),
+        spans=spans,
+        profile_info=profile_info or None,
+    )
+    return outcome
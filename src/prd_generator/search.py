@@ -0,0 +1,393 @@
+"""
+Full-text search over generated documents.
+Every document a session stores is indexed in SQLite FTS5 as it is written, so /search answers ranked queries with highlighted snippets and session and
+pricing tier filters without reading the outputs tree.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from prd_generator.sessions import SessionStore
+    from prd_generator.task_graph import TaskGraph
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEX_PATH = Path(os.getenv("PRD_SEARCH_INDEX_PATH", "outputs/search.db"))
+# Documents per FTS5 table. bm25 weighs each query term by scanning every
+# document of the table containing it, so ranking cost grows with table size.
+SHARD_DOCS = int(os.getenv("PRD_SEARCH_SHARD_DOCS", "10000"))
+# Queries matching more documents than this rank only the most recent of them:
+# bm25 is computed for every candidate, and FTS5 has no top-k pruning
+RANK_WINDOW = int(os.getenv("PRD_SEARCH_RANK_WINDOW", "300"))
+MAX_RESULTS = 100
+SNIPPET_CHARS = 160
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_QUERY_TERM = re.compile(r"(\w+)(:?)", re.UNICODE)
+_OPERATORS = {"AND", "OR", "NOT", "NEAR"}
+_HEADING = re.compile(r"^#{1,3}\s+(.+)$", re.MULTILINE)
+# Messages of the errors FTS5 raises for a query it cannot parse
+_QUERY_ERRORS = ("fts5", "no such column", "unterminated string", "unknown special query")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    task_name TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    pricing_tier TEXT,
+    updated REAL NOT NULL,
+    shard INTEGER NOT NULL,
+    UNIQUE (session_id, task_name)
+);
+CREATE INDEX IF NOT EXISTS entries_shard ON entries (shard);
+CREATE TABLE IF NOT EXISTS shards (number INTEGER PRIMARY KEY);
+"""
+
+_SHARD_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5(
+    title, body, tags, tokenize = 'porter unicode61 remove_diacritics 2'
+)
+"""
+
+# Title matches weigh more than body matches; the tags column only serves filters.
+# Calling bm25() directly is about twice as fast as ORDER BY a configured rank.
+_RANK = "bm25({table}, 4.0, 1.0, 0.0)"
+
+
+class InvalidQueryError(ValueError):
+    """Raised for an empty query or one FTS5 cannot parse even after quoting its words."""
+
+
+def _tag(kind: str, value: Optional[str]) -> str:
+    # One opaque token per filter value, so filters are exact matches in the index
+    return kind + hashlib.sha1((value or "").encode("utf-8")).hexdigest()[:16]
+
+
+def _shard_table(number: int) -> str:
+    return f"shard_{int(number)}"
+
+
+def _best_newest(match: Tuple[float, int, int]) -> Tuple[float, int]:
+    # bm25 ranks are negative, better matches lower; ties go to the newer document
+    return match[0], -match[1]
+
+
+def plain_query(query: str) -> str:
+    """FTS5 query matching every word of `query`, with all operator syntax quoted away."""
+    words = _WORD.findall(query)
+    if not words:
+        raise InvalidQueryError("Query has no searchable words")
+    return " AND ".join('"' + word + '"' for word in words)
+
+
+def document_title(content: str) -> str:
+    """First Markdown heading of a document, or an empty title."""
+    match = _HEADING.search(content)
+    return match.group(1).strip() if match else ""
+
+
+def _stem(word: str) -> str:
+    word = word.lower()
+    for suffix in ("ing", "es", "ed", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def query_terms(query: str) -> List[str]:
+    """Words of a query to highlight, without operators and column names."""
+    return [word for word, colon in _QUERY_TERM.findall(query) if not colon and word not in _OPERATORS]
+
+
+def make_snippet(text: str, terms: List[str], chars: int = SNIPPET_CHARS) -> str:
+    """
+    Fragment of `text` around the first query term, with every term wrapped in <mark>.
+
+    Terms match by prefix of a crude stem ("dashboards" finds "dashboard"), close
+    enough to the index's Porter stemming for highlighting.
+    """
+    stems = sorted({_stem(term) for term in terms if term}, key=len, reverse=True)
+    pattern = re.compile(r"\b(?:" + "|".join(map(re.escape, stems)) + r")\w*", re.IGNORECASE) if stems else None
+    first = pattern.search(text) if pattern else None
+    start = max(0, first.start() - chars // 3) if first else 0
+    if start:
+        space = text.find(" ", start)
+        start = space + 1 if 0 <= space < first.start() else start
+    end = min(len(text), start + chars)
+    if end < len(text):
+        space = text.rfind(" ", start, end)
+        end = space if space > start else end
+    fragment = " ".join(text[start:end].split())
+    if pattern:
+        fragment = pattern.sub(lambda match: f"<mark>{match.group(0)}</mark>", fragment)
+    return ("…" if start else "") + fragment + ("…" if end < len(text) else "")
+
+
+class SearchIndex:
+    """
+    FTS5 index of session documents in a SQLite database shared by the API and worker processes.
+
+    Documents go to FTS5 tables ("shards") of `shard_docs` documents in the
+    order they are indexed; queries rank the newest shards first and stop
+    once RANK_WINDOW matches have been ranked. bm25 weighs terms by their
+    frequency within a shard, which at this size varies little between shards.
+    """
+
+    def __init__(self, path: Path = SEARCH_INDEX_PATH, shard_docs: int = SHARD_DOCS):
+        self.path = Path(path)
+        self.shard_docs = max(1, shard_docs)
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Connection of the calling thread, created (with the schema) on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _delete_entry(self, conn: sqlite3.Connection, entry_id: int, shard: int) -> None:
+        conn.execute(f"DELETE FROM {_shard_table(shard)} WHERE rowid = ?", (entry_id,))
+        conn.execute("DELETE FROM entries WHERE id = ?", (entry_id,))
+
+    def _upsert(
+        self, conn: sqlite3.Connection, session_id: str, task_name: str, filename: str,
+        content: str, pricing_tier: Optional[str], updated: float,
+    ) -> None:
+        # A re-indexed document gets a new id: ids order documents by recency (see RANK_WINDOW)
+        row = conn.execute(
+            "SELECT id, shard FROM entries WHERE session_id = ? AND task_name = ?", (session_id, task_name)
+        ).fetchone()
+        if row is not None:
+            self._delete_entry(conn, row["id"], row["shard"])
+        entry_id = conn.execute(
+            "INSERT INTO entries (session_id, task_name, filename, pricing_tier, updated, shard) "
+            "VALUES (?, ?, ?, ?, ?, -1)",
+            (session_id, task_name, filename, pricing_tier, updated),
+        ).lastrowid
+        shard = (entry_id - 1) // self.shard_docs
+        table = _shard_table(shard)
+        conn.execute("UPDATE entries SET shard = ? WHERE id = ?", (shard, entry_id))
+        if conn.execute("INSERT OR IGNORE INTO shards (number) VALUES (?)", (shard,)).rowcount:
+            conn.execute(_SHARD_SCHEMA.format(table=table))
+        conn.execute(
+            f"INSERT INTO {table} (rowid, title, body, tags) VALUES (?, ?, ?, ?)",
+            (entry_id, document_title(content), content, _tag("s", session_id)),
+        )
+
+    def index(
+        self,
+        session_id: str,
+        task_name: str,
+        filename: str,
+        content: str,
+        pricing_tier: Optional[str],
+        updated: float,
+    ) -> None:
+        """
+        Index (or re-index) the document a session task wrote.
+
+        Failures are logged rather than raised: the document itself is already
+        stored, and the index can be rebuilt from the sessions.
+        """
+        try:
+            conn = self._connect()
+            with conn:
+                self._upsert(conn, session_id, task_name, filename, content, pricing_tier, updated)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to index {filename} of session {session_id}: {e}")
+
+    def index_many(self, documents: Iterable[Tuple[str, str, str, str, Optional[str], float]]) -> int:
+        """Index (session_id, task_name, filename, content, pricing_tier, updated) tuples in one transaction."""
+        conn = self._connect()
+        count = 0
+        with conn:
+            for document in documents:
+                self._upsert(conn, *document)
+                count += 1
+        return count
+
+    def remove_session(self, session_id: str) -> None:
+        """Drop every document of a session from the index, and older shards it leaves empty."""
+        try:
+            conn = self._connect()
+            with conn:
+                rows = conn.execute("SELECT id, shard FROM entries WHERE session_id = ?", (session_id,)).fetchall()
+                for row in rows:
+                    self._delete_entry(conn, row["id"], row["shard"])
+                newest = conn.execute("SELECT MAX(number) FROM shards").fetchone()[0]
+                for shard in {row["shard"] for row in rows} - {newest}:
+                    if conn.execute("SELECT 1 FROM entries WHERE shard = ? LIMIT 1", (shard,)).fetchone() is None:
+                        conn.execute(f"DROP TABLE IF EXISTS {_shard_table(shard)}")
+                        conn.execute("DELETE FROM shards WHERE number = ?", (shard,))
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to remove session {session_id} from the search index: {e}")
+
+    def is_empty(self) -> bool:
+        return self._connect().execute("SELECT 1 FROM entries LIMIT 1").fetchone() is None
+
+    def _ranked(
+        self, match: str, wanted: int, pricing_tier: Optional[str] = None
+    ) -> Tuple[List[Tuple[float, int, int]], bool]:
+        """
+        Best `wanted` matches among the newest RANK_WINDOW, newest shard first.
+
+        The pricing tier is filtered on by joining the entries table rather
+        than as an FTS5 term: as a term matching a large share of the corpus,
+        bm25 would weigh it by walking all of it. It applies before the window,
+        so older matches of the tier are not crowded out by other tiers.
+
+        Returns:
+            (rank, id, shard) of the matches, best first, and whether older matches were left unranked
+        """
+        conn = self._connect()
+        shards = [row[0] for row in conn.execute("SELECT number FROM shards ORDER BY number DESC")]
+        ranked: List[Tuple[float, int, int]] = []
+        remaining = RANK_WINDOW
+        for position, shard in enumerate(shards):
+            table = _shard_table(shard)
+            # A join, not "rowid IN (...)", which would make FTS5 run the query once per id
+            tier_join, tier_filter, tier = (
+                (f"JOIN entries ON entries.id = {table}.rowid", "AND entries.pricing_tier = ?", [pricing_tier])
+                if pricing_tier is not None else ("", "", [])
+            )
+            # Listing matches newest first is cheap; only ranking them is not
+            ids = [row[0] for row in conn.execute(
+                f"SELECT {table}.rowid FROM {table} {tier_join} WHERE {table} MATCH ? {tier_filter} "
+                f"ORDER BY {table}.rowid DESC LIMIT ?",
+                [match, *tier, remaining + 1],
+            )]
+            if not ids:
+                continue
+            truncated = len(ids) > remaining
+            window = f"AND {table}.rowid >= ?" if truncated else ""
+            rows = conn.execute(
+                f"SELECT {table}.rowid AS rowid, {_RANK.format(table=table)} AS rank FROM {table} {tier_join} "
+                f"WHERE {table} MATCH ? {tier_filter} {window} ORDER BY rank LIMIT ?",
+                [match, *tier, *([ids[remaining - 1]] if truncated else []), wanted],
+            ).fetchall()
+            ranked.extend((row["rank"], row["rowid"], shard) for row in rows)
+            remaining -= min(len(ids), remaining)
+            if remaining == 0:
+                return sorted(ranked, key=_best_newest)[:wanted], truncated or position < len(shards) - 1
+        return sorted(ranked, key=_best_newest)[:wanted], False
+
+    def search(
+        self,
+        query: str,
+        session_id: Optional[str] = None,
+        pricing_tier: Optional[str] = None,
+        limit: int = 10,
+        offset: int = 0,
+    ) -> Dict[str, Any]:
+        """
+        Ranked full-text search.
+
+        `query` uses FTS5 syntax ("exact phrase", OR, NOT, prefix*); a query
+        that does not parse is retried as the plain words it contains.
+
+        Args:
+            query: Search query
+            session_id: Only documents of this session
+            pricing_tier: Only documents generated in this pricing tier
+            limit: Page size (at most MAX_RESULTS)
+            offset: Results to skip
+
+        Returns:
+            Dict with the matching documents, best first, each with a highlighted
+            snippet; whether more results follow; and whether ranking was limited
+            to the most recent RANK_WINDOW matches (of the pricing tier, if given)
+
+        Raises:
+            InvalidQueryError: For a query without searchable words
+        """
+        if not query or not query.strip():
+            raise InvalidQueryError("Query is empty")
+        limit = max(1, min(limit, MAX_RESULTS))
+        offset = max(0, offset)
+        filters = [f"tags:{_tag('s', session_id)}"] if session_id is not None else []
+
+        try:
+            ranked, windowed = self._ranked(
+                " AND ".join([f"({query})", *filters]), offset + limit + 1, pricing_tier
+            )
+        except sqlite3.OperationalError as e:
+            if not any(message in str(e) for message in _QUERY_ERRORS):
+                raise
+            ranked, windowed = self._ranked(
+                " AND ".join([plain_query(query), *filters]), offset + limit + 1, pricing_tier
+            )
+        page = ranked[offset:offset + limit]
+
+        documents = {}
+        if page:
+            conn = self._connect()
+            ids = [entry_id for _, entry_id, _ in page]
+            texts = {}
+            for shard in {shard for _, _, shard in page}:
+                shard_ids = [entry_id for _, entry_id, entry_shard in page if entry_shard == shard]
+                texts.update((row["rowid"], row) for row in conn.execute(
+                    f"SELECT rowid, title, body FROM {_shard_table(shard)} "
+                    f"WHERE rowid IN ({', '.join('?' * len(shard_ids))})", shard_ids
+                ))
+            for row in conn.execute(f"SELECT * FROM entries WHERE id IN ({', '.join('?' * len(ids))})", ids):
+                documents[row["id"]] = (row, texts.get(row["id"]))
+
+        terms = query_terms(query)
+        results = []
+        for rank, entry_id, _ in page:
+            if entry_id not in documents:
+                continue    # removed since it was ranked
+            entry, text = documents[entry_id]
+            results.append({
+                "session_id": entry["session_id"],
+                "task_name": entry["task_name"],
+                "filename": entry["filename"],
+                "pricing_tier": entry["pricing_tier"],
+                "updated": entry["updated"],
+                "title": text["title"] if text else "",
+                "score": round(-rank, 4),
+                "snippet": make_snippet(text["body"], terms) if text else "",
+            })
+        return {"results": results, "has_more": len(ranked) > offset + limit, "ranked_recent_only": windowed}
+
+    def backfill(self, session_store: "SessionStore", task_graph: "TaskGraph") -> int:
+        """
+        Index the documents of sessions stored before the search index existed.
+
+        Returns:
+            Number of documents indexed
+        """
+        if not session_store.root.exists():
+            return 0
+
+        def documents():
+            for session_dir in sorted(session_store.root.iterdir()):
+                try:
+                    manifest = session_store.load_manifest(session_dir.name)
+                except (ValueError, OSError):
+                    continue
+                pricing_tier = manifest.get("inputs", {}).get("pricing_tier")
+                for task_name in manifest.get("tasks", {}):
+                    path = session_dir / f"{task_name}.md"
+                    if not path.exists():
+                        continue
+                    yield (
+                        session_dir.name, task_name, task_graph.document_for_task(task_name) or path.name,
+                        path.read_text(encoding="utf-8"), pricing_tier, path.stat().st_mtime,
+                    )
+
+        return self.index_many(documents())
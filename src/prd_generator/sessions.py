@@ -0,0 +1,225 @@
+"""
+Per-session storage of task outputs.
+Every task output of a generation is kept under outputs/sessions/<session_id>/
+so later requests can reuse upstream results instead of regenerating them.
+The files are also published to document storage, from which a replica that
+has no local copy of a session fetches it.
+"""
+
+import json
+import logging
+import re
+import shutil
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from prd_generator.catalog import DocumentCatalog
+from prd_generator.search import SearchIndex
+from prd_generator.storage import BackgroundWriter, DocumentNotFoundError
+from prd_generator.task_graph import hash_text
+from prd_generator.warm_start import WarmStartIndex
+
+logger = logging.getLogger(__name__)
+
+SESSIONS_DIR = Path("outputs") / "sessions"
+MANIFEST_NAME = "manifest.json"
+
+_SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,128}$")
+
+
+class InvalidSessionError(ValueError):
+    """Raised when a session id is not safe to use as a directory name."""
+
+
+class SessionStore:
+    """
+    Filesystem store for task outputs, one directory per session.
+    """
+
+    def __init__(
+        self,
+        root: Path = SESSIONS_DIR,
+        catalog: Optional[DocumentCatalog] = None,
+        search_index: Optional[SearchIndex] = None,
+        warm_start: Optional[WarmStartIndex] = None,
+        writer: Optional[BackgroundWriter] = None
+    ):
+        """
+        Args:
+            root: Directory holding one subdirectory per session
+            catalog: Catalog recording every stored document
+            search_index: Full-text index fed every stored document
+            warm_start: Index of past outputs offered to similar generations as reference context
+            writer: Publishes session files to document storage as `sessions/<session_id>/<name>`,
+                where sessions missing from `root` are fetched from (local only if None)
+        """
+        self.root = Path(root)
+        self.catalog = catalog or DocumentCatalog()
+        self.search_index = search_index or SearchIndex()
+        self.warm_start = warm_start or WarmStartIndex()
+        self.writer = writer
+        self._lock = threading.Lock()
+
+    def _session_dir(self, session_id: str) -> Path:
+        if not session_id or not _SESSION_ID_PATTERN.match(session_id) or session_id in (".", ".."):
+            raise InvalidSessionError(f"Invalid session id: {session_id!r}")
+        return self.root / session_id
+
+    def validate(self, session_id: str) -> None:
+        """Raise InvalidSessionError if the session id is not usable."""
+        self._session_dir(session_id)
+
+    def exists(self, session_id: str) -> bool:
+        """Return True if the session has a manifest on disk or in document storage."""
+        return (self._session_dir(session_id) / MANIFEST_NAME).exists() or self._fetch(session_id)
+
+    def load_manifest(self, session_id: str) -> Dict[str, Any]:
+        """Load the session manifest, or an empty manifest if none exists."""
+        manifest_path = self._session_dir(session_id) / MANIFEST_NAME
+        if not manifest_path.exists() and not self._fetch(session_id):
+            return {"session_id": session_id, "tasks": {}}
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_manifest(self, session_id: str, manifest: Dict[str, Any]) -> None:
+        session_dir = self._session_dir(session_id)
+        session_dir.mkdir(parents=True, exist_ok=True)
+        data = json.dumps(manifest, indent=2).encode("utf-8")
+        tmp_path = session_dir / f"{MANIFEST_NAME}.tmp"
+        tmp_path.write_bytes(data)
+        tmp_path.replace(session_dir / MANIFEST_NAME)
+        self._publish(session_id, MANIFEST_NAME, data)
+
+    def _stored_elsewhere(self, session_id: str, name: str) -> bool:
+        """Whether document storage keeps a session file somewhere other than the session directory."""
+        if self.writer is None:
+            return False
+        local_path = self.writer.storage.local_path(f"sessions/{session_id}/{name}")
+        return local_path is None or local_path.resolve() != (self._session_dir(session_id) / name).resolve()
+
+    def _publish(self, session_id: str, name: str, data: bytes) -> None:
+        """Queue a session file for document storage, unless the storage file is the session file itself."""
+        if self._stored_elsewhere(session_id, name):
+            self.writer.write(f"sessions/{session_id}/{name}", data)
+
+    def _fetch(self, session_id: str) -> bool:
+        """
+        Copy a session this process has no files of (e.g. one generated on
+        another replica) from document storage into its directory.
+
+        Returns:
+            True if the session was found in storage
+        """
+        if not self._stored_elsewhere(session_id, MANIFEST_NAME):
+            return False
+        storage = self.writer.storage
+        try:
+            manifest = storage.get(f"sessions/{session_id}/{MANIFEST_NAME}")
+            outputs = {}
+            for task_name in json.loads(manifest).get("tasks", {}):
+                try:
+                    outputs[task_name] = storage.get(f"sessions/{session_id}/{task_name}.md")
+                except DocumentNotFoundError:
+                    pass    # reported as not reusable, like a missing local file
+        except DocumentNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning(f"Failed to fetch session {session_id} from {storage.name} storage: {e}")
+            return False
+
+        session_dir = self._session_dir(session_id)
+        session_dir.mkdir(parents=True, exist_ok=True)
+        # The manifest goes last: a session directory with one is complete
+        for name, data in [*((f"{task_name}.md", data) for task_name, data in outputs.items()), (MANIFEST_NAME, manifest)]:
+            tmp_path = session_dir / f".{name}.{threading.get_ident()}.tmp"
+            tmp_path.write_bytes(data)
+            tmp_path.replace(session_dir / name)
+        logger.info(f"Fetched session {session_id} from {storage.name} storage ({len(outputs)} task outputs)")
+        return True
+
+    def start(self, session_id: str, inputs: Dict[str, Any]) -> None:
+        """Record the inputs of a new generation for the session."""
+        with self._lock:
+            manifest = self.load_manifest(session_id)
+            manifest["inputs"] = inputs
+            manifest["updated"] = datetime.now().isoformat()
+            self._write_manifest(session_id, manifest)
+
+    def save_task_output(
+        self,
+        session_id: str,
+        task_name: str,
+        raw: str,
+        source_session: Optional[str] = None,
+        input_hash: Optional[str] = None,
+        document: Optional[str] = None
+    ) -> str:
+        """
+        Store the raw output of a task for the session.
+
+        Args:
+            session_id: Session the output belongs to
+            task_name: Name of the task from tasks.yaml
+            raw: Raw task output
+            source_session: Session the output was reused from, if any
+            input_hash: Hash of the task's effective inputs (see TaskGraph.input_hash)
+            document: Document filename the task writes, as listed in the catalog
+
+        Returns:
+            Hash of the stored output
+        """
+        output_hash = hash_text(raw)
+        with self._lock:
+            session_dir = self._session_dir(session_id)
+            session_dir.mkdir(parents=True, exist_ok=True)
+            output_path = session_dir / f"{task_name}.md"
+            with open(output_path, "w", encoding="utf-8") as f:
+                f.write(raw)
+            # Queued before the manifest that lists it, so storage never lists a missing output
+            self._publish(session_id, output_path.name, raw.encode("utf-8"))
+
+            manifest = self.load_manifest(session_id)
+            manifest["tasks"][task_name] = {
+                "completed": datetime.now().isoformat(),
+                "source_session": source_session or session_id,
+                "input_hash": input_hash,
+                "output_hash": output_hash,
+            }
+            manifest["updated"] = datetime.now().isoformat()
+            self._write_manifest(session_id, manifest)
+
+        stat = output_path.stat()
+        inputs = manifest.get("inputs", {})
+        pricing_tier = inputs.get("pricing_tier")
+        self.catalog.record(
+            session_id, task_name, document or output_path.name, output_path, stat.st_size,
+            output_hash, pricing_tier, source_session or session_id,
+        )
+        self.search_index.index(session_id, task_name, document or output_path.name, raw, pricing_tier, stat.st_mtime)
+        if source_session in (None, session_id):
+            self.warm_start.add(session_id, task_name, inputs.get("idea_description", ""), raw, pricing_tier)
+        return output_hash
+
+    def load_task_records(self, session_id: str) -> Dict[str, Dict[str, Any]]:
+        """Return task name -> manifest record for every completed task of the session."""
+        return self.load_manifest(session_id).get("tasks", {})
+
+    def load_task_outputs(self, session_id: str) -> Dict[str, str]:
+        """Return task name -> raw output for every completed task of the session."""
+        session_dir = self._session_dir(session_id)
+        self.catalog.touch(session_id)
+        outputs = {}
+        for task_name in self.load_manifest(session_id).get("tasks", {}):
+            output_path = session_dir / f"{task_name}.md"
+            if output_path.exists():
+                outputs[task_name] = output_path.read_text(encoding="utf-8")
+        return outputs
+
+    def delete(self, session_id: str) -> None:
+        """Remove everything stored for the session."""
+        with self._lock:
+            shutil.rmtree(self._session_dir(session_id), ignore_errors=True)
+        self.search_index.remove_session(session_id)
+        self.warm_start.remove_session(session_id)
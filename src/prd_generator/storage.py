@@ -0,0 +1,382 @@
+"""
+Document storage backends.
+Generated documents are published to a pluggable store (local directory, SQLite
+blobs or an S3-compatible bucket) by a background writer, and the download,
+copy and archive endpoints read them back from the same store, so replicas can
+share documents that would otherwise live on one container's ephemeral disk.
+
+Keys mirror the outputs/ layout: `<document>.md` for the latest run's documents
+and `sessions/<session_id>/<task_name>.md` for every session's task outputs.
+"""
+
+import hashlib
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STORAGE_BACKEND = os.getenv("PRD_STORAGE_BACKEND", "local")       # local, sqlite or s3
+STORAGE_DIR = Path(os.getenv("PRD_STORAGE_DIR", "outputs"))
+STORAGE_DB_PATH = Path(os.getenv("PRD_STORAGE_DB", "outputs/documents.db"))
+S3_BUCKET = os.getenv("PRD_S3_BUCKET", "prd-documents")
+S3_ENDPOINT_URL = os.getenv("PRD_S3_ENDPOINT_URL") or None        # unset for AWS itself
+S3_PREFIX = os.getenv("PRD_S3_PREFIX", "")
+WRITE_ATTEMPTS = 3
+
+
+class DocumentNotFoundError(LookupError):
+    """Raised when a key does not exist in the store."""
+
+
+@dataclass
+class StoredObject:
+    """Metadata of one stored document."""
+    key: str
+    size: int
+    modified: float
+    etag: Optional[str] = None      # content hash, if the backend keeps one
+
+
+def check_key(key: str) -> str:
+    """Reject keys that could escape the store's root."""
+    parts = key.split("/")
+    if not key or key.startswith("/") or any(part in ("", ".", "..") for part in parts):
+        raise ValueError(f"Invalid storage key: {key!r}")
+    return key
+
+
+class DocumentStorage:
+    """
+    Interface of the storage backends.
+    """
+    name = "base"
+
+    def put(self, key: str, data: bytes) -> None:
+        raise NotImplementedError
+
+    def get(self, key: str) -> bytes:
+        """
+        Raises:
+            DocumentNotFoundError: If the key does not exist
+        """
+        raise NotImplementedError
+
+    def stat(self, key: str) -> Optional[StoredObject]:
+        """Metadata of `key`, or None if it does not exist."""
+        raise NotImplementedError
+
+    def list(self, prefix: str = "", recursive: bool = False) -> List[StoredObject]:
+        """Objects under `prefix` ("" or ending in "/"); only its direct children unless `recursive`."""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def local_path(self, key: str) -> Optional[Path]:
+        """Filesystem path of `key` if the backend keeps documents as local files."""
+        return None
+
+    def stored_size(self, key: str) -> Optional[int]:
+        """Bytes `key` takes in the store, after any compression, or None if it does not exist."""
+        obj = self.stat(key)
+        return obj.size if obj else None
+
+
+class LocalStorage(DocumentStorage):
+    """
+    Documents as files under a directory (outputs/ by default, where they already live).
+    """
+    name = "local"
+
+    def __init__(self, root: Path = STORAGE_DIR):
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        return self.root / check_key(key)
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        tmp_path.replace(path)
+
+    def get(self, key: str) -> bytes:
+        try:
+            return self._path(key).read_bytes()
+        except FileNotFoundError:
+            raise DocumentNotFoundError(key)
+
+    def stat(self, key: str) -> Optional[StoredObject]:
+        try:
+            stat = self._path(key).stat()
+        except FileNotFoundError:
+            return None
+        return StoredObject(key, stat.st_size, stat.st_mtime)
+
+    def list(self, prefix: str = "", recursive: bool = False) -> List[StoredObject]:
+        directory = self.root / prefix if prefix else self.root
+        if not directory.is_dir():
+            return []
+        paths = directory.rglob("*") if recursive else directory.iterdir()
+        objects = []
+        for path in paths:
+            if not path.is_file() or path.name.startswith("."):
+                continue
+            stat = path.stat()
+            objects.append(StoredObject(path.relative_to(self.root).as_posix(), stat.st_size, stat.st_mtime))
+        return sorted(objects, key=lambda obj: obj.key)
+
+    def delete(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+
+    def local_path(self, key: str) -> Optional[Path]:
+        return self._path(key)
+
+
+class SqliteBlobStorage(DocumentStorage):
+    """
+    Documents as blobs in one SQLite database, e.g. on a mounted volume.
+    """
+    name = "sqlite"
+
+    def __init__(self, path: Path = STORAGE_DB_PATH):
+        self.path = Path(path)
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS objects ("
+                "key TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, "
+                "modified REAL NOT NULL, etag TEXT NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def put(self, key: str, data: bytes) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO objects (key, data, size, modified, etag) VALUES (?, ?, ?, ?, ?)",
+                (check_key(key), data, len(data), time.time(), hashlib.sha256(data).hexdigest()[:32]),
+            )
+
+    def get(self, key: str) -> bytes:
+        row = self._connect().execute("SELECT data FROM objects WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            raise DocumentNotFoundError(key)
+        return bytes(row[0])
+
+    def stat(self, key: str) -> Optional[StoredObject]:
+        row = self._connect().execute(
+            "SELECT key, size, modified, etag FROM objects WHERE key = ?", (key,)
+        ).fetchone()
+        return StoredObject(*row) if row else None
+
+    def list(self, prefix: str = "", recursive: bool = False) -> List[StoredObject]:
+        # Prefix range scan on the primary key; U+10FFFF sorts after any key character
+        rows = self._connect().execute(
+            "SELECT key, size, modified, etag FROM objects WHERE key >= ? AND key < ? ORDER BY key",
+            (prefix, prefix + "\U0010ffff"),
+        ).fetchall()
+        return [StoredObject(*row) for row in rows if recursive or "/" not in row[0][len(prefix):]]
+
+    def delete(self, key: str) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM objects WHERE key = ?", (key,))
+
+
+class S3Storage(DocumentStorage):
+    """
+    Documents as objects in an S3-compatible bucket (AWS S3, MinIO, R2, or storage_standin).
+
+    Credentials come from the usual AWS environment variables; boto3 is only
+    needed when this backend is selected.
+    """
+    name = "s3"
+
+    def __init__(self, bucket: str = S3_BUCKET, endpoint_url: Optional[str] = S3_ENDPOINT_URL, prefix: str = S3_PREFIX):
+        import boto3
+        from botocore.config import Config
+
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            config=Config(
+                # Path-style URLs and plain checksums work with every S3-compatible server
+                s3={"addressing_style": "path"} if endpoint_url else {},
+                request_checksum_calculation="when_required",
+                response_checksum_validation="when_required",
+                retries={"max_attempts": 3, "mode": "standard"},
+            ),
+        )
+
+    def _is_missing(self, error: Exception) -> bool:
+        code = getattr(error, "response", {}).get("Error", {}).get("Code")
+        return code in ("404", "NoSuchKey", "NotFound")
+
+    def put(self, key: str, data: bytes) -> None:
+        self.client.put_object(Bucket=self.bucket, Key=self.prefix + check_key(key), Body=data)
+
+    def get(self, key: str) -> bytes:
+        from botocore.exceptions import ClientError
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)
+        except ClientError as e:
+            if self._is_missing(e):
+                raise DocumentNotFoundError(key)
+            raise
+        return response["Body"].read()
+
+    def stat(self, key: str) -> Optional[StoredObject]:
+        from botocore.exceptions import ClientError
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+        except ClientError as e:
+            if self._is_missing(e):
+                return None
+            raise
+        return StoredObject(
+            key, response["ContentLength"], response["LastModified"].timestamp(), response["ETag"].strip('"')
+        )
+
+    def list(self, prefix: str = "", recursive: bool = False) -> List[StoredObject]:
+        kwargs = {"Bucket": self.bucket, "Prefix": self.prefix + prefix}
+        if not recursive:
+            kwargs["Delimiter"] = "/"
+        objects = []
+        for page in self.client.get_paginator("list_objects_v2").paginate(**kwargs):
+            for item in page.get("Contents", []):
+                objects.append(StoredObject(
+                    item["Key"][len(self.prefix):], item["Size"], item["LastModified"].timestamp(), item["ETag"].strip('"')
+                ))
+        return objects
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+
+
+def create_storage(backend: str = STORAGE_BACKEND, compression: Optional[str] = None) -> DocumentStorage:
+    """
+    Build the storage backend named by `backend` (PRD_STORAGE_BACKEND) with its environment settings.
+
+    Unless `compression` (PRD_STORAGE_COMPRESSION) is "none", it is wrapped in
+    a content-addressed, compressed layer (see content_store). "auto" means
+    none for the local backend: its documents are the session files the
+    session store keeps as plain files anyway, so the layer would only
+    compress the latest documents.
+    """
+    from prd_generator.content_store import STORAGE_COMPRESSION, ContentAddressedStorage
+
+    if backend == "local":
+        storage: DocumentStorage = LocalStorage()
+    elif backend == "sqlite":
+        storage = SqliteBlobStorage()
+    elif backend == "s3":
+        storage = S3Storage()
+    else:
+        raise ValueError(f"Unknown storage backend '{backend}'. Use local, sqlite or s3")
+    compression = compression or STORAGE_COMPRESSION
+    if compression == "auto" and backend == "local":
+        compression = "none"
+    return storage if compression == "none" else ContentAddressedStorage(storage, compression)
+
+
+class BackgroundWriter:
+    """
+    Writes documents to a store on a background thread so tasks never wait on storage.
+    """
+
+    def __init__(self, storage: DocumentStorage, attempts: int = WRITE_ATTEMPTS):
+        self.storage = storage
+        self.attempts = attempts
+        self.written = 0
+        self.failed = 0
+        self._queue: "queue.Queue[Tuple[str, bytes]]" = queue.Queue()
+        self._pending: Dict[str, int] = {}      # key -> queued writes not yet finished
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def write(self, key: str, data: bytes) -> None:
+        """Queue `data` to be stored under `key`."""
+        check_key(key)
+        with self._cond:
+            self._pending[key] = self._pending.get(key, 0) + 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="storage-writer", daemon=True)
+                self._thread.start()
+        self._queue.put((key, data))
+
+    def _run(self) -> None:
+        while True:
+            key, data = self._queue.get()
+            for attempt in range(1, self.attempts + 1):
+                try:
+                    self.storage.put(key, data)
+                    self.written += 1
+                    break
+                except Exception as e:
+                    if attempt == self.attempts:
+                        self.failed += 1
+                        logger.error(f"Failed to store {key} in {self.storage.name} storage: {e}")
+                    else:
+                        time.sleep(0.5 * attempt)
+            with self._cond:
+                self._pending[key] -= 1
+                if not self._pending[key]:
+                    del self._pending[key]
+                self._cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for every queued write to finish.
+
+        Returns:
+            False if writes were still pending after `timeout`
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending, timeout)
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            pending = sum(self._pending.values())
+        return {"pending": pending, "written": self.written, "failed": self.failed}
+
+
+_storage: Optional[DocumentStorage] = None
+_writer: Optional[BackgroundWriter] = None
+_lock = threading.Lock()
+
+
+def get_storage() -> DocumentStorage:
+    """The process's storage backend, created from the environment on first use."""
+    global _storage
+    with _lock:
+        if _storage is None:
+            _storage = create_storage()
+        return _storage
+
+
+def get_writer() -> BackgroundWriter:
+    """The process's background writer for get_storage()."""
+    global _writer
+    storage = get_storage()
+    with _lock:
+        if _writer is None:
+            _writer = BackgroundWriter(storage)
+        return _writer
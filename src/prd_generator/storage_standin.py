@@ -0,0 +1,211 @@
+"""
+Local S3-compatible storage stand-in for tests and offline runs.
+Implements the subset of the S3 API the S3 storage backend uses (bucket
+create/head, object put/get/head/delete and ListObjectsV2), MinIO-style with
+objects kept as files, without checking request signatures.
+
+Point the service at it with:
+    PRD_STORAGE_BACKEND=s3 PRD_S3_ENDPOINT_URL=http://127.0.0.1:9000 \\
+    AWS_ACCESS_KEY_ID=standin AWS_SECRET_ACCESS_KEY=standin AWS_DEFAULT_REGION=us-east-1
+"""
+
+import argparse
+import hashlib
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import formatdate
+from pathlib import Path
+from typing import List, Optional
+from xml.sax.saxutils import escape
+
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+
+_XML_NS = "http://s3.amazonaws.com/doc/2006-03-01/"
+_MAX_KEYS = 1000
+
+
+def _error(status: int, code: str, message: str, resource: str) -> Response:
+    body = (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f"<Error><Code>{code}</Code><Message>{escape(message)}</Message><Resource>{escape(resource)}</Resource></Error>"
+    )
+    return Response(body, status_code=status, media_type="application/xml")
+
+
+def _iso(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+class StorageStandin:
+    """
+    Buckets as directories and objects as files under a data directory.
+    """
+
+    def __init__(self, data_dir: Path):
+        self.data_dir = Path(data_dir)
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _object_path(self, bucket: str, key: str) -> Optional[Path]:
+        if not key or any(part in ("", ".", "..") for part in key.split("/")):
+            return None
+        return self.data_dir / bucket / "objects" / key
+
+    def _etag(self, path: Path) -> str:
+        return hashlib.md5(path.read_bytes()).hexdigest()
+
+    def _object_headers(self, path: Path) -> dict:
+        stat = path.stat()
+        return {
+            "ETag": f'"{self._etag(path)}"',
+            "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+            "Content-Length": str(stat.st_size),
+        }
+
+    def create_app(self) -> FastAPI:
+        # No docs routes: /docs and /redoc would shadow buckets of those names
+        app = FastAPI(title="S3 Storage Stand-in", docs_url=None, redoc_url=None, openapi_url=None)
+
+        @app.put("/{bucket}")
+        async def create_bucket(bucket: str):
+            (self.data_dir / bucket / "objects").mkdir(parents=True, exist_ok=True)
+            return Response(status_code=200, headers={"Location": f"/{bucket}"})
+
+        @app.head("/{bucket}")
+        async def head_bucket(bucket: str):
+            return Response(status_code=200 if (self.data_dir / bucket).is_dir() else 404)
+
+        @app.get("/{bucket}")
+        async def list_objects(bucket: str, request: Request):
+            params = request.query_params
+            prefix = params.get("prefix", "")
+            delimiter = params.get("delimiter", "")
+            start_after = params.get("continuation-token") or params.get("start-after") or ""
+            max_keys = min(int(params.get("max-keys", _MAX_KEYS)), _MAX_KEYS)
+            root = self.data_dir / bucket / "objects"
+            if not root.is_dir():
+                return _error(404, "NoSuchBucket", "The specified bucket does not exist", f"/{bucket}")
+
+            keys = sorted(
+                path.relative_to(root).as_posix() for path in root.rglob("*")
+                if path.is_file() and not path.name.startswith(".")
+            )
+            contents: List[str] = []
+            prefixes: List[str] = []
+            truncated, last = False, None
+            for key in keys:
+                if not key.startswith(prefix) or key <= start_after:
+                    continue
+                if len(contents) + len(prefixes) >= max_keys:
+                    truncated = True
+                    break
+                rest = key[len(prefix):]
+                if delimiter and delimiter in rest:
+                    common = prefix + rest.split(delimiter, 1)[0] + delimiter
+                    if common not in prefixes:
+                        prefixes.append(common)
+                    last = key
+                    continue
+                path = root / key
+                stat = path.stat()
+                contents.append(
+                    f"<Contents><Key>{escape(key)}</Key><LastModified>{_iso(stat.st_mtime)}</LastModified>"
+                    f"<ETag>&quot;{self._etag(path)}&quot;</ETag><Size>{stat.st_size}</Size>"
+                    "<StorageClass>STANDARD</StorageClass></Contents>"
+                )
+                last = key
+
+            body = (
+                f'<?xml version="1.0" encoding="UTF-8"?><ListBucketResult xmlns="{_XML_NS}">'
+                f"<Name>{escape(bucket)}</Name><Prefix>{escape(prefix)}</Prefix>"
+                f"<KeyCount>{len(contents) + len(prefixes)}</KeyCount><MaxKeys>{max_keys}</MaxKeys>"
+                + (f"<Delimiter>{escape(delimiter)}</Delimiter>" if delimiter else "")
+                + f"<IsTruncated>{'true' if truncated else 'false'}</IsTruncated>"
+                + (f"<NextContinuationToken>{escape(last)}</NextContinuationToken>" if truncated and last else "")
+                + "".join(contents)
+                + "".join(f"<CommonPrefixes><Prefix>{escape(p)}</Prefix></CommonPrefixes>" for p in prefixes)
+                + "</ListBucketResult>"
+            )
+            return Response(body, media_type="application/xml")
+
+        @app.put("/{bucket}/{key:path}")
+        async def put_object(bucket: str, key: str, request: Request):
+            path = self._object_path(bucket, key)
+            if path is None:
+                return _error(400, "InvalidArgument", "Invalid object key", f"/{bucket}/{key}")
+            if not (self.data_dir / bucket).is_dir():
+                return _error(404, "NoSuchBucket", "The specified bucket does not exist", f"/{bucket}")
+            data = await request.body()
+            with self._lock:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_name(f".{path.name}.{time.time_ns()}.tmp")
+                tmp_path.write_bytes(data)
+                tmp_path.replace(path)
+            return Response(status_code=200, headers={"ETag": f'"{hashlib.md5(data).hexdigest()}"'})
+
+        @app.get("/{bucket}/{key:path}")
+        async def get_object(bucket: str, key: str):
+            path = self._object_path(bucket, key)
+            if path is None or not path.is_file():
+                return _error(404, "NoSuchKey", "The specified key does not exist.", f"/{bucket}/{key}")
+            return Response(path.read_bytes(), media_type="application/octet-stream", headers=self._object_headers(path))
+
+        @app.head("/{bucket}/{key:path}")
+        async def head_object(bucket: str, key: str):
+            path = self._object_path(bucket, key)
+            if path is None or not path.is_file():
+                return Response(status_code=404)
+            return Response(status_code=200, media_type="application/octet-stream", headers=self._object_headers(path))
+
+        @app.delete("/{bucket}/{key:path}")
+        async def delete_object(bucket: str, key: str):
+            path = self._object_path(bucket, key)
+            if path is not None:
+                path.unlink(missing_ok=True)
+            return Response(status_code=204)
+
+        return app
+
+
+def create_app(data_dir: Optional[Path] = None) -> FastAPI:
+    """Create the stand-in ASGI app, keeping objects in `data_dir` (a temporary directory if omitted)."""
+    return StorageStandin(data_dir or Path(tempfile.mkdtemp(prefix="prd-s3-"))).create_app()
+
+
+def serve_in_thread(data_dir: Optional[Path] = None, host: str = "127.0.0.1", port: int = 9000):
+    """
+    Start the stand-in in a background thread.
+
+    Returns:
+        Tuple of (uvicorn server, thread); set server.should_exit to stop it
+    """
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(create_app(data_dir), host=host, port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="storage-standin", daemon=True)
+    thread.start()
+    while not server.started and thread.is_alive():
+        time.sleep(0.05)
+    return server, thread
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the stand-in server from the command line."""
+    parser = argparse.ArgumentParser(description="Local S3-compatible storage stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--data-dir", type=Path, default=Path("outputs/s3-standin"), help="Directory holding buckets")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    print(f"🪣 S3 storage stand-in listening on http://{args.host}:{args.port}, data in {args.data_dir}")
+    print(f"   export PRD_STORAGE_BACKEND=s3 PRD_S3_ENDPOINT_URL=http://{args.host}:{args.port}")
+    uvicorn.run(create_app(args.data_dir), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
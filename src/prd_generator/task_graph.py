@@ -0,0 +1,197 @@
+"""
+Task dependency graph for the PRD Generator crew.
+Reads the `context:` relationships from tasks.yaml so callers can work out
+which tasks a given set of documents actually depends on, and which tasks
+are stale after the inputs of a session change.
+"""
+
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import yaml
+
+TASKS_CONFIG_PATH = Path(__file__).parent / "config" / "tasks.yaml"
+
+_VARIABLE_PATTERN = re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*)\}")
+
+
+def interpolate(template: str, inputs: Dict[str, Any]) -> str:
+    """
+    Fill {placeholders} in a task template the way CrewAI does.
+
+    Dict and list values are serialised canonically so the result (and any
+    hash of it) does not depend on key order. Unknown placeholders are kept.
+    """
+    def replace(match: "re.Match[str]") -> str:
+        name = match.group(1)
+        if name not in inputs:
+            return match.group(0)
+        value = inputs[name]
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, sort_keys=True)
+        return str(value)
+
+    return _VARIABLE_PATTERN.sub(replace, template or "")
+
+
+def hash_text(text: str) -> str:
+    """Return the hex SHA-256 digest of a string."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class UnknownDocumentError(ValueError):
+    """Raised when a requested document is not produced by any task."""
+
+
+class TaskGraph:
+    """
+    Dependency graph of crew tasks, in the order they are declared in tasks.yaml.
+    """
+
+    def __init__(self, tasks_config: Dict[str, Dict[str, Any]]):
+        """
+        Build the graph from a parsed tasks.yaml mapping.
+
+        Args:
+            tasks_config: Task name -> task configuration, in declaration order
+        """
+        self.order: List[str] = list(tasks_config)
+        self.dependencies: Dict[str, List[str]] = {}
+        self.documents: Dict[str, str] = {}
+        self.templates: Dict[str, str] = {}
+
+        for name, config in tasks_config.items():
+            context = config.get("context") or []
+            unknown = [dep for dep in context if dep not in tasks_config]
+            if unknown:
+                raise ValueError(f"Task '{name}' references unknown context tasks: {unknown}")
+            self.dependencies[name] = list(context)
+            self.templates[name] = (config.get("description") or "") + "\n" + (config.get("expected_output") or "")
+
+            document = config.get("document")
+            if document:
+                self.documents[Path(document).name] = name
+
+    @classmethod
+    def from_yaml(cls, path: Path = TASKS_CONFIG_PATH) -> "TaskGraph":
+        """Load the graph from a tasks.yaml file."""
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(yaml.safe_load(f))
+
+    def task_for_document(self, document: str) -> str:
+        """Return the name of the task that writes the given document."""
+        task_name = self.documents.get(Path(document).name)
+        if task_name is None:
+            raise UnknownDocumentError(
+                f"Unknown document '{document}'. Available documents: {sorted(self.documents)}"
+            )
+        return task_name
+
+    def document_for_task(self, task_name: str) -> Optional[str]:
+        """Return the document written by a task, if it writes one."""
+        for document, name in self.documents.items():
+            if name == task_name:
+                return document
+        return None
+
+    def input_hash(self, task_name: str, inputs: Dict[str, Any], output_hashes: Dict[str, str]) -> str:
+        """
+        Hash the effective inputs of a task.
+
+        The effective inputs are the interpolated description and expected
+        output plus the output hashes of every context task.
+
+        Args:
+            task_name: Task to hash
+            inputs: Crew inputs used for interpolation
+            output_hashes: Task name -> hash of its raw output, for all context tasks
+
+        Returns:
+            Hex digest identifying the task's effective inputs
+        """
+        parts = [interpolate(self.templates[task_name], inputs)]
+        for dep in self.dependencies[task_name]:
+            parts.append(f"{dep}:{output_hashes[dep]}")
+        return hash_text("\n".join(parts))
+
+    def fresh_tasks(self, inputs: Dict[str, Any], records: Dict[str, Dict[str, Any]]) -> Set[str]:
+        """
+        Return the tasks whose recorded outputs are still valid for the inputs.
+
+        A task is fresh when its recorded input hash matches the one computed
+        from the new inputs and all of its context tasks are fresh, so a change
+        spreads down the context graph to every dependent task.
+
+        Args:
+            inputs: New crew inputs
+            records: Task name -> record with 'input_hash' and 'output_hash'
+
+        Returns:
+            Names of tasks that do not need to run again
+        """
+        fresh: Set[str] = set()
+        output_hashes: Dict[str, str] = {}
+        for name in self.order:
+            record = records.get(name) or {}
+            if not record.get("input_hash") or not record.get("output_hash"):
+                continue
+            if any(dep not in fresh for dep in self.dependencies[name]):
+                continue
+            if self.input_hash(name, inputs, output_hashes) == record["input_hash"]:
+                fresh.add(name)
+                output_hashes[name] = record["output_hash"]
+        return fresh
+
+    def plan(
+        self,
+        documents: Optional[Iterable[str]] = None,
+        cached: Iterable[str] = (),
+        regenerate_targets: bool = True
+    ) -> Tuple[List[str], List[str]]:
+        """
+        Compute the minimal set of tasks needed to produce the given documents.
+
+        Upstream tasks are reused when a cached output exists for them, which
+        also prunes everything above them.
+
+        Args:
+            documents: Document filenames to produce (all documents if None)
+            cached: Names of tasks with a reusable output
+            regenerate_targets: Run the requested tasks even when they are cached
+
+        Returns:
+            Tuple of (tasks to run, cached tasks to reuse), both in declaration order
+        """
+        if documents is None:
+            targets = list(self.order)
+        else:
+            targets = [self.task_for_document(document) for document in documents]
+
+        cached_tasks: Set[str] = set(cached)
+        to_run: Set[str] = set()
+        to_reuse: Set[str] = set()
+
+        if not regenerate_targets:
+            to_reuse.update(name for name in targets if name in cached_tasks)
+            targets = [name for name in targets if name not in cached_tasks]
+
+        stack = list(targets)
+        while stack:
+            name = stack.pop()
+            if name in to_run:
+                continue
+            to_run.add(name)
+            for dep in self.dependencies[name]:
+                if dep in cached_tasks:
+                    to_reuse.add(dep)
+                else:
+                    stack.append(dep)
+
+        to_reuse -= to_run
+        return (
+            [name for name in self.order if name in to_run],
+            [name for name in self.order if name in to_reuse],
+        )
@@ -0,0 +1,216 @@
+"""
+Technology catalog and stack ranking for the Tech Stack Advisor.
+The catalog is a versioned YAML file loaded once per process into NumPy
+arrays: per-entry weights, tier flags and bitmasks of suitable scales,
+platforms and languages, plus a symmetric compatibility matrix. Stacks are
+ranked per category from those arrays and memoized per query.
+"""
+
+import logging
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import yaml
+
+logger = logging.getLogger(__name__)
+
+TECH_CATALOG_PATH = Path(os.getenv("PRD_TECH_CATALOG", Path(__file__).parent / "config" / "tech_catalog.yaml"))
+RANK_CACHE_SIZE = int(os.getenv("PRD_TECH_CATALOG_CACHE", "1024"))    # memoized rankings per process
+SUPPORTED_VERSIONS = (1,)
+
+SCALES = ("small", "medium", "large")
+PLATFORMS = ("web", "mobile", "desktop")
+TIERS = ("free", "paid")
+ALTERNATIVES = 2
+COMPATIBILITY_BONUS = 0.3   # per compatible technology already in the stack
+LANGUAGE_BONUS = 0.2        # for sharing a language with the stack
+
+_SCALE_ALIASES = {
+    "mvp": "small", "prototype": "small", "startup": "small", "personal": "small", "low": "small",
+    "moderate": "medium", "growth": "medium",
+    "enterprise": "large", "high": "large", "massive": "large", "global": "large",
+}
+_PLATFORM_ALIASES = {
+    "website": "web", "webapp": "web", "web app": "web", "saas": "web", "api": "web",
+    "ios": "mobile", "android": "mobile", "mobile app": "mobile", "app": "mobile",
+    "windows": "desktop", "macos": "desktop", "linux": "desktop", "desktop app": "desktop",
+}
+
+
+class CatalogError(ValueError):
+    """Raised when a technology catalog file is malformed or of an unsupported version."""
+
+
+@dataclass(frozen=True)
+class CategoryPick:
+    """Technologies chosen for one category, and the runners-up."""
+    category: str
+    section: str
+    label: str
+    chosen: Tuple[str, ...]
+    alternatives: Tuple[str, ...]
+
+
+def normalize_scale(scale: str) -> str:
+    """Map a free-form scale ("MVP", "enterprise", ...) to small, medium or large."""
+    value = (scale or "").strip().lower()
+    return value if value in SCALES else _SCALE_ALIASES.get(value, "medium")
+
+
+def normalize_platform(project_type: str) -> str:
+    """Map a free-form project type to web, mobile or desktop (web if unknown)."""
+    value = (project_type or "").strip().lower()
+    return value if value in PLATFORMS else _PLATFORM_ALIASES.get(value, "web")
+
+
+def _mask(values: Optional[List[str]], vocabulary: Tuple[str, ...], field: str, entry_id: str) -> int:
+    """Bitmask of `values` in `vocabulary`; all bits when the field is omitted."""
+    if values is None:
+        return (1 << len(vocabulary)) - 1
+    unknown = set(values) - set(vocabulary)
+    if unknown:
+        raise CatalogError(f"Technology {entry_id!r} has unknown {field}: {sorted(unknown)}")
+    return sum(1 << vocabulary.index(value) for value in set(values))
+
+
+class TechCatalog:
+    """
+    Technologies indexed for ranking.
+
+    Entry i of every array describes `self.ids[i]`; `by_category`, `by_id` and
+    `by_alias` map to those positions.
+    """
+
+    def __init__(self, data: Dict[str, Any]):
+        """
+        Args:
+            data: Parsed catalog file
+
+        Raises:
+            CatalogError: If the version is unsupported or an entry is invalid
+        """
+        self.version = data.get("version")
+        if self.version not in SUPPORTED_VERSIONS:
+            raise CatalogError(f"Unsupported technology catalog version {self.version!r}; supported: {SUPPORTED_VERSIONS}")
+        categories = data.get("categories") or {}
+        self.sections: Dict[str, str] = {category: spec["section"] for category, spec in categories.items()}
+        self.labels: Dict[str, str] = {category: spec.get("label", category) for category, spec in categories.items()}
+        entries = data.get("technologies") or []
+
+        self.ids = tuple(entry["id"] for entry in entries)
+        self.names = tuple(entry["name"] for entry in entries)
+        self.by_id = {entry_id: position for position, entry_id in enumerate(self.ids)}
+        if len(self.by_id) != len(self.ids):
+            raise CatalogError("Technology catalog has duplicate ids")
+        self.languages = tuple(sorted({language for entry in entries for language in entry.get("languages", [])}))
+        if len(self.languages) > 32:
+            raise CatalogError("Technology catalog has more than 32 languages")
+
+        count = len(entries)
+        self.weights = np.array([float(entry.get("weight", 0.5)) for entry in entries], dtype=np.float32)
+        self.free = np.array([entry.get("tier") == "free" for entry in entries], dtype=bool)
+        self.scale_masks = np.zeros(count, dtype=np.uint8)
+        self.platform_masks = np.zeros(count, dtype=np.uint8)
+        self.language_masks = np.zeros(count, dtype=np.uint32)
+        self.compatible = np.zeros((count, count), dtype=np.float32)
+        self.by_alias: Dict[str, Tuple[int, ...]] = {}
+
+        members: Dict[str, List[int]] = {category: [] for category in self.sections}
+        for position, entry in enumerate(entries):
+            entry_id = entry["id"]
+            if entry.get("category") not in members:
+                raise CatalogError(f"Technology {entry_id!r} has unknown category {entry.get('category')!r}")
+            if entry.get("tier") not in TIERS:
+                raise CatalogError(f"Technology {entry_id!r} has unknown tier {entry.get('tier')!r}")
+            members[entry["category"]].append(position)
+            self.scale_masks[position] = _mask(entry.get("scales"), SCALES, "scales", entry_id)
+            self.platform_masks[position] = _mask(entry.get("platforms"), PLATFORMS, "platforms", entry_id)
+            # No languages means usable from any, which is not a shared language
+            if entry.get("languages"):
+                self.language_masks[position] = _mask(entry["languages"], self.languages, "languages", entry_id)
+            for other in entry.get("pairs_with", []):
+                if other not in self.by_id:
+                    raise CatalogError(f"Technology {entry_id!r} pairs with unknown technology {other!r}")
+                self.compatible[position, self.by_id[other]] = self.compatible[self.by_id[other], position] = 1.0
+            for alias in entry.get("aliases", []):
+                self.by_alias[alias] = self.by_alias.get(alias, ()) + (position,)
+        self.by_category = {category: np.array(positions, dtype=np.int32) for category, positions in members.items()}
+        self.rank = lru_cache(maxsize=RANK_CACHE_SIZE)(self._rank)
+
+    @classmethod
+    def from_file(cls, path: Path = TECH_CATALOG_PATH) -> "TechCatalog":
+        """Load a catalog from a YAML file."""
+        with open(path, "r", encoding="utf-8") as f:
+            # The C loader, when PyYAML has it, parses the file several times faster
+            catalog = cls(yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader)) or {})
+        logger.info(f"Loaded technology catalog v{catalog.version}: {len(catalog.ids)} technologies")
+        return catalog
+
+    def recommend(self, project_type: str, scale: str = "medium", pricing_tier: str = "premium",
+                  selected_technologies: Optional[Dict[str, Any]] = None) -> Tuple[CategoryPick, ...]:
+        """
+        Rank a stack for a project.
+
+        Args:
+            project_type: Project type, normalized to web, mobile or desktop
+            scale: Expected scale, normalized to small, medium or large
+            pricing_tier: "free" limits choices to free technologies
+            selected_technologies: Form selections such as {"database": "supabase"};
+                technologies they name are always chosen
+
+        Returns:
+            One pick per category with a suitable technology, in catalog order
+        """
+        selected = tuple(sorted(
+            str(value).lower() for value in (selected_technologies or {}).values() if isinstance(value, str)
+        ))
+        return self.rank(normalize_platform(project_type), normalize_scale(scale), pricing_tier == "free", selected)
+
+    def _rank(self, platform: str, scale: str, free_only: bool, selected: Tuple[str, ...]) -> Tuple[CategoryPick, ...]:
+        """Memoized through `self.rank`; arguments are normalized by `recommend`."""
+        suitable = (
+            (self.scale_masks & (1 << SCALES.index(scale)) != 0)
+            & (self.platform_masks & (1 << PLATFORMS.index(platform)) != 0)
+        )
+        if free_only:
+            suitable &= self.free
+
+        pinned = list(dict.fromkeys(position for alias in selected for position in self.by_alias.get(alias, ())))
+        in_stack = np.zeros(len(self.ids), dtype=np.float32)
+        in_stack[pinned] = 1.0
+        stack_languages = int(np.bitwise_or.reduce(self.language_masks[pinned])) if pinned else 0
+
+        picks = []
+        for category, positions in self.by_category.items():
+            chosen = [position for position in pinned if position in positions]
+            candidates = positions[suitable[positions] & (in_stack[positions] == 0)]
+            if not len(candidates) and not chosen:
+                continue
+            scores = (
+                self.weights[candidates]
+                + COMPATIBILITY_BONUS * (self.compatible[candidates] @ in_stack)
+                + LANGUAGE_BONUS * ((self.language_masks[candidates] & stack_languages) != 0)
+            )
+            ranked = candidates[np.argsort(-scores, kind="stable")].tolist()
+            if not chosen:
+                chosen, ranked = ranked[:1], ranked[1:]
+                in_stack[chosen] = 1.0
+                stack_languages |= int(self.language_masks[chosen[0]])
+            picks.append(CategoryPick(
+                category=category,
+                section=self.sections[category],
+                label=self.labels[category],
+                chosen=tuple(self.names[position] for position in chosen),
+                alternatives=tuple(self.names[position] for position in ranked[:ALTERNATIVES]),
+            ))
+        return tuple(picks)
+
+
+@lru_cache(maxsize=None)
+def get_catalog(path: Path = TECH_CATALOG_PATH) -> TechCatalog:
+    """The process-wide catalog, loaded on first use."""
+    return TechCatalog.from_file(path)
@@ -12,6 +12,8 @@ from crewai.llm import BaseLLM
 from cerebras.cloud.sdk import Cerebras
 from pydantic import Field
 
+from prd_generator.usage import TokenBudgetExceeded
+
 logger = logging.getLogger(__name__)
 
 
@@ -112,6 +114,23 @@ class CerebrasLLM(BaseLLM):
             logger.info(f"Making Cerebras API call with model {self.model}")
             response = self.client.chat.completions.create(**params)
 
+            # Report token usage the way crewAI's LLM does, so agent token
+            # counters and job usage accounting see Cerebras calls too
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                logger.info(
+                    f"Cerebras usage: {getattr(usage, 'prompt_tokens', 0)} prompt, "
+                    f"{getattr(usage, 'completion_tokens', 0)} completion tokens"
+                )
+                for callback in callbacks or []:
+                    if hasattr(callback, "log_success_event"):
+                        callback.log_success_event(
+                            kwargs=params,
+                            response_obj={"usage": usage},
+                            start_time=0,
+                            end_time=0,
+                        )
+
             # Extract response text
             if hasattr(response, 'choices') and response.choices:
                 content = response.choices[0].message.content
@@ -120,6 +139,8 @@ class CerebrasLLM(BaseLLM):
                 logger.error("No choices in Cerebras response")
                 return ""
 
+        except TokenBudgetExceeded:
+            raise
         except Exception as e:
             logger.error(f"Cerebras API call failed: {e}")
             # Return empty string instead of raising to prevent CrewAI task failures
@@ -1,9 +1,11 @@
 from crewai.tools import BaseTool
-from typing import Type, Any, Dict, List
+from typing import Type, Any, Dict, List, Optional, Tuple
 from pydantic import BaseModel, Field
 import json
 import os
 from datetime import datetime
+from prd_generator.tech_catalog import get_catalog
+from prd_generator.idea_classifier import IdeaProfile, current_idea_profile
 
 class PRDTemplateInput(BaseModel):
     """Input schema for PRD template generation."""
@@ -186,46 +188,58 @@ class PRDTemplateGenerator(BaseTool):
 
 class TechStackInput(BaseModel):
     """Input schema for tech stack recommendations."""
-    project_type: str = Field(..., description="Type of project (web, mobile, desktop)")
-    requirements: Dict[str, Any] = Field(..., description="Technical requirements")
-    scale: str = Field(default="medium", description="Expected project scale")
+    project_type: Optional[str] = Field(default=None, description="Type of project (web, mobile, desktop); defaults to the type inferred from the idea")
+    requirements: Dict[str, Any] = Field(default_factory=dict, description="Technical requirements")
+    scale: Optional[str] = Field(default=None, description="Expected project scale (small, medium, large); defaults to the scale inferred from the idea")
 
 class TechStackAdvisor(BaseTool):
     name: str = "Tech Stack Advisor"
     description: str = "Provides technology stack recommendations based on project requirements"
     args_schema: Type[BaseModel] = TechStackInput
 
-    def _run(self, project_type: str, requirements: Dict[str, Any], scale: str = "medium") -> str:
+    def _run(self, project_type: Optional[str] = None, requirements: Optional[Dict[str, Any]] = None,
+             scale: Optional[str] = None) -> str:
         """Generate tech stack recommendations."""
 
+        # Fill arguments the agent left out from the profile of the idea being generated
+        profile = current_idea_profile() or IdeaProfile()
+        project_type = project_type or profile.platform
+        scale = scale or profile.scale
+        requirements = requirements or {}
+
         # Check if free tier constraints apply
         pricing_tier = requirements.get("pricing_tier", "premium")
         selected_technologies = requirements.get("selected_technologies", {})
 
         if pricing_tier == "free":
-            return self._generate_free_tier_recommendations(selected_technologies)
+            return self._generate_free_tier_recommendations(project_type, scale, selected_technologies)
         else:
-            return self._generate_premium_recommendations(project_type, scale)
-
-    def _generate_free_tier_recommendations(self, selected_technologies: Dict[str, str]) -> str:
-        """Generate recommendations using only specified free tier technologies."""
-
-        # Map selected technologies to human-readable names
-        tech_names = {
-            "supabase": "Supabase Free Tier",
-            "planetscale": "PlanetScale Free Tier",
-            "selfhosted": "Self-hosted PostgreSQL/MySQL",
-            "railway": "Railway Free Tier",
-            "render": "Render Free Tier",
-            "nodejs": "Node.js Express APIs",
-            "python": "Python FastAPI",
-            "flexible": "Node.js and Python (combined)",
-            "github": "GitHub Actions",
-            "sentry": "Sentry Free Tier",
-            "combined": "Recommended combined workflow"
-        }
-
-        selected_names = {k: tech_names.get(v, v) for k, v in selected_technologies.items()}
+            return self._generate_premium_recommendations(project_type, scale, selected_technologies)
+
+    def _rank_stack(self, project_type: str, scale: str, pricing_tier: str,
+                    selected_technologies: Dict[str, str] = None) -> Tuple[Dict[str, Dict[str, List[str]]], Dict[str, str]]:
+        """
+        Rank a stack from the technology catalog.
+
+        Returns:
+            Tuple of (section -> label -> options, category -> chosen technologies)
+        """
+        picks = get_catalog().recommend(project_type, scale, pricing_tier, selected_technologies)
+        recommendations: Dict[str, Dict[str, List[str]]] = {}
+        chosen: Dict[str, str] = {}
+        for pick in picks:
+            options = [f"{name} (recommended)" for name in pick.chosen] + list(pick.alternatives)
+            recommendations.setdefault(pick.section, {})[pick.label] = options
+            chosen[pick.category] = ", ".join(pick.chosen)
+        return recommendations, chosen
+
+    def _generate_free_tier_recommendations(self, project_type: str, scale: str = "medium",
+                                            selected_technologies: Dict[str, str] = None) -> str:
+        """Generate recommendations ranked from the free technologies of the catalog, with their limits."""
+
+        recommendations, chosen = self._rank_stack(project_type, scale, "free", selected_technologies)
+        backend = chosen.get("backend") or chosen.get("backend_service") or "Not selected"
+        devtools = ", ".join(chosen[category] for category in ("ci_cd", "monitoring") if category in chosen)
 
         recommendation_text = f"""
 # Technology Stack Recommendations (Free Tier Only)
@@ -233,33 +247,45 @@ class TechStackAdvisor(BaseTool):
 ## Pricing Tier: Free Tier Only
 All recommendations use only scalable free services with clear upgrade paths.
 
-## Selected Technologies
+## Project Type: {project_type.title()}
+## Scale: {scale.title()}
+
+## Recommended Architecture
+
+### Frontend Technologies
+{self._format_tech_options(recommendations.get('Frontend Technologies', {}))}
+
+### Backend Technologies
+{self._format_tech_options(recommendations.get('Backend Technologies', {}))}
+
+### Database Solutions
+{self._format_tech_options(recommendations.get('Database Solutions', {}))}
+
+### DevOps & Deployment
+{self._format_tech_options(recommendations.get('DevOps & Deployment', {}))}
+
+## Free Tier Limits and Upgrade Paths
 
 ### Database Service
-- **Selected:** {selected_names.get('database', 'Not selected')}
+- **Selected:** {chosen.get('database', 'Not selected')}
 - **Free Tier Limits:** Understand the constraints and plan for scaling
 - **Upgrade Path:** Enterprise plans start from $25/month
 
 ### Hosting Platform
-- **Selected:** {selected_names.get('hosting', 'Not selected')}
+- **Selected:** {chosen.get('hosting', 'Not selected')}
 - **Free Tier Limits:** Resource and bandwidth restrictions apply
 - **Upgrade Path:** Paid plans available for increased capacity
 
 ### Backend Services
-- **Selected:** {selected_names.get('backend', 'Not selected')}
+- **Selected:** {backend}
 - **Free Tier Limits:** API rate limits, compute restrictions
 - **Upgrade Path:** pay-as-you-go pricing for increased usage
 
 ### Development Tools
-- **Selected:** {selected_names.get('devtools', 'Not selected')}
+- **Selected:** {devtools or 'Not selected'}
 - **Free Tier Limits:** Usage quotas and feature restrictions
 - **Upgrade Path:** Team and organization plans available
 
-## Frontend Framework Guidance
-- **Next.js (Recommended):** Works with all hosting platforms listed
-- **Tailwind CSS (Styling):** Free, compatible with all platforms
-- **Vercel/Netlify Integration:** Optimal for Next.js deployments
-
 ## Free Tier Best Practices
 
 ### Database Considerations
@@ -306,43 +332,11 @@ All recommendations use only scalable free services with clear upgrade paths.
 
         return recommendation_text.strip()
 
-    def _generate_premium_recommendations(self, project_type: str, scale: str = "medium") -> str:
-        """Generate premium recommendations (original logic)."""
-
-        tech_stacks = {
-            "web": {
-                "frontend": {
-                    "primary": ["React.js + Next.js", "Vue.js + Nuxt.js", "Angular"],
-                    "styling": ["Tailwind CSS", "Material-UI", "Ant Design"],
-                    "state_management": ["Redux Toolkit", "Zustand", "Pinia"]
-                },
-                "backend": {
-                    "primary": ["Node.js + Express", "Python + FastAPI", "Python + Django"],
-                    "alternatives": [".NET Core", "Ruby on Rails", "Go + Gin"]
-                },
-                "database": {
-                    "relational": ["PostgreSQL", "MySQL", "SQLite"],
-                    "nosql": ["MongoDB", "Redis", "Firebase Firestore"]
-                },
-                "deployment": {
-                    "hosting": ["Vercel", "Netlify", "AWS", "DigitalOcean"],
-                    "containers": ["Docker", "Kubernetes"],
-                    "ci_cd": ["GitHub Actions", "GitLab CI", "Jenkins"]
-                }
-            },
-            "mobile": {
-                "cross_platform": ["React Native", "Flutter", "Ionic"],
-                "native_ios": ["Swift", "Objective-C"],
-                "native_android": ["Kotlin", "Java"],
-                "backend": ["Firebase", "Supabase", "Node.js", "Python"]
-            },
-            "desktop": {
-                "cross_platform": ["Electron", "Tauri", "Flutter Desktop"],
-                "native": ["Python + Tkinter", "C# + WPF", "Java + JavaFX"]
-            }
-        }
-
-        recommendations = tech_stacks.get(project_type.lower(), tech_stacks["web"])
+    def _generate_premium_recommendations(self, project_type: str, scale: str = "medium",
+                                          selected_technologies: Dict[str, str] = None) -> str:
+        """Generate premium recommendations ranked from the technology catalog."""
+
+        recommendations, _ = self._rank_stack(project_type, scale, "premium", selected_technologies)
 
         recommendation_text = f"""
 # Technology Stack Recommendations
@@ -353,16 +347,16 @@ All recommendations use only scalable free services with clear upgrade paths.
 ## Recommended Architecture
 
 ### Frontend Technologies
-{self._format_tech_options(recommendations.get('frontend', {}))}
+{self._format_tech_options(recommendations.get('Frontend Technologies', {}))}
 
 ### Backend Technologies
-{self._format_tech_options(recommendations.get('backend', {}))}
+{self._format_tech_options(recommendations.get('Backend Technologies', {}))}
 
 ### Database Solutions
-{self._format_tech_options(recommendations.get('database', {}))}
+{self._format_tech_options(recommendations.get('Database Solutions', {}))}
 
 ### DevOps & Deployment
-{self._format_tech_options(recommendations.get('deployment', {}))}
+{self._format_tech_options(recommendations.get('DevOps & Deployment', {}))}
 
 ## Open Source Alternatives
 - **Monitoring:** Prometheus + Grafana
@@ -390,7 +384,7 @@ All recommendations use only scalable free services with clear upgrade paths.
         """Format technology options into readable text."""
         formatted = ""
         for category, options in tech_dict.items():
-            formatted += f"\n**{category.title()}:**\n"
+            formatted += f"\n**{category}:**\n"
             for option in options:
                 formatted += f"- {option}\n"
         return formatted
@@ -0,0 +1,578 @@
+"""
+Tracing spans for PRD generation jobs.
+Each job is one trace: job → task → agent execution → LLM call / tool call,
+built from crewAI events and exported to local JSONL files or an OTLP/HTTP
+collector. `prd_generator trace show <job_id>` renders a per-job waterfall.
+"""
+
+import argparse
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TRACES_DIR = Path(os.getenv("PRD_TRACE_DIR", "outputs/traces"))
+TRACE_EXPORTER = os.getenv("PRD_TRACE_EXPORTER", "jsonl")          # jsonl, otlp or none
+OTLP_ENDPOINT = os.getenv("PRD_OTLP_ENDPOINT", "http://127.0.0.1:4318")
+
+# Spans open in the current job, innermost last. Job workers run each job on a
+# single thread and crewAI emits its events synchronously on that thread.
+_active_spans: contextvars.ContextVar[Optional[List["Span"]]] = contextvars.ContextVar("prd_active_spans", default=None)
+
+
+@dataclass
+class Span:
+    """A timed operation within a job trace."""
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    name: str
+    kind: str                           # job, task, agent, llm or tool
+    start: float
+    end: Optional[float] = None
+    status: str = "ok"                  # ok or error
+    error: Optional[str] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> Optional[float]:
+        """Span duration in seconds, once ended."""
+        return None if self.end is None else self.end - self.start
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the span for export."""
+        return {**asdict(self), "duration": self.duration}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Span":
+        """Rebuild a span from its exported form."""
+        return cls(**{key: value for key, value in data.items() if key != "duration"})
+
+
+class JsonlExporter:
+    """
+    Appends finished spans to outputs/traces/<trace_id>.jsonl.
+    """
+
+    def __init__(self, traces_dir: Path = TRACES_DIR):
+        self.traces_dir = Path(traces_dir)
+        self._lock = threading.Lock()
+
+    def path_for(self, trace_id: str) -> Path:
+        """Return the JSONL file holding a trace."""
+        return self.traces_dir / f"{trace_id}.jsonl"
+
+    def export(self, span: Span) -> None:
+        """Write one finished span."""
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self.traces_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.path_for(span.trace_id), "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def load(self, trace_id: str) -> List[Span]:
+        """Read every span of a trace."""
+        path = self.path_for(trace_id)
+        if not path.exists():
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            return [Span.from_dict(json.loads(line)) for line in f if line.strip()]
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _from_otlp_value(value: Dict[str, Any]) -> Any:
+    if "boolValue" in value:
+        return value["boolValue"]
+    if "intValue" in value:
+        return int(value["intValue"])
+    if "doubleValue" in value:
+        return float(value["doubleValue"])
+    return value.get("stringValue")
+
+
+def to_otlp(spans: List[Span], service_name: str = "prd_generator") -> Dict[str, Any]:
+    """Encode spans as an OTLP/JSON ExportTraceServiceRequest."""
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+        "scopeSpans": [{
+            "scope": {"name": "prd_generator.tracing"},
+            "spans": [{
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "parentSpanId": span.parent_id or "",
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(int(span.start * 1e9)),
+                "endTimeUnixNano": str(int((span.end or span.start) * 1e9)),
+                "attributes": [
+                    {"key": key, "value": _otlp_value(value)}
+                    for key, value in {**span.attributes, "prd.kind": span.kind}.items()
+                    if value is not None
+                ],
+                "status": {"code": 2 if span.status == "error" else 1, "message": span.error or ""},
+            } for span in spans],
+        }],
+    }]}
+
+
+def from_otlp(payload: Dict[str, Any]) -> List[Span]:
+    """Decode an OTLP/JSON ExportTraceServiceRequest into spans."""
+    spans = []
+    for resource_spans in payload.get("resourceSpans", []):
+        for scope_spans in resource_spans.get("scopeSpans", []):
+            for item in scope_spans.get("spans", []):
+                attributes = {attr["key"]: _from_otlp_value(attr.get("value", {})) for attr in item.get("attributes", [])}
+                status = item.get("status") or {}
+                spans.append(Span(
+                    trace_id=item["traceId"],
+                    span_id=item["spanId"],
+                    parent_id=item.get("parentSpanId") or None,
+                    name=item.get("name", ""),
+                    kind=attributes.pop("prd.kind", "internal"),
+                    start=int(item["startTimeUnixNano"]) / 1e9,
+                    end=int(item["endTimeUnixNano"]) / 1e9,
+                    status="error" if status.get("code") == 2 else "ok",
+                    error=status.get("message") or None,
+                    attributes=attributes,
+                ))
+    return spans
+
+
+class OtlpExporter:
+    """
+    Buffers a trace's spans and posts them as OTLP/JSON when its root span ends.
+    """
+
+    def __init__(self, endpoint: str = OTLP_ENDPOINT, timeout: float = 5.0):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.timeout = timeout
+        self._pending: Dict[str, List[Span]] = {}
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        """Buffer a finished span, flushing the trace on its root span."""
+        with self._lock:
+            self._pending.setdefault(span.trace_id, []).append(span)
+            if span.parent_id is not None:
+                return
+            spans = self._pending.pop(span.trace_id)
+
+        import httpx
+
+        try:
+            httpx.post(self.url, json=to_otlp(spans), timeout=self.timeout).raise_for_status()
+        except Exception as e:
+            logger.warning(f"Failed to export trace {span.trace_id} to {self.url}: {e}")
+
+
+class Tracer:
+    """
+    Creates spans for the current job and hands finished spans to exporters.
+    """
+
+    def __init__(self, exporters: Optional[List[Any]] = None):
+        self.exporters: List[Any] = list(exporters or [])
+        self.listeners: List[Callable[[Span], None]] = []
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        """Build a tracer from PRD_TRACE_EXPORTER and PRD_OTLP_ENDPOINT."""
+        if TRACE_EXPORTER == "otlp":
+            return cls([OtlpExporter()])
+        if TRACE_EXPORTER == "none":
+            return cls()
+        return cls([JsonlExporter()])
+
+    def add_listener(self, listener: Callable[[Span], None]) -> None:
+        """Call `listener` with every span as it ends."""
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[Span], None]) -> None:
+        """Stop calling a listener added with add_listener."""
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    @staticmethod
+    def active_spans() -> List[Span]:
+        """Spans open in the current job, innermost last (empty outside a job)."""
+        return _active_spans.get() or []
+
+    def current(self, kind: Optional[str] = None) -> Optional[Span]:
+        """Return the innermost open span, optionally of the given kind."""
+        for span in reversed(self.active_spans()):
+            if kind is None or span.kind == kind:
+                return span
+        return None
+
+    def start_span(self, name: str, kind: str, attributes: Optional[Dict[str, Any]] = None) -> Optional[Span]:
+        """Open a child of the current span; does nothing outside a job trace."""
+        stack = _active_spans.get()
+        if not stack:
+            return None
+        parent = stack[-1]
+        span = Span(
+            trace_id=parent.trace_id,
+            span_id=os.urandom(8).hex(),
+            parent_id=parent.span_id,
+            name=name,
+            kind=kind,
+            start=time.time(),
+            attributes=dict(attributes or {}),
+        )
+        stack.append(span)
+        return span
+
+    def end_span(self, kind: str, error: Optional[str] = None, attributes: Optional[Dict[str, Any]] = None) -> Optional[Span]:
+        """
+        End the innermost open span of `kind`, closing any spans left open inside it.
+        """
+        stack = self.active_spans()
+        target = self.current(kind)
+        if target is None:
+            return None
+        while stack:
+            span = stack.pop()
+            if span is target:
+                span.attributes.update(attributes or {})
+                self._finish(span, error)
+                return span
+            self._finish(span, "span was not closed before its parent")
+        return None
+
+    @contextmanager
+    def job_span(self, job_id: str, attributes: Optional[Dict[str, Any]] = None) -> Iterator[Span]:
+        """Open the root span of a job trace for the duration of the block."""
+        span = Span(
+            trace_id=job_id,
+            span_id=os.urandom(8).hex(),
+            parent_id=None,
+            name="job",
+            kind="job",
+            start=time.time(),
+            attributes=dict(attributes or {}),
+        )
+        token = _active_spans.set([span])
+        error = None
+        try:
+            yield span
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            stack = _active_spans.get()
+            while stack and stack[-1] is not span:
+                self._finish(stack.pop(), "span was not closed before its parent")
+            _active_spans.reset(token)
+            self._finish(span, error)
+
+    def add_tokens(self, prompt_tokens: int, completion_tokens: int) -> None:
+        """Add token counts to every open span of the current job."""
+        for span in self.active_spans():
+            attributes = span.attributes
+            attributes["tokens.prompt"] = attributes.get("tokens.prompt", 0) + prompt_tokens
+            attributes["tokens.completion"] = attributes.get("tokens.completion", 0) + completion_tokens
+
+    def _finish(self, span: Span, error: Optional[str]) -> None:
+        span.end = time.time()
+        if error:
+            span.status = "error"
+            span.error = error
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:
+                logger.warning(f"Span export failed: {e}")
+        for listener in list(self.listeners):
+            try:
+                listener(span)
+            except Exception as e:
+                logger.warning(f"Span listener failed: {e}")
+
+
+def _token_totals(agent: Any) -> Optional[tuple]:
+    """Read an agent's cumulative (prompt, completion) token counters."""
+    process = getattr(agent, "_token_process", None)
+    if process is None:
+        return None
+    return process.prompt_tokens, process.completion_tokens
+
+
+def install_crewai_handlers(tracer: Tracer) -> None:
+    """
+    Turn crewAI task, agent, tool and LLM events into spans on `tracer`.
+
+    LLM call token counts are the difference of the agent's own token counters
+    around the call, which crewAI updates before emitting the completion event.
+    """
+    from crewai.events.event_bus import crewai_event_bus
+    from crewai.events.types.agent_events import (
+        AgentExecutionCompletedEvent,
+        AgentExecutionErrorEvent,
+        AgentExecutionStartedEvent,
+    )
+    from crewai.events.types.llm_events import (
+        LLMCallCompletedEvent,
+        LLMCallFailedEvent,
+        LLMCallStartedEvent,
+        LLMStreamChunkEvent,
+    )
+    from crewai.events.types.task_events import TaskCompletedEvent, TaskFailedEvent, TaskStartedEvent
+    from crewai.events.types.tool_usage_events import (
+        ToolUsageErrorEvent,
+        ToolUsageFinishedEvent,
+        ToolUsageStartedEvent,
+    )
+
+    # crewAI strips the agent from LLM events, so remember it per agent span,
+    # and the agent's token counters at the start of each LLM span
+    agents: Dict[str, Any] = {}
+    llm_calls: Dict[str, tuple] = {}
+    # Agent spans whose last LLM call failed, so the next call counts as a retry
+    failed_llm_calls: set = set()
+
+    def task_name(task: Any) -> str:
+        return getattr(task, "name", None) or "task"
+
+    @crewai_event_bus.on(TaskStartedEvent)
+    def on_task_started(source, event):
+        tracer.start_span(task_name(event.task), "task", {"task.name": task_name(event.task)})
+
+    @crewai_event_bus.on(TaskCompletedEvent)
+    def on_task_completed(source, event):
+        tracer.end_span("task", attributes={"task.output_chars": len(event.output.raw or "")})
+
+    @crewai_event_bus.on(TaskFailedEvent)
+    def on_task_failed(source, event):
+        tracer.end_span("task", error=event.error)
+
+    @crewai_event_bus.on(AgentExecutionStartedEvent)
+    def on_agent_started(source, event):
+        span = tracer.start_span(event.agent.role, "agent", {
+            "agent.role": event.agent.role,
+            "agent.iterations": 0,
+        })
+        if span is not None:
+            agents[span.span_id] = event.agent
+
+    def end_agent(error: Optional[str] = None) -> None:
+        span = tracer.end_span("agent", error=error)
+        if span is not None:
+            agents.pop(span.span_id, None)
+            failed_llm_calls.discard(span.span_id)
+
+    @crewai_event_bus.on(AgentExecutionCompletedEvent)
+    def on_agent_completed(source, event):
+        end_agent()
+
+    @crewai_event_bus.on(AgentExecutionErrorEvent)
+    def on_agent_error(source, event):
+        end_agent(error=event.error)
+
+    @crewai_event_bus.on(ToolUsageStartedEvent)
+    def on_tool_started(source, event):
+        tracer.start_span(event.tool_name, "tool", {
+            "tool.name": event.tool_name,
+            "tool.run_attempts": event.run_attempts,
+        })
+
+    @crewai_event_bus.on(ToolUsageFinishedEvent)
+    def on_tool_finished(source, event):
+        tracer.end_span("tool", attributes={"tool.from_cache": bool(event.from_cache)})
+
+    @crewai_event_bus.on(ToolUsageErrorEvent)
+    def on_tool_error(source, event):
+        tracer.end_span("tool", error=str(event.error))
+
+    @crewai_event_bus.on(LLMCallStartedEvent)
+    def on_llm_started(source, event):
+        agent_span = tracer.current("agent")
+        iteration, agent, retry = None, None, False
+        if agent_span is not None:
+            iteration = agent_span.attributes.get("agent.iterations", 0) + 1
+            agent_span.attributes["agent.iterations"] = iteration
+            agent = agents.get(agent_span.span_id)
+            retry = agent_span.span_id in failed_llm_calls
+        span = tracer.start_span(event.model or "llm", "llm", {
+            "llm.model": event.model,
+            "agent.iteration": iteration,
+            "llm.retry": retry,
+        })
+        if span is not None:
+            llm_calls[span.span_id] = (agent, _token_totals(agent))
+
+    @crewai_event_bus.on(LLMStreamChunkEvent)
+    def on_llm_chunk(source, event):
+        span = tracer.current("llm")
+        if span is not None and "llm.ttft_seconds" not in span.attributes:
+            span.attributes["llm.ttft_seconds"] = time.time() - span.start
+
+    def end_llm(error: Optional[str] = None) -> None:
+        span = tracer.current("llm")
+        if span is None:
+            return
+        agent, before = llm_calls.pop(span.span_id, (None, None))
+        after = _token_totals(agent)
+        if before and after:
+            # Counted on the LLM span and rolled up onto its agent, task and job spans
+            tracer.add_tokens(after[0] - before[0], after[1] - before[1])
+        agent_span = tracer.current("agent")
+        if agent_span is not None:
+            if error:
+                failed_llm_calls.add(agent_span.span_id)
+            else:
+                failed_llm_calls.discard(agent_span.span_id)
+        tracer.end_span("llm", error=error)
+
+    @crewai_event_bus.on(LLMCallCompletedEvent)
+    def on_llm_completed(source, event):
+        end_llm()
+
+    @crewai_event_bus.on(LLMCallFailedEvent)
+    def on_llm_failed(source, event):
+        end_llm(error=event.error)
+
+
+tracer = Tracer.from_env()
+_installed = False
+_install_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Return the process tracer, registering the crewAI event handlers once."""
+    global _installed
+    with _install_lock:
+        if not _installed:
+            install_crewai_handlers(tracer)
+            _installed = True
+    return tracer
+
+
+def render_waterfall(spans: List[Span], width: int = 40) -> str:
+    """Render the spans of one trace as a text waterfall, children under their parents."""
+    if not spans:
+        return "No spans recorded"
+
+    children: Dict[Optional[str], List[Span]] = {}
+    ids = {span.span_id for span in spans}
+    for span in spans:
+        parent = span.parent_id if span.parent_id in ids else None
+        children.setdefault(parent, []).append(span)
+
+    origin = min(span.start for span in spans)
+    total = max((span.end or span.start) for span in spans) - origin or 1e-9
+
+    lines = [f"Trace {spans[0].trace_id}  ({total:.3f}s, {len(spans)} spans)",
+             f"{'start':>9} {'duration':>9}  {'span':<44} {'':<{width + 2}} details"]
+
+    def walk(parent_id: Optional[str], depth: int) -> None:
+        for span in sorted(children.get(parent_id, []), key=lambda s: s.start):
+            offset = span.start - origin
+            duration = span.duration or 0.0
+            begin = int(offset / total * width)
+            length = max(1, int(round(duration / total * width)))
+            bar = " " * begin + "█" * min(length, width - begin)
+
+            details = []
+            attrs = span.attributes
+            if attrs.get("job.queue_wait_seconds") is not None:
+                details.append(f"queue wait {attrs['job.queue_wait_seconds']:.3f}s")
+            if attrs.get("agent.iteration"):
+                details.append(f"iter {attrs['agent.iteration']}")
+            if "tokens.prompt" in attrs:
+                details.append(f"tokens {attrs['tokens.prompt']}→{attrs.get('tokens.completion', 0)}")
+            if attrs.get("llm.ttft_seconds") is not None:
+                details.append(f"ttft {attrs['llm.ttft_seconds']:.3f}s")
+            if attrs.get("tool.from_cache"):
+                details.append("cached")
+            if span.status == "error":
+                details.append(f"ERROR {span.error}")
+
+            label = ("  " * depth + f"{span.kind}:{span.name}")[:44]
+            lines.append(f"{offset:>8.3f}s {duration:>8.3f}s  {label:<44} |{bar:<{width}}| {', '.join(details)}")
+            walk(span.span_id, depth + 1)
+
+    walk(None, 0)
+    return "\n".join(lines)
+
+
+def create_collector_app(exporter: JsonlExporter):
+    """Build a minimal OTLP/HTTP JSON collector storing traces as JSONL."""
+    from fastapi import FastAPI, HTTPException, Request
+
+    app = FastAPI(title="Trace Collector", description="Local OTLP/HTTP JSON collector stand-in")
+
+    @app.post("/v1/traces")
+    async def collect(request: Request):
+        for span in from_otlp(await request.json()):
+            exporter.export(span)
+        return {"partialSuccess": {}}
+
+    @app.get("/traces/{trace_id}")
+    async def get_trace(trace_id: str):
+        spans = exporter.load(trace_id)
+        if not spans:
+            raise HTTPException(status_code=404, detail="Trace not found")
+        return {"trace_id": trace_id, "spans": [span.to_dict() for span in spans]}
+
+    return app
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Show job waterfalls or run the local collector stand-in."""
+    parser = argparse.ArgumentParser(prog="prd_generator trace", description="Job traces")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    show = subparsers.add_parser("show", help="Render the waterfall of a job trace")
+    show.add_argument("job_id")
+    show.add_argument("--dir", type=Path, default=TRACES_DIR, help="Directory of JSONL traces")
+    show.add_argument("--collector-url", help="Fetch the trace from a collector stand-in instead")
+    show.add_argument("--width", type=int, default=40)
+
+    collector = subparsers.add_parser("collector", help="Run a local OTLP/HTTP JSON collector")
+    collector.add_argument("--host", default="127.0.0.1")
+    collector.add_argument("--port", type=int, default=4318)
+    collector.add_argument("--dir", type=Path, default=TRACES_DIR)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "collector":
+        import uvicorn
+
+        print(f"📡 Trace collector listening on http://{args.host}:{args.port}/v1/traces (storing in {args.dir})")
+        uvicorn.run(create_collector_app(JsonlExporter(args.dir)), host=args.host, port=args.port, log_level="warning")
+        return 0
+
+    if args.collector_url:
+        import httpx
+
+        response = httpx.get(f"{args.collector_url.rstrip('/')}/traces/{args.job_id}", timeout=10)
+        spans = [Span.from_dict(data) for data in response.json().get("spans", [])] if response.status_code == 200 else []
+    else:
+        spans = JsonlExporter(args.dir).load(args.job_id)
+
+    if not spans:
+        print(f"❌ No trace found for job {args.job_id}")
+        return 1
+    print(render_waterfall(spans, width=args.width))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,441 @@
+"""
+Token and cost accounting for generation jobs.
+Every LLM call's prompt, completion and reasoning tokens are recorded against
+the running job and task, checked against a per-job token ceiling, and rolled
+up per session and pricing tier in a persistent ledger, which also compares
+tasks run with and without warm-start context.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_JOB_TOKENS = int(os.getenv("PRD_MAX_JOB_TOKENS", "1000000"))            # 0 disables the ceiling
+PROMPT_TOKEN_PRICE = float(os.getenv("PRD_PROMPT_TOKEN_PRICE", "0.25"))      # USD per million tokens
+COMPLETION_TOKEN_PRICE = float(os.getenv("PRD_COMPLETION_TOKEN_PRICE", "0.69"))
+USAGE_LEDGER_PATH = Path(os.getenv("PRD_USAGE_LEDGER", "outputs/usage/jobs.jsonl"))
+USAGE_LEDGER_MAX_BYTES = int(os.getenv("PRD_USAGE_LEDGER_MAX_BYTES", str(16 * 2**20)))   # rotated to <ledger>.1 beyond this
+USAGE_SESSIONS = int(os.getenv("PRD_USAGE_SESSIONS", "1000"))     # most recently active sessions with their own totals
+_SNAPSHOT_EVERY = 100     # jobs between snapshots of the running totals
+
+_job_usage: contextvars.ContextVar[Optional["JobUsage"]] = contextvars.ContextVar("prd_job_usage", default=None)
+
+
+class TokenBudgetExceeded(TimeoutError):
+    """
+    Raised when a job uses more tokens than its ceiling.
+
+    crewAI retries a failed agent execution unless the error is a TimeoutError,
+    so deriving from it aborts the task instead of spending more tokens.
+    """
+
+
+@dataclass
+class TokenUsage:
+    """Token counts of one or more LLM calls."""
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    reasoning_tokens: int = 0      # included in completion_tokens
+    calls: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    @property
+    def cost(self) -> float:
+        """Cost in USD at the configured per-million-token prices."""
+        return (self.prompt_tokens * PROMPT_TOKEN_PRICE + self.completion_tokens * COMPLETION_TOKEN_PRICE) / 1_000_000
+
+    def add(self, other: "TokenUsage") -> None:
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.reasoning_tokens += other.reasoning_tokens
+        self.calls += other.calls
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "total_tokens": self.total_tokens, "cost_usd": round(self.cost, 6)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TokenUsage":
+        return cls(**{key: data.get(key, 0) for key in ("prompt_tokens", "completion_tokens", "reasoning_tokens", "calls")})
+
+    @classmethod
+    def from_response_usage(cls, usage: Any) -> "TokenUsage":
+        """Read an OpenAI-style usage block (object or dict)."""
+        def get(obj: Any, name: str) -> Any:
+            return obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+
+        details = get(usage, "completion_tokens_details")
+        return cls(
+            prompt_tokens=get(usage, "prompt_tokens") or 0,
+            completion_tokens=get(usage, "completion_tokens") or 0,
+            reasoning_tokens=(get(details, "reasoning_tokens") if details else 0) or 0,
+            calls=1,
+        )
+
+
+@dataclass
+class JobUsage:
+    """Token usage of one job, per task, against the job's token ceiling."""
+    job_id: str
+    session_id: str
+    pricing_tier: str
+    max_tokens: int = MAX_JOB_TOKENS
+    total: TokenUsage = field(default_factory=TokenUsage)
+    by_task: Dict[str, TokenUsage] = field(default_factory=dict)
+    warm_start: Dict[str, Dict[str, Any]] = field(default_factory=dict)     # see GenerationResult.warm_start
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+
+    def record(self, task_name: str, usage: TokenUsage) -> None:
+        """
+        Add one LLM call's usage.
+
+        Raises:
+            TokenBudgetExceeded: If the job is now over its token ceiling
+        """
+        with self._lock:
+            self.total.add(usage)
+            self.by_task.setdefault(task_name, TokenUsage()).add(usage)
+            total_tokens = self.total.total_tokens
+        if self.max_tokens and total_tokens > self.max_tokens:
+            raise TokenBudgetExceeded(
+                f"Job {self.job_id} used {total_tokens} tokens, over its ceiling of {self.max_tokens}"
+            )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            **self.total.to_dict(),
+            "max_tokens": self.max_tokens or None,
+            "by_task": {name: usage.to_dict() for name, usage in self.by_task.items()},
+        }
+
+    def to_record(self, status: str) -> Dict[str, Any]:
+        """Build the ledger record of the finished job."""
+        return {
+            "job_id": self.job_id,
+            "session_id": self.session_id,
+            "pricing_tier": self.pricing_tier,
+            "status": status,
+            "finished": time.time(),
+            **self.to_dict(),
+            "warm_start": self.warm_start,
+        }
+
+
+def current_job_usage() -> Optional[JobUsage]:
+    """Return the usage of the job running on this thread, if any."""
+    return _job_usage.get()
+
+
+@contextmanager
+def job_usage_scope(usage: JobUsage) -> Iterator[JobUsage]:
+    """Record LLM usage on this thread against `usage` for the duration of the block."""
+    token = _job_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _job_usage.reset(token)
+
+
+class UsageCallback:
+    """
+    LLM callback recording usage for one task of the current job.
+
+    Uses the same `log_success_event` hook crewAI calls, synchronously after
+    each LLM response, for its own token counters.
+    """
+
+    def __init__(self, task_name: str):
+        self.task_name = task_name
+
+    def log_success_event(self, kwargs: Dict[str, Any], response_obj: Dict[str, Any], start_time: Any, end_time: Any) -> None:
+        usage = response_obj.get("usage") if isinstance(response_obj, dict) else None
+        job_usage = current_job_usage()
+        if usage is None or job_usage is None:
+            return
+        job_usage.record(self.task_name, TokenUsage.from_response_usage(usage))
+
+
+_installed = False
+_install_lock = threading.Lock()
+
+
+def install_crewai_handlers() -> None:
+    """Attach a UsageCallback to every agent execution that runs inside a job (once per process)."""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        _installed = True
+
+    from crewai.events.event_bus import crewai_event_bus
+    from crewai.events.types.agent_events import AgentExecutionStartedEvent
+
+    @crewai_event_bus.on(AgentExecutionStartedEvent)
+    def on_agent_started(source, event):
+        executor = getattr(event.agent, "agent_executor", None)
+        if current_job_usage() is None or executor is None:
+            return
+        executor.callbacks = [
+            callback for callback in executor.callbacks or [] if not isinstance(callback, UsageCallback)
+        ] + [UsageCallback(getattr(event.task, "name", None) or "task")]
+
+
+def warm_start_effect(sums: Dict[str, Dict[str, Dict[str, int]]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Mean LLM calls and tokens per run of each warm-startable task, by how it ran.
+
+    "warm" runs had reference context from similar sessions, "holdout" runs had
+    matches but ran without them (see PRD_WARM_START_HOLDOUT) and "cold" runs
+    had no match. LLM calls per run are the agent's iterations, bounded by max_iter.
+
+    Args:
+        sums: Task name -> group -> runs and summed usage (see UsageRollup.warm_start)
+    """
+    return {
+        task_name: {
+            group: {
+                "runs": totals["runs"],
+                "mean_calls": round(totals["calls"] / totals["runs"], 3),
+                "mean_prompt_tokens": round(totals["prompt_tokens"] / totals["runs"], 1),
+                "mean_completion_tokens": round(totals["completion_tokens"] / totals["runs"], 1),
+            }
+            for group, totals in by_group.items()
+        }
+        for task_name, by_group in sums.items()
+    }
+
+
+_WARM_START_SUMS = ("runs", "calls", "prompt_tokens", "completion_tokens")
+
+
+@dataclass
+class UsageRollup:
+    """Usage summed over finished jobs, updated as each one is recorded."""
+    jobs: int = 0
+    aborted_jobs: int = 0
+    total: TokenUsage = field(default_factory=TokenUsage)
+    by_task: Dict[str, TokenUsage] = field(default_factory=dict)
+    # Task name -> "warm", "holdout" or "cold" -> runs and summed usage of its completed runs
+    warm_start: Dict[str, Dict[str, Dict[str, int]]] = field(default_factory=dict)
+
+    def add(self, record: Dict[str, Any]) -> None:
+        """Count a finished job's usage record (see JobUsage.to_record)."""
+        self.jobs += 1
+        self.aborted_jobs += record["status"] == "token_budget_exceeded"
+        self.total.add(TokenUsage.from_dict(record))
+        for task_name, task_usage in record.get("by_task", {}).items():
+            self.by_task.setdefault(task_name, TokenUsage()).add(TokenUsage.from_dict(task_usage))
+        if record["status"] != "completed":
+            return
+        for task_name, warm_start in (record.get("warm_start") or {}).items():
+            usage = record.get("by_task", {}).get(task_name)
+            if usage is None:
+                continue
+            group = "warm" if warm_start["injected"] else "holdout" if warm_start["matches"] else "cold"
+            self._add_warm_start(task_name, group, {"runs": 1, **usage})
+
+    def _add_warm_start(self, task_name: str, group: str, totals: Dict[str, int]) -> None:
+        sums = self.warm_start.setdefault(task_name, {}).setdefault(group, dict.fromkeys(_WARM_START_SUMS, 0))
+        for key in _WARM_START_SUMS:
+            sums[key] += totals.get(key, 0)
+
+    def merge(self, other: "UsageRollup") -> None:
+        self.jobs += other.jobs
+        self.aborted_jobs += other.aborted_jobs
+        self.total.add(other.total)
+        for task_name, usage in other.by_task.items():
+            self.by_task.setdefault(task_name, TokenUsage()).add(usage)
+        for task_name, by_group in other.warm_start.items():
+            for group, totals in by_group.items():
+                self._add_warm_start(task_name, group, totals)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "jobs": self.jobs,
+            "aborted_jobs": self.aborted_jobs,
+            "total": asdict(self.total),
+            "by_task": {name: asdict(usage) for name, usage in self.by_task.items()},
+            "warm_start": self.warm_start,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "UsageRollup":
+        return cls(
+            jobs=data["jobs"],
+            aborted_jobs=data["aborted_jobs"],
+            total=TokenUsage.from_dict(data["total"]),
+            by_task={name: TokenUsage.from_dict(usage) for name, usage in data["by_task"].items()},
+            warm_start=data["warm_start"],
+        )
+
+
+class UsageLedger:
+    """
+    Finished jobs' usage, appended to a JSONL file and kept as running totals.
+
+    Totals per pricing tier cover every job recorded; totals per session are
+    kept for the `max_sessions` most recently active sessions. The totals are
+    snapshotted next to the ledger with the ledger offset they include, so a
+    restart only replays records appended after the snapshot. A ledger grown
+    past `max_bytes` is rotated to <ledger>.1, replacing the previous one.
+    """
+
+    def __init__(self, path: Path = USAGE_LEDGER_PATH, max_bytes: int = USAGE_LEDGER_MAX_BYTES,
+                 max_sessions: int = USAGE_SESSIONS):
+        self.path = Path(path)
+        self.summary_path = self.path.with_name(f"{self.path.name}.summary.json")
+        self.max_bytes = max_bytes
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self.by_tier: Dict[str, UsageRollup] = {}
+        # (session_id, pricing_tier) -> totals, least recently active first
+        self.by_session: "OrderedDict[Tuple[str, str], UsageRollup]" = OrderedDict()
+        self._unsnapshotted = 0
+
+        replayed = self._replay(self._load_summary())
+        if replayed:
+            logger.info(f"Replayed {replayed} usage records from {self.path}")
+            with self._lock:
+                try:
+                    self._snapshot()
+                except OSError as e:
+                    logger.warning(f"Failed to snapshot usage totals: {e}")
+
+    def _load_summary(self) -> int:
+        """Load the snapshotted totals; returns the ledger offset to replay from."""
+        try:
+            data = json.loads(self.summary_path.read_text(encoding="utf-8"))
+            self.by_tier = {tier: UsageRollup.from_dict(rollup) for tier, rollup in data["by_tier"].items()}
+            self.by_session = OrderedDict(
+                ((session_id, tier), UsageRollup.from_dict(rollup)) for session_id, tier, rollup in data["by_session"]
+            )
+            inode = self.path.stat().st_ino
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable usage summary {self.summary_path}: {e}")
+            self.by_tier, self.by_session = {}, OrderedDict()
+            return 0
+        # A different file means the ledger was rotated after the snapshot, which covers all of the old one
+        return data["offset"] if data.get("inode") == inode else 0
+
+    def _replay(self, offset: int) -> int:
+        replayed = 0
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        self._count(json.loads(line))
+                    except (ValueError, KeyError):
+                        logger.warning(f"Skipping malformed usage record in {self.path}")
+                        continue
+                    replayed += 1
+        except FileNotFoundError:
+            pass
+        return replayed
+
+    def _count(self, record: Dict[str, Any]) -> None:
+        rollup = UsageRollup()
+        rollup.add(record)
+        self.by_tier.setdefault(record["pricing_tier"], UsageRollup()).merge(rollup)
+        key = (record["session_id"], record["pricing_tier"])
+        session = self.by_session.pop(key, None) or UsageRollup()
+        session.merge(rollup)
+        self.by_session[key] = session
+        while len(self.by_session) > self.max_sessions:
+            self.by_session.popitem(last=False)
+
+    def _snapshot(self) -> None:
+        """Write the totals with the ledger offset they include (caller holds the lock)."""
+        try:
+            stat = self.path.stat()
+            offset, inode = stat.st_size, stat.st_ino
+        except FileNotFoundError:
+            offset, inode = 0, None
+        data = {
+            "offset": offset,
+            "inode": inode,
+            "by_tier": {tier: rollup.to_dict() for tier, rollup in self.by_tier.items()},
+            "by_session": [[session_id, tier, rollup.to_dict()] for (session_id, tier), rollup in self.by_session.items()],
+        }
+        self.summary_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.summary_path.with_name(f"{self.summary_path.name}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        tmp_path.replace(self.summary_path)
+        self._unsnapshotted = 0
+
+    def add(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Append a finished job's usage record (see JobUsage.to_record)."""
+        with self._lock:
+            self._count(record)
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+                    size = f.tell()
+                self._unsnapshotted += 1
+                if size > self.max_bytes:
+                    # Snapshot first, so the totals include the whole ledger being rotated away
+                    self._snapshot()
+                    self.path.replace(self.path.with_name(f"{self.path.name}.1"))
+                elif self._unsnapshotted >= _SNAPSHOT_EVERY:
+                    self._snapshot()
+            except OSError as e:
+                logger.warning(f"Failed to persist usage of job {record['job_id']}: {e}")
+        return record
+
+    def aggregate(self, session_id: Optional[str] = None, pricing_tier: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Roll usage up per session, pricing tier and task.
+
+        Totals cover every job, except that `by_session` and the totals for a
+        `session_id` only cover the `max_sessions` most recently active sessions.
+
+        Args:
+            session_id: Only include jobs of this session
+            pricing_tier: Only include jobs of this pricing tier
+        """
+        by_tier: Dict[str, UsageRollup] = {}
+        by_session: Dict[str, TokenUsage] = {}
+        with self._lock:
+            if session_id is None:
+                for tier, rollup in self.by_tier.items():
+                    if pricing_tier in (None, tier):
+                        by_tier.setdefault(tier, UsageRollup()).merge(rollup)
+            for (session, tier), rollup in self.by_session.items():
+                if session_id in (None, session) and pricing_tier in (None, tier):
+                    by_session.setdefault(session, TokenUsage()).add(rollup.total)
+                    if session_id is not None:
+                        by_tier.setdefault(tier, UsageRollup()).merge(rollup)
+
+        total = UsageRollup()
+        for rollup in by_tier.values():
+            total.merge(rollup)
+        return {
+            "jobs": total.jobs,
+            "aborted_jobs": total.aborted_jobs,
+            "prices_usd_per_million": {"prompt": PROMPT_TOKEN_PRICE, "completion": COMPLETION_TOKEN_PRICE},
+            "total": total.total.to_dict(),
+            "by_session": {name: usage.to_dict() for name, usage in by_session.items()},
+            "by_pricing_tier": {name: rollup.total.to_dict() for name, rollup in by_tier.items()},
+            "by_task": {name: usage.to_dict() for name, usage in total.by_task.items()},
+            "warm_start": warm_start_effect(total.warm_start),
+        }
@@ -0,0 +1,369 @@
+"""
+Warm-start context from similar past generations.
+Requirements analyses and tech stack recommendations are indexed as hashed
+bag-of-words vectors (NumPy, no embedding service). When a new idea resembles
+past ones, condensed excerpts of their outputs are handed to the same tasks as
+reference context, so the agents do not rediscover a known archetype from scratch.
+"""
+
+import logging
+import math
+import os
+import random
+import re
+import sqlite3
+import threading
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from prd_generator.sessions import SessionStore
+
+logger = logging.getLogger(__name__)
+
+WARM_START_INDEX_PATH = Path(os.getenv("PRD_WARM_START_INDEX_PATH", "outputs/warm_start.db"))
+MAX_MATCHES = int(os.getenv("PRD_WARM_START_MATCHES", "2"))                 # per task; 0 disables warm starts
+MIN_SIMILARITY = float(os.getenv("PRD_WARM_START_MIN_SIMILARITY", "0.25"))  # cosine similarity
+CONTEXT_CHARS = int(os.getenv("PRD_WARM_START_CHARS", "1200"))              # excerpt length per match
+HOLDOUT = float(os.getenv("PRD_WARM_START_HOLDOUT", "0"))                   # share of matched tasks run without, as a control
+DIMENSIONS = 512
+SUMMARY_CHARS = 4000
+
+# Task -> crew input its references fill in (see tasks.yaml)
+CONTEXT_INPUTS = {
+    "analyze_requirements": "similar_requirements",
+    "recommend_tech_stack": "similar_tech_stacks",
+}
+NO_REFERENCES = "None."
+
+# Ideas weigh more than the excerpts of what was generated for them, words more than word pairs
+_IDEA_WEIGHT = 2.0
+_PAIR_WEIGHT = 0.5
+_WORD = re.compile(r"[a-z0-9][a-z0-9+#]*")
+_LIST_ITEM = re.compile(r"^(?:[-*+]|\d+[.)])\s+")
+_EMPHASIS = re.compile(r"[*_`]+")
+_STOP_WORDS = frozenset(
+    "a an and are as at be by can for from has have in into is it its of on or that the their them then there "
+    "these this to was we will with without you your our us app application platform users user should would "
+    "could must also such than which who what when where how all any each more most other some".split()
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    task_name TEXT NOT NULL,
+    pricing_tier TEXT,
+    idea TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    UNIQUE (session_id, task_name)
+);
+CREATE INDEX IF NOT EXISTS entries_task ON entries (task_name);
+"""
+
+
+def empty_context() -> Dict[str, str]:
+    """Crew inputs for runs without reference context (every task template expects them)."""
+    return {name: NO_REFERENCES for name in CONTEXT_INPUTS.values()}
+
+
+def _stem(word: str) -> str:
+    # Just enough to match "habits" with "habit" and "tracking" with "tracker"
+    for suffix, replacement in (("ies", "y"), ("ing", ""), ("er", ""), ("ed", ""), ("s", "")):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3 and not word.endswith("ss"):
+            return word[:-len(suffix)] + replacement
+    return word
+
+
+def vectorize(text: str, dimensions: int = DIMENSIONS) -> np.ndarray:
+    """
+    Unit-length hashed bag of words and word pairs of `text`.
+
+    Features are hashed with CRC-32 rather than hash(), which is salted per
+    process, so vectors stored by one worker match queries from another.
+    """
+    words = [_stem(word) for word in _WORD.findall(text.lower()) if word not in _STOP_WORDS]
+    features = {word: 1.0 + math.log(count) for word, count in Counter(words).items()}
+    for pair, count in Counter(f"{first} {second}" for first, second in zip(words, words[1:])).items():
+        features[pair] = _PAIR_WEIGHT * (1.0 + math.log(count))
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for feature, weight in features.items():
+        digest = zlib.crc32(feature.encode("utf-8"))
+        # Signed hashing keeps collisions from only ever adding up
+        vector[digest % dimensions] += weight if digest & 0x80000000 else -weight
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+def condense(text: str, chars: int = SUMMARY_CHARS) -> str:
+    """Headings and list items of a Markdown document (its prose if it has none), cut to about `chars`."""
+    lines: List[str] = []
+    size = 0
+    for line in text.splitlines():
+        line = line.strip()
+        if not line.startswith("#") and not _LIST_ITEM.match(line):
+            continue
+        line = _EMPHASIS.sub("", line)[:160].strip()
+        if size + len(line) > chars:
+            break
+        lines.append(line)
+        size += len(line) + 1
+    if not lines:
+        return " ".join(text.split())[:chars]
+    return "\n".join(lines)
+
+
+def _trim(summary: str, chars: int) -> str:
+    if len(summary) <= chars:
+        return summary
+    cut = summary.rfind("\n", 0, chars)
+    return summary[:cut if cut > 0 else chars]
+
+
+def format_references(references: List[Dict[str, Any]], chars: int = CONTEXT_CHARS) -> str:
+    """Reference context for a task prompt: each similar project's idea and an excerpt of its output."""
+    blocks = []
+    for number, reference in enumerate(references, 1):
+        idea = " ".join(reference["idea"].split())
+        blocks.append(
+            f"[{number}] Similar past project (similarity {reference['similarity']:.2f}): {idea[:300]}\n"
+            f"{_trim(reference['summary'], chars)}"
+        )
+    return "\n\n".join(blocks) or NO_REFERENCES
+
+
+@dataclass
+class _TaskVectors:
+    """In-memory vectors of one task's indexed outputs, row by row."""
+    matrix: np.ndarray
+    ids: np.ndarray
+    tiers: np.ndarray
+    sessions: np.ndarray
+
+    def append(self, rows: List[sqlite3.Row]) -> None:
+        self.matrix = np.vstack([self.matrix, np.stack([np.frombuffer(row["vector"], dtype=np.float32) for row in rows])])
+        self.ids = np.concatenate([self.ids, np.array([row["id"] for row in rows], dtype=np.int64)])
+        self.tiers = np.concatenate([self.tiers, np.array([row["pricing_tier"] for row in rows], dtype=object)])
+        self.sessions = np.concatenate([self.sessions, np.array([row["session_id"] for row in rows], dtype=object)])
+
+
+class WarmStartIndex:
+    """
+    Vector index of past task outputs in a SQLite database shared by the API and worker processes.
+
+    Each process keeps every task's vectors in a NumPy matrix, appending rows
+    other processes added and reloading only after deletions, and scores a
+    query against all of them with a single matrix-vector product.
+    """
+
+    def __init__(self, path: Path = WARM_START_INDEX_PATH, dimensions: int = DIMENSIONS):
+        self.path = Path(path)
+        self.dimensions = dimensions
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._vectors: Dict[str, _TaskVectors] = {}
+        self._loaded: Tuple[int, int] = (0, 0)     # (rows, highest id) the matrix reflects
+
+    def _connect(self) -> sqlite3.Connection:
+        """Connection of the calling thread, created (with the schema) on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def add(self, session_id: str, task_name: str, idea: str, output: str, pricing_tier: Optional[str]) -> None:
+        """
+        Index (or re-index) a task output generated for `idea`; other tasks are ignored.
+
+        Failures are logged rather than raised, as warm starts are only an aid.
+        """
+        if task_name not in CONTEXT_INPUTS or not idea:
+            return
+        summary = condense(output)
+        vector = vectorize(idea, self.dimensions) * _IDEA_WEIGHT + vectorize(summary, self.dimensions)
+        vector /= float(np.linalg.norm(vector)) or 1.0
+        try:
+            conn = self._connect()
+            with conn:
+                # A new id for re-indexed outputs lets other processes pick it up as an appended row
+                conn.execute("DELETE FROM entries WHERE session_id = ? AND task_name = ?", (session_id, task_name))
+                conn.execute(
+                    "INSERT INTO entries (session_id, task_name, pricing_tier, idea, summary, vector) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (session_id, task_name, pricing_tier, idea, summary, vector.astype(np.float32).tobytes()),
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to index {task_name} of session {session_id} for warm starts: {e}")
+
+    def remove_session(self, session_id: str) -> None:
+        """Drop a session's outputs from the index."""
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM entries WHERE session_id = ?", (session_id,))
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to remove session {session_id} from the warm start index: {e}")
+
+    def is_empty(self) -> bool:
+        return self._connect().execute("SELECT 1 FROM entries LIMIT 1").fetchone() is None
+
+    def _refresh(self) -> None:
+        """Bring the in-memory vectors up to date with the database. Call with the lock held."""
+        conn = self._connect()
+        # Two queries: SQLite only optimizes COUNT(*) and MAX(id) on their own
+        rows = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        highest = conn.execute("SELECT COALESCE(MAX(id), 0) FROM entries").fetchone()[0]
+        if (rows, highest) == self._loaded:
+            return
+        loaded_rows, loaded_highest = self._loaded
+        new = conn.execute(
+            "SELECT id, session_id, task_name, pricing_tier, vector FROM entries WHERE id > ? ORDER BY id",
+            (loaded_highest,),
+        ).fetchall()
+        if loaded_rows + len(new) != rows:
+            # Rows were deleted: start over
+            self._vectors = {}
+            new = conn.execute("SELECT id, session_id, task_name, pricing_tier, vector FROM entries ORDER BY id").fetchall()
+        for task_name in {row["task_name"] for row in new}:
+            vectors = self._vectors.setdefault(task_name, _TaskVectors(
+                np.zeros((0, self.dimensions), dtype=np.float32), np.zeros(0, dtype=np.int64),
+                np.zeros(0, dtype=object), np.zeros(0, dtype=object),
+            ))
+            vectors.append([row for row in new if row["task_name"] == task_name])
+        self._loaded = (rows, highest)
+
+    def similar(
+        self,
+        idea: str,
+        task_name: str,
+        pricing_tier: Optional[str] = None,
+        exclude: Iterable[str] = (),
+        limit: int = MAX_MATCHES,
+        min_similarity: float = MIN_SIMILARITY,
+    ) -> List[Dict[str, Any]]:
+        """
+        Past outputs of `task_name` generated for the ideas most similar to `idea`.
+
+        Args:
+            idea: Idea description of the new generation
+            task_name: Task whose past outputs to search
+            pricing_tier: Only outputs generated in this pricing tier
+            exclude: Sessions to leave out (e.g. the one being generated)
+            limit: Maximum number of matches
+            min_similarity: Cosine similarity below which outputs are not considered similar
+
+        Returns:
+            Matches, most similar first, with session_id, similarity, idea and summary
+        """
+        if limit <= 0:
+            return []
+        query = vectorize(idea, self.dimensions)
+        excluded = set(exclude)
+        with self._lock:
+            self._refresh()
+            vectors = self._vectors.get(task_name)
+            if vectors is None:
+                return []
+            scores = vectors.matrix @ query
+            if pricing_tier is not None:
+                scores = np.where(vectors.tiers == pricing_tier, scores, -np.inf)
+            # A session has one output per task, so this many candidates always covers `limit`
+            candidates = min(limit + len(excluded), len(scores))
+            top = np.argpartition(-scores, candidates - 1)[:candidates] if candidates else []
+            positions = [
+                position for position in sorted(top, key=lambda position: -scores[position])
+                if scores[position] >= min_similarity and vectors.sessions[position] not in excluded
+            ][:limit]
+            matches = {int(vectors.ids[position]): float(scores[position]) for position in positions}
+        if not matches:
+            return []
+        rows = self._connect().execute(
+            f"SELECT id, session_id, idea, summary FROM entries WHERE id IN ({', '.join('?' * len(matches))})",
+            list(matches),
+        ).fetchall()
+        references = [
+            {"session_id": row["session_id"], "similarity": round(matches[row["id"]], 4),
+             "idea": row["idea"], "summary": row["summary"]}
+            for row in rows
+        ]
+        return sorted(references, key=lambda reference: -reference["similarity"])
+
+    def context(
+        self, inputs: Dict[str, Any], task_names: Iterable[str], exclude: Iterable[str] = ()
+    ) -> Tuple[Dict[str, str], Dict[str, Dict[str, Any]]]:
+        """
+        Reference context for the warm-startable tasks among `task_names`.
+
+        A HOLDOUT share of tasks that have matches runs without them, so the
+        usage ledger can compare iterations and tokens against a control group.
+
+        Returns:
+            Crew inputs filling in every task's reference placeholder, and per
+            task the matched sessions and whether their context was injected
+        """
+        values = empty_context()
+        report: Dict[str, Dict[str, Any]] = {}
+        for task_name in task_names:
+            if task_name not in CONTEXT_INPUTS:
+                continue
+            try:
+                # Tech stacks follow from the tier's constraints, so only the same tier's are comparable
+                references = self.similar(
+                    inputs.get("idea_description", ""), task_name,
+                    pricing_tier=inputs.get("pricing_tier") if task_name == "recommend_tech_stack" else None,
+                    exclude=exclude,
+                )
+            except (sqlite3.Error, ValueError) as e:
+                logger.warning(f"Warm start lookup for {task_name} failed: {e}")
+                references = []
+            injected = bool(references) and random.random() >= HOLDOUT
+            if injected:
+                values[CONTEXT_INPUTS[task_name]] = format_references(references)
+            report[task_name] = {
+                "matches": [
+                    {"session_id": reference["session_id"], "similarity": reference["similarity"]}
+                    for reference in references
+                ],
+                "injected": injected,
+            }
+        return values, report
+
+    def backfill(self, session_store: "SessionStore") -> int:
+        """
+        Index the outputs of sessions stored before the warm start index existed.
+
+        Returns:
+            Number of outputs indexed
+        """
+        if not session_store.root.exists():
+            return 0
+        indexed = 0
+        for session_dir in sorted(session_store.root.iterdir()):
+            try:
+                manifest = session_store.load_manifest(session_dir.name)
+            except (ValueError, OSError):
+                continue
+            inputs = manifest.get("inputs", {})
+            for task_name, record in manifest.get("tasks", {}).items():
+                path = session_dir / f"{task_name}.md"
+                # Outputs reused from another session are indexed there already
+                if task_name not in CONTEXT_INPUTS or record.get("source_session", session_dir.name) != session_dir.name:
+                    continue
+                if not path.exists():
+                    continue
+                self.add(session_dir.name, task_name, inputs.get("idea_description", ""),
+                         path.read_text(encoding="utf-8"), inputs.get("pricing_tier"))
+                indexed += 1
+        return indexed
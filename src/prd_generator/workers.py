@@ -0,0 +1,312 @@
+"""
+Worker subprocesses for crew execution.
+Each job runs in a long-lived worker process that is recycled after a number
+of jobs or once its RSS passes a limit, so memory held by agent histories,
+LiteLLM caches and crewAI's module-level memoize cache (keyed on every
+PrdGenerator instance) is returned to the OS instead of accumulating.
+"""
+
+import logging
+import multiprocessing
+import os
+import queue
+import resource
+import signal
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from prd_generator import health, metrics
+from prd_generator.runner import JobRequest
+
+logger = logging.getLogger(__name__)
+
+WORKER_MODE = os.getenv("PRD_WORKER_MODE", "process")                  # process or thread
+WORKER_MAX_JOBS = int(os.getenv("PRD_WORKER_MAX_JOBS", "20"))           # 0 disables the limit
+WORKER_MAX_RSS_MB = int(os.getenv("PRD_WORKER_MAX_RSS_MB", "1536"))     # 0 disables the limit
+WORKER_STOP_TIMEOUT = float(os.getenv("PRD_WORKER_STOP_TIMEOUT", "30"))
+
+
+class WorkerCrashedError(RuntimeError):
+    """Raised when a worker process dies while running a job."""
+
+
+def memory_stats() -> Dict[str, int]:
+    """Current and peak RSS of this process in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak *= 1 if sys.platform == "darwin" else 1024      # bytes on macOS, KiB on Linux
+    try:
+        with open("/proc/self/statm", "r") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        rss = peak
+    return {"rss_bytes": rss, "peak_rss_bytes": peak}
+
+
+def _worker_main(conn, worker_id: int) -> None:
+    """Entry point of a worker process: build one crew, then run jobs until told to stop."""
+    from prd_generator.generation import GenerationService
+    from prd_generator.runner import execute_job, warm_crew
+
+    # The API process decides when workers stop (see WorkerPool.shutdown), so a
+    # SIGTERM/SIGINT sent to the whole process group must not abort running jobs
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    crew = warm_crew()
+    service = GenerationService(lambda: crew)
+    service.knowledge.load()
+
+    # LLM call events are sent while the job runs so /health in the API process stays current
+    send_lock = threading.Lock()
+
+    def send(message: Dict[str, Any]) -> None:
+        with send_lock:
+            conn.send(message)
+
+    health.add_forwarder(lambda event: send({"llm_call": event}))
+    send({"ready": True, "memory": memory_stats()})
+
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if request is None:
+            break
+        outcome = execute_job(request, service)
+        outcome["memory"] = memory_stats()
+        send(outcome)
+
+
+class WorkerProcess:
+    """
+    One worker subprocess and the pipe used to hand it jobs.
+    """
+
+    def __init__(self, worker_id: int):
+        self.id = worker_id
+        self.jobs_done = 0
+        self.state = "starting"
+        self.started = time.time()
+        self.memory: Dict[str, int] = {}
+        self.current_job: Optional[str] = None
+        self._ready = False
+        self._ready_lock = threading.Lock()
+
+        context = multiprocessing.get_context("spawn")
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, worker_id), name=f"prd-worker-{worker_id}", daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid
+
+    def _recv(self) -> Dict[str, Any]:
+        try:
+            return self.conn.recv()
+        except (EOFError, OSError):
+            raise WorkerCrashedError(
+                f"Worker {self.id} (pid {self.pid}) exited unexpectedly with code {self.process.exitcode}"
+            )
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """
+        Consume the worker's ready message, waiting up to `timeout` (forever if None).
+
+        With a timeout the call never waits for another thread that is already
+        blocked on the message (warm-up, or a job waiting for its worker); it
+        reports the worker as not ready yet instead.
+        """
+        if self._ready:
+            return True
+        if not self._ready_lock.acquire(blocking=timeout is None):
+            return False
+        try:
+            if not self._ready and (timeout is None or self.conn.poll(timeout)):
+                self.memory = self._recv()["memory"]
+                self._ready = True
+                if self.state == "starting":
+                    self.state = "idle"
+            return self._ready
+        finally:
+            self._ready_lock.release()
+
+    def run(self, request: JobRequest) -> Dict[str, Any]:
+        """Run a job in the worker and wait for its outcome."""
+        self.state, self.current_job = "busy", request.job_id
+        try:
+            self.wait_ready()
+            self.conn.send(request)
+            while True:
+                outcome = self._recv()
+                if "llm_call" not in outcome:
+                    break
+                health.llm_health.apply(outcome["llm_call"])
+        finally:
+            self.current_job = None
+        self.jobs_done += 1
+        self.memory = outcome.pop("memory", self.memory)
+        self.state = "idle"
+        return outcome
+
+    def stop(self, timeout: float = WORKER_STOP_TIMEOUT) -> None:
+        """Ask the worker to exit after its current job, killing it after `timeout`."""
+        self.state = "stopping"
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            logger.warning(f"Worker {self.id} did not exit within {timeout}s; killing it")
+            self.process.kill()
+            self.process.join(5)
+        self.conn.close()
+        self.state = "stopped"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "worker_id": self.id,
+            "pid": self.pid,
+            "state": self.state,
+            "current_job": self.current_job,
+            "jobs_done": self.jobs_done,
+            "uptime_seconds": time.time() - self.started,
+            "rss_mb": round(self.memory.get("rss_bytes", 0) / 2**20, 1),
+            "peak_rss_mb": round(self.memory.get("peak_rss_bytes", 0) / 2**20, 1),
+        }
+
+
+class WorkerPool:
+    """
+    Fixed number of worker processes, recycled between jobs.
+    """
+
+    def __init__(self, size: int, max_jobs: int = WORKER_MAX_JOBS, max_rss_mb: int = WORKER_MAX_RSS_MB):
+        """
+        Args:
+            size: Number of worker processes (one per concurrent job)
+            max_jobs: Recycle a worker after this many jobs
+            max_rss_mb: Recycle a worker once its RSS exceeds this many MiB
+        """
+        self.size = size
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self.workers: Dict[int, WorkerProcess] = {}
+        self.recycled: Dict[str, int] = {}
+        self.closing = False
+        self._idle: "queue.Queue[WorkerProcess]" = queue.Queue()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _spawn(self) -> WorkerProcess:
+        with self._lock:
+            self._next_id += 1
+            worker = WorkerProcess(self._next_id)
+            self.workers[worker.id] = worker
+        return worker
+
+    def start(self) -> None:
+        """Start all worker processes; they warm up (imports, crew construction) in the background."""
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+
+    def wait_ready(self) -> None:
+        """Block until every current worker has finished warming up."""
+        with self._lock:
+            workers = list(self.workers.values())
+        for worker in workers:
+            worker.wait_ready()
+
+    def _recycle_reason(self, worker: WorkerProcess) -> Optional[str]:
+        if self.max_jobs and worker.jobs_done >= self.max_jobs:
+            return "max_jobs"
+        if self.max_rss_mb and worker.memory.get("rss_bytes", 0) > self.max_rss_mb * 2**20:
+            return "max_rss"
+        return None
+
+    def _retire(self, worker: WorkerProcess, reason: str) -> None:
+        logger.info(f"Recycling worker {worker.id} (pid {worker.pid}): {reason}, {worker.to_dict()}")
+        worker.stop()
+        with self._lock:
+            self.workers.pop(worker.id, None)
+            self.recycled[reason] = self.recycled.get(reason, 0) + 1
+        metrics.WORKER_RECYCLES.inc(reason=reason)
+
+    def run(self, request: JobRequest) -> Dict[str, Any]:
+        """Run a job on an idle worker, blocking until it finishes."""
+        if self.closing:
+            raise RuntimeError("Worker pool is shutting down")
+        worker = self._idle.get()
+        try:
+            return worker.run(request)
+        except Exception as e:
+            # Job failures come back in the outcome, so any error here (a dead
+            # process, a broken pipe) leaves the worker unusable
+            failed, worker = worker, None
+            self._retire(failed, "crashed")
+            if isinstance(e, WorkerCrashedError):
+                raise
+            raise WorkerCrashedError(f"Worker {failed.id} (pid {failed.pid}) failed: {e}") from e
+        finally:
+            self._release(worker)
+
+    def _release(self, worker: Optional[WorkerProcess]) -> None:
+        """Return a worker to the pool, replacing it if it crashed or is due for recycling."""
+        if self.closing:
+            if worker is not None:
+                worker.stop()
+            return
+        reason = self._recycle_reason(worker) if worker is not None else "crashed"
+        if worker is not None and reason:
+            self._retire(worker, reason)
+        self._idle.put(self._spawn() if reason else worker)
+
+    def shutdown(self, timeout: float = WORKER_STOP_TIMEOUT) -> None:
+        """
+        Stop accepting jobs, let running ones finish within `timeout`, then stop every worker.
+        """
+        self.closing = True
+        deadline = time.time() + timeout
+        while True:
+            try:
+                self._idle.get_nowait().stop()
+            except queue.Empty:
+                pass
+            busy = [worker for worker in self.workers.values() if worker.state == "busy"]
+            if not busy or time.time() >= deadline:
+                break
+            time.sleep(0.2)
+        for worker in list(self.workers.values()):
+            if worker.state not in ("stopped",):
+                worker.stop(timeout=max(deadline - time.time(), 1.0))
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-worker state and memory, and recycling counters."""
+        with self._lock:
+            workers: List[WorkerProcess] = list(self.workers.values())
+        for worker in workers:
+            if worker.state == "starting":
+                try:
+                    worker.wait_ready(timeout=0)
+                except WorkerCrashedError:
+                    pass
+        return {
+            "mode": "process",
+            "max_jobs_per_worker": self.max_jobs,
+            "max_rss_mb": self.max_rss_mb,
+            "recycled": dict(self.recycled),
+            "workers": [worker.to_dict() for worker in workers],
+        }
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Per-worker state and memory as last observed, without reading from any worker."""
+        with self._lock:
+            workers: List[WorkerProcess] = list(self.workers.values())
+        return [worker.to_dict() for worker in workers]
@@ -15,7 +15,7 @@ def check_environment():
     print(f"Python Version: {sys.version}")
 
     # Check required environment variables
-    required_vars = ['OPENAI_API_KEY', 'PINECONE_API_KEY', 'PYTHONPATH']
+    required_vars = ['OPENAI_API_KEY', 'PYTHONPATH']
     optional_vars = ['OPENROUTER_API_KEY', 'OPENROUTER_MODEL', 'OPENAI_BASE_URL']
 
     print("\n🔧 Checking Environment Variables...")
@@ -13,10 +13,6 @@ load_dotenv()
 openai_key = os.getenv('OPENAI_API_KEY')
 print(f"OpenAI API Key loaded: {'Yes' if openai_key else 'No'}")
 
-# Test Pinecone (if available)
-pinecone_key = os.getenv('PINECONE_API_KEY')
-print(f"Pinecone API Key loaded: {'Yes' if pinecone_key else 'No'}")
-
 print("\nBasic environment setup is working!")
 
 # Try basic imports that don't depend on ChromaDB
@@ -32,12 +28,6 @@ try:
 except ImportError as e:
     print(f"❌ Pydantic import failed: {e}")
 
-try:
-    import pinecone
-    print("✅ Pinecone import successful")
-except ImportError as e:
-    print(f"❌ Pinecone import failed: {e}")
-
 # Test LiteLLM with OpenRouter
 try:
     import litellm
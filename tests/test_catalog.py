@@ -0,0 +1,102 @@
+"""Tests for the document catalog's keyset pagination."""
+
+import base64
+import json
+
+import pytest
+
+from prd_generator.catalog import (
+    SORT_COLUMNS,
+    DocumentCatalog,
+    InvalidCursorError,
+    _decode_cursor,
+    _encode_cursor,
+)
+
+TASK_NAMES = ("prd", "stack", "summary")
+
+
+@pytest.fixture
+def catalog(tmp_path) -> DocumentCatalog:
+    catalog = DocumentCatalog(tmp_path / "catalog.db")
+    # Few distinct timestamps and sizes, so pages have to break ties
+    for number in range(9):
+        for task_name in TASK_NAMES:
+            catalog.record(
+                f"session-{number}", task_name, f"{task_name}.md", tmp_path / f"{number}-{task_name}.md",
+                size=100 * (number % 3), output_hash=f"{number}-{task_name}",
+                pricing_tier="free" if number % 2 else "premium", updated=1000.0 + number % 4,
+            )
+    return catalog
+
+
+def pages(catalog: DocumentCatalog, **kwargs):
+    cursor, documents = None, []
+    while True:
+        page = catalog.list(cursor=cursor, **kwargs)
+        documents.extend((doc["session_id"], doc["task_name"]) for doc in page["documents"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return documents, page["total"]
+
+
+def test_cursor_round_trip():
+    row = {"updated": 1000.5, "session_id": "session-1", "task_name": "prd"}
+    cursor = _encode_cursor("updated", "desc", row)
+    assert "=" not in cursor
+    assert _decode_cursor(cursor, "updated", "desc") == [1000.5, "session-1", "prd"]
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor!",
+    base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+    base64.urlsafe_b64encode(b"5").decode(),
+    base64.urlsafe_b64encode(json.dumps(["updated", "desc", 1]).encode()).decode(),
+])
+def test_invalid_cursors_are_rejected(cursor):
+    with pytest.raises(InvalidCursorError):
+        _decode_cursor(cursor, "updated", "desc")
+
+
+def test_cursor_of_another_sort_is_rejected(catalog):
+    cursor = catalog.list(sort="size", order="asc", limit=2)["next_cursor"]
+    with pytest.raises(InvalidCursorError):
+        catalog.list(sort="size", order="desc", cursor=cursor)
+    with pytest.raises(InvalidCursorError):
+        catalog.list(sort="updated", order="asc", cursor=cursor)
+
+
+@pytest.mark.parametrize("sort", SORT_COLUMNS)
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_pages_cover_every_document_once_in_order(catalog, sort, order):
+    documents, total = pages(catalog, sort=sort, order=order, limit=4)
+    everything = catalog.list(sort=sort, order=order, limit=100)["documents"]
+    assert total == 27
+    assert documents == [(doc["session_id"], doc["task_name"]) for doc in everything]
+    assert len(set(documents)) == 27
+
+
+def test_pages_honour_filters(catalog):
+    documents, total = pages(catalog, pricing_tier="free", limit=2)
+    assert total == len(documents) == 12
+    assert {session_id for session_id, _ in documents} == {"session-1", "session-3", "session-5", "session-7"}
+
+    documents, total = pages(catalog, session_id="session-4", limit=2)
+    assert total == 3
+    assert sorted(documents) == [("session-4", task_name) for task_name in TASK_NAMES]
+
+
+def test_documents_written_between_pages_do_not_shift_later_pages(catalog, tmp_path):
+    first = catalog.list(sort="updated", order="desc", limit=5)
+    catalog.record("session-new", "prd", "prd.md", tmp_path / "new.md", 1, "new", updated=2000.0)
+    second = catalog.list(sort="updated", order="desc", limit=5, cursor=first["next_cursor"])
+    seen = {(doc["session_id"], doc["task_name"]) for doc in first["documents"]}
+    assert not seen & {(doc["session_id"], doc["task_name"]) for doc in second["documents"]}
+    assert second["total"] == 28
+
+
+def test_unknown_sort_and_order_are_rejected(catalog):
+    with pytest.raises(ValueError):
+        catalog.list(sort="hash")
+    with pytest.raises(ValueError):
+        catalog.list(order="sideways")
@@ -0,0 +1,112 @@
+"""Tests for content-addressed, compressed document storage."""
+
+import pytest
+
+from prd_generator import content_store
+from prd_generator.content_store import ContentAddressedStorage, build_zlib_dictionary
+from prd_generator.storage import DocumentNotFoundError, LocalStorage
+
+CODECS = [
+    "zlib",
+    pytest.param("zstd", marks=pytest.mark.skipif(content_store.zstandard is None, reason="zstandard is not installed")),
+]
+
+DOCUMENT = b"# Product Requirements\n\n## Goals\n\n- Plan weekly meals\n- Share shopping lists\n" * 20
+
+
+def document(number: int) -> bytes:
+    return DOCUMENT + f"\n## Notes\n\nRevision {number} of the meal planner PRD.\n".encode()
+
+
+@pytest.fixture(params=CODECS)
+def store(request, tmp_path) -> ContentAddressedStorage:
+    return ContentAddressedStorage(LocalStorage(tmp_path), codec=request.param)
+
+
+def blob_keys(store: ContentAddressedStorage):
+    return [obj.key for obj in store.inner.list("cas/blobs/", recursive=True)]
+
+
+def test_round_trip_is_compressed(store):
+    store.put("session-1/prd.md", DOCUMENT)
+    assert store.get("session-1/prd.md") == DOCUMENT
+    assert store.stat("session-1/prd.md").size == len(DOCUMENT)
+    assert [obj.key for obj in store.list("session-1")] == ["session-1/prd.md"]
+    assert store.counters["stored_bytes"] < len(DOCUMENT)
+
+
+def test_identical_documents_share_a_blob(store):
+    store.put("session-1/prd.md", DOCUMENT)
+    store.put("session-2/prd.md", DOCUMENT)
+    store.put("session-2/stack.md", document(1))
+    assert store.counters["writes"] == 3
+    assert store.counters["deduplicated"] == 1
+    assert len(blob_keys(store)) == 2
+    assert store.get("session-2/prd.md") == DOCUMENT
+
+
+def test_plain_objects_written_before_compression_are_read(store):
+    store.inner.put("session-0/prd.md", b"legacy")
+    assert store.get("session-0/prd.md") == b"legacy"
+    assert [obj.key for obj in store.list("session-0")] == ["session-0/prd.md"]
+
+
+def test_garbage_is_collected_on_the_second_pass(store):
+    store.put("session-1/prd.md", DOCUMENT)
+    store.put("session-2/prd.md", DOCUMENT)
+    store.put("session-2/stack.md", document(1))
+    store.delete("session-1/prd.md")
+    store.delete("session-2/stack.md")
+    with pytest.raises(DocumentNotFoundError):
+        store.get("session-2/stack.md")
+
+    assert store.collect_garbage(min_age=0) == 0
+    assert len(blob_keys(store)) == 2
+    assert store.collect_garbage(min_age=0) == 1
+    assert len(blob_keys(store)) == 1
+    assert store.get("session-2/prd.md") == DOCUMENT
+
+
+def test_scan_counts_plain_documents_and_every_stored_byte(store, tmp_path):
+    store.inner.put("session-0/prd.md", b"legacy")
+    store.put("session-1/prd.md", DOCUMENT)
+    store.put("session-2/prd.md", DOCUMENT)
+    (tmp_path / "catalog.db").write_bytes(b"not a document")
+
+    report = store.stats(scan=True)["store"]
+    assert (report["documents"], report["plain_documents"], report["unique_blobs"]) == (3, 1, 1)
+    assert report["logical_bytes"] == 2 * len(DOCUMENT) + len(b"legacy")
+    on_disk = sum(path.stat().st_size for path in tmp_path.rglob("*") if path.is_file()) - len(b"not a document")
+    assert report["stored_bytes"] == on_disk
+
+
+def test_rewritten_blob_survives_collection(store):
+    store.put("session-1/prd.md", DOCUMENT)
+    store.delete("session-1/prd.md")
+    assert store.collect_garbage(min_age=0) == 0
+    store.put("session-3/prd.md", DOCUMENT)
+    assert store.collect_garbage(min_age=0) == 0
+    assert store.get("session-3/prd.md") == DOCUMENT
+
+
+def test_trained_dictionary_decodes_old_and_new_blobs(store, tmp_path):
+    store.put("session-0/prd.md", document(0))
+    assert store.train([document(number) for number in range(50)]) is not None
+    store.put("session-1/prd.md", document(1))
+
+    reopened = ContentAddressedStorage(LocalStorage(tmp_path), codec=store.codec)
+    assert reopened.get("session-0/prd.md") == document(0)
+    assert reopened.get("session-1/prd.md") == document(1)
+
+
+def test_zlib_dictionary_keeps_shared_lines_most_frequent_last():
+    samples = [b"common line here\nrare line number one\n", b"common line here\nother shared text\n",
+               b"common line here\nother shared text\n"]
+    dictionary = build_zlib_dictionary(samples)
+    assert dictionary.endswith(b"common line here\n")
+    assert b"rare line" not in dictionary
+
+
+def test_unknown_codec_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ContentAddressedStorage(LocalStorage(tmp_path), codec="lzma")
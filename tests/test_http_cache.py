@@ -0,0 +1,111 @@
+"""Tests for HTTP caching, compression and byte ranges."""
+
+import gzip
+
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from prd_generator import http_cache
+from prd_generator.http_cache import (
+    CachedBody,
+    RangeNotSatisfiable,
+    cached_response,
+    choose_encoding,
+    etag_matches,
+    parse_range,
+)
+
+BODY = CachedBody(b"# Product Requirements\n\n" + b"The app lets users plan meals.\n" * 100, "text/markdown")
+
+
+@pytest.fixture
+def client() -> TestClient:
+    async def document(request):
+        return cached_response(request, BODY, allow_range=True)
+
+    return TestClient(Starlette(routes=[Route("/document", document)]))
+
+
+def test_etag_matches():
+    etags = BODY.etags
+    assert not etag_matches(None, etags)
+    assert etag_matches("*", etags)
+    assert etag_matches(f'"other", {BODY.etag()}', etags)
+    assert etag_matches(f"W/{BODY.etag('gzip')}", etags)
+    assert not etag_matches('"other"', etags)
+
+
+@pytest.mark.skipif(http_cache.brotli is None, reason="brotli is not installed")
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("gzip, deflate, br", "br"),
+    ("gzip;q=1.0, br;q=0.5", "gzip"),
+    ("identity", None),
+    ("*", "br"),
+    ("br;q=0, *;q=0.1", "gzip"),
+    ("gzip;q=bogus", None),
+])
+def test_choose_encoding(header, expected):
+    assert choose_encoding(header) == expected
+
+
+def test_choose_encoding_without_brotli(monkeypatch):
+    monkeypatch.setattr(http_cache, "brotli", None)
+    assert choose_encoding("br, gzip;q=0.5") == "gzip"
+    assert choose_encoding("br") is None
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("items=0-5", None),
+    ("bytes=0-1,4-5", None),
+    ("bytes=-", None),
+    ("bytes=x-1", None),
+    ("bytes=5-2", None),
+    ("bytes=2-4", (2, 4)),
+    ("bytes=2-", (2, 9)),
+    ("bytes=2-100", (2, 9)),
+    ("bytes=-3", (7, 9)),
+    ("bytes=-20", (0, 9)),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 10) == expected
+
+
+@pytest.mark.parametrize("header, size", [("bytes=10-", 10), ("bytes=-0", 10), ("bytes=-5", 0), ("bytes=0-", 0)])
+def test_unsatisfiable_ranges(header, size):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, size)
+
+
+def test_response_is_compressed_and_revalidated(client):
+    response = client.get("/document", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == BODY.etag("gzip")
+    assert response.content == BODY.content
+    assert len(BODY.variant("gzip")) < len(BODY.content)
+    assert gzip.decompress(BODY.variant("gzip")) == BODY.content
+
+    revalidated = client.get("/document", headers={"If-None-Match": response.headers["etag"]})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+
+
+def test_response_serves_byte_ranges(client):
+    size = len(BODY.content)
+    partial = client.get("/document", headers={"Range": "bytes=2-9", "Accept-Encoding": "identity"})
+    assert partial.status_code == 206
+    assert partial.content == BODY.content[2:10]
+    assert partial.headers["content-range"] == f"bytes 2-9/{size}"
+
+    stale = client.get("/document", headers={"Range": "bytes=2-9", "If-Range": '"old"', "Accept-Encoding": "identity"})
+    assert stale.status_code == 200
+    assert stale.content == BODY.content
+
+    outside = client.get("/document", headers={"Range": f"bytes={size}-"})
+    assert outside.status_code == 416
+    assert outside.headers["content-range"] == f"bytes */{size}"
@@ -0,0 +1,95 @@
+"""Tests for the local idea classifier."""
+
+import dataclasses
+
+import numpy as np
+import pytest
+
+from prd_generator.idea_classifier import (
+    DEFAULTS,
+    IDEA_EXAMPLES_PATH,
+    IDEA_MODEL_PATH,
+    IdeaClassifier,
+    IdeaProfile,
+    _fit,
+    _load_examples,
+    classify_idea,
+    current_idea_profile,
+    idea_profile_scope,
+)
+from prd_generator.tech_catalog import PLATFORMS, SCALES
+
+EXAMPLES = [
+    {"idea": idea, "platform": "web", "domain": domain, "scale": "medium"}
+    for idea, domain in [
+        ("recipes for home cooking", "food"),
+        ("kitchen recipes and meal ideas", "food"),
+        ("cooking classes with recipes", "food"),
+        ("adopt dogs and cats from shelters", "pets"),
+        ("dog walking for busy pet owners", "pets"),
+        ("weather station readings", "weather"),
+        ("weather alerts for gardeners", "weather"),
+        ("a guestbook", "other"),
+    ]
+]
+
+
+@pytest.fixture(scope="module")
+def classifier() -> IdeaClassifier:
+    return IdeaClassifier.from_file()
+
+
+@pytest.mark.parametrize("idea, profile", [
+    ("An enterprise Android app for clinic patients", ("mobile", "health", "large")),
+    ("A desktop budgeting tool for my family", ("desktop", "fintech", "small")),
+    ("A SaaS marketplace with checkout for thousands of sellers", ("web", "marketplace", "medium")),
+    ("A website where students book tutoring lessons, MVP", ("web", "education", "small")),
+])
+def test_keyword_rules(classifier, idea, profile):
+    result = classifier.classify(idea)
+    assert (result.platform, result.domain, result.scale) == profile
+    assert dict(result.source) == {"platform": "rule", "domain": "rule", "scale": "rule"}
+    assert dict(result.confidence) == {"platform": 1.0, "domain": 1.0, "scale": 1.0}
+
+
+def test_model_decides_without_keywords():
+    labels = {"platform": PLATFORMS, "domain": ("food", "pets", "weather", "other"), "scale": SCALES}
+    classifier = IdeaClassifier(_fit(labels, EXAMPLES, epochs=200))
+    profile = classifier.classify("Share recipes from my kitchen")
+    assert profile.domain == "food"
+    assert profile.source["domain"] == "model"
+    assert 0.5 <= profile.confidence["domain"] < 1.0
+
+
+def test_empty_idea_gets_the_defaults():
+    profile = classify_idea("")
+    assert (profile.platform, profile.domain, profile.scale) == tuple(DEFAULTS.values())
+    assert set(profile.source.values()) == {"default"}
+    assert classify_idea(None) is profile
+
+
+def test_memoized_profiles_are_immutable(classifier):
+    profile = classifier.classify("An iOS habit tracker")
+    assert classifier.classify("An iOS habit tracker") is profile
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        profile.platform = "web"
+    with pytest.raises(TypeError):
+        profile.source["platform"] = "model"
+    exported = profile.to_dict()
+    exported["source"]["platform"] = "model"
+    assert profile.source["platform"] == "rule"
+
+
+def test_profile_inputs_and_scope():
+    profile = IdeaProfile(platform="mobile", domain="travel", scale="large")
+    assert profile.inputs() == {"project_type": "mobile", "project_domain": "travel", "project_scale": "large"}
+    assert IdeaProfile().inputs() == {"project_type": "web", "project_domain": "other", "project_scale": "medium"}
+    assert current_idea_profile() is None
+    with idea_profile_scope(profile):
+        assert current_idea_profile() is profile
+    assert current_idea_profile() is None
+
+
+def test_shipped_model_is_trained_on_the_shipped_examples():
+    with np.load(IDEA_MODEL_PATH) as arrays:
+        assert str(arrays["examples_sha256"]) == _load_examples(IDEA_EXAMPLES_PATH)[2]
@@ -0,0 +1,90 @@
+"""Tests for the retention sweeper's session sizes and evictions."""
+
+import time
+
+import pytest
+
+from prd_generator.catalog import DocumentCatalog
+from prd_generator.content_store import ContentAddressedStorage
+from prd_generator.retention import RetentionSweeper, _tree_size
+from prd_generator.search import SearchIndex
+from prd_generator.sessions import SessionStore
+from prd_generator.storage import BackgroundWriter, LocalStorage
+from prd_generator.warm_start import WarmStartIndex
+
+GUIDE = "# Development Guide\n\n## Setup\n\nInstall the toolchain and run the tests.\n" * 40
+
+LAYOUTS = {
+    # Document storage over the outputs directory the sessions live in
+    "local": lambda tmp_path: LocalStorage(tmp_path / "outputs"),
+    "local+zlib": lambda tmp_path: ContentAddressedStorage(LocalStorage(tmp_path / "outputs"), "zlib"),
+    # Document storage elsewhere, as on a shared volume
+    "shared+zlib": lambda tmp_path: ContentAddressedStorage(LocalStorage(tmp_path / "shared"), "zlib"),
+}
+
+
+@pytest.fixture(params=list(LAYOUTS))
+def layout(request, tmp_path):
+    storage = LAYOUTS[request.param](tmp_path)
+    outputs = tmp_path / "outputs"
+    outputs.mkdir()
+    writer = BackgroundWriter(storage)
+    store = SessionStore(
+        outputs / "sessions",
+        catalog=DocumentCatalog(outputs / "catalog.db"),
+        search_index=SearchIndex(outputs / "search.db"),
+        warm_start=WarmStartIndex(outputs / "runs.db"),
+        writer=writer,
+    )
+    sweeper = RetentionSweeper(
+        store, storage, max_age_days=0, quota_mb=0, session_quota_mb=0, interval=0, traces_dir=tmp_path / "traces"
+    )
+    return sweeper, writer
+
+
+def generate(sweeper: RetentionSweeper, writer: BackgroundWriter, session_id: str) -> None:
+    store = sweeper.session_store
+    store.start(session_id, {"idea_description": "a habit tracker", "pricing_tier": "free"})
+    store.save_task_output(session_id, "prd_task", "# PRD\n\nTrack daily habits.\n" * 40)
+    store.save_task_output(session_id, "guide_task", GUIDE + session_id)
+    writer.write("development_guide.md", f"{GUIDE}{session_id}, latest".encode())    # not part of the session
+    assert writer.flush(10)
+
+
+def test_session_size_is_the_bytes_on_disk(layout, tmp_path):
+    sweeper, writer = layout
+    generate(sweeper, writer, "s1")
+    on_disk = _tree_size(tmp_path / "outputs" / "sessions" / "s1")
+    if (tmp_path / "shared").exists():
+        # Earlier manifests' blobs are garbage, not part of the session
+        sweeper.storage.collect_garbage(min_age=0)
+        sweeper.storage.collect_garbage(min_age=0)
+        on_disk += _tree_size(tmp_path / "shared" / "cas" / "blobs") - sweeper.storage.stored_size("development_guide.md")
+    assert sweeper.session_size("s1") == on_disk
+
+
+def test_compressed_copies_count_their_stored_size(tmp_path):
+    storage = ContentAddressedStorage(LocalStorage(tmp_path / "shared"), "zlib")
+    storage.put("sessions/s1/guide_task.md", GUIDE.encode())
+    store = SessionStore(tmp_path / "sessions", catalog=DocumentCatalog(tmp_path / "catalog.db"))
+    sweeper = RetentionSweeper(store, storage, interval=0, traces_dir=tmp_path / "traces")
+    assert storage.local_path("sessions/s1/guide_task.md") is None
+    assert 0 < sweeper.session_size("s1") == storage.stored_size("sessions/s1/guide_task.md") < len(GUIDE)
+
+
+def test_quota_evicts_the_least_recently_accessed_session(layout):
+    sweeper, writer = layout
+    generate(sweeper, writer, "s-old")
+    generate(sweeper, writer, "s-new")
+    sweeper.catalog.touch("s-new", now=time.time() + 60)
+    sizes = {session_id: sweeper.session_size(session_id) for session_id in ("s-old", "s-new")}
+    sweeper.quota_bytes = sizes["s-new"] + 1
+
+    report = sweeper.sweep()
+    assert report["evicted_sessions"] == {"quota": 1}
+    assert report["freed_bytes"] == sizes["s-old"]
+    assert report["retained"]["bytes"] == sizes["s-new"]
+    assert sweeper.catalog.eviction("s-old")["reason"] == "quota"
+    assert sweeper.storage.list("sessions/s-old/", recursive=True) == []
+    assert not sweeper.session_store.exists("s-old")
+    assert sweeper.session_store.load_task_outputs("s-new")
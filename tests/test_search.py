@@ -0,0 +1,109 @@
+"""Tests for the sharded full-text search index."""
+
+import pytest
+
+from prd_generator import search
+from prd_generator.search import InvalidQueryError, SearchIndex, make_snippet, plain_query
+
+
+def document(number: int) -> str:
+    return f"# Meal planner {number}\n\nUsers plan weekly meals and share a shopping list. Revision {number}.\n"
+
+
+@pytest.fixture
+def index(tmp_path) -> SearchIndex:
+    index = SearchIndex(tmp_path / "search.db", shard_docs=3)
+    for number in range(1, 8):
+        index.index(f"session-{number}", "prd", "prd.md", document(number),
+                    "free" if number % 2 else "premium", updated=1000.0 + number)
+    return index
+
+
+def shards(index: SearchIndex):
+    return [row[0] for row in index._connect().execute("SELECT number FROM shards ORDER BY number")]
+
+
+def sessions(result):
+    return [doc["session_id"] for doc in result["results"]]
+
+
+def test_documents_fill_shards_in_order(index):
+    assert shards(index) == [0, 1, 2]
+    result = index.search("shopping", limit=10)
+    assert sorted(sessions(result)) == [f"session-{number}" for number in range(1, 8)]
+    assert not result["has_more"]
+    assert not result["ranked_recent_only"]
+
+
+def test_title_matches_rank_first_and_ties_go_to_newer_documents(index):
+    index.index("session-9", "stack", "stack.md", "# Stack\n\nThe shopping list syncs offline.\n", "free", 2000.0)
+    index.index("session-8", "stack", "stack.md", "# Shopping list\n\nSyncs offline.\n", "free", 2001.0)
+    assert sessions(index.search("shopping", limit=1)) == ["session-8"]
+    assert sessions(index.search("meal planner", limit=2)) == ["session-7", "session-6"]
+
+
+def test_ranking_is_limited_to_the_newest_matches(index, monkeypatch):
+    monkeypatch.setattr(search, "RANK_WINDOW", 4)
+    result = index.search("shopping", limit=10)
+    assert sorted(sessions(result)) == ["session-4", "session-5", "session-6", "session-7"]
+    assert result["ranked_recent_only"]
+
+    monkeypatch.setattr(search, "RANK_WINDOW", 7)
+    assert not index.search("shopping", limit=10)["ranked_recent_only"]
+
+
+def test_pages_do_not_overlap(index):
+    first = index.search("shopping", limit=4)
+    second = index.search("shopping", limit=4, offset=4)
+    assert first["has_more"] and not second["has_more"]
+    assert len(set(sessions(first)) | set(sessions(second))) == 7
+
+
+def test_session_and_tier_filters(index):
+    assert sessions(index.search("shopping", session_id="session-3")) == ["session-3"]
+    assert sorted(sessions(index.search("shopping", pricing_tier="premium"))) == ["session-2", "session-4", "session-6"]
+    assert sessions(index.search("shopping", session_id="session-3", pricing_tier="premium")) == []
+
+
+def test_tier_filter_applies_before_the_rank_window(tmp_path, monkeypatch):
+    monkeypatch.setattr(search, "RANK_WINDOW", 10)
+    index = SearchIndex(tmp_path / "search.db", shard_docs=8)
+    for number in range(40):
+        index.index(f"session-{number}", "prd", "prd.md", document(number),
+                    "free" if number < 5 else "premium", updated=1000.0 + number)
+    result = index.search("shopping", pricing_tier="free", limit=10)
+    assert sorted(sessions(result)) == [f"session-{number}" for number in range(5)]
+    assert not result["ranked_recent_only"]
+    assert index.search("shopping", pricing_tier="premium", limit=10)["ranked_recent_only"]
+
+
+def test_reindexed_document_replaces_its_old_content(index):
+    index.index("session-1", "prd", "prd.md", "# Fitness tracker\n\nUsers log workouts.\n", "free", 3000.0)
+    assert sessions(index.search("workouts")) == ["session-1"]
+    assert "session-1" not in sessions(index.search("shopping", limit=10))
+    assert shards(index) == [0, 1, 2]
+
+
+def test_removed_session_drops_its_documents_and_empty_old_shards(index):
+    for number in (1, 2, 3):
+        index.remove_session(f"session-{number}")
+    assert shards(index) == [1, 2]
+    index.remove_session("session-7")
+    assert shards(index) == [1, 2]
+    assert sorted(sessions(index.search("shopping", limit=10))) == ["session-4", "session-5", "session-6"]
+
+
+def test_result_has_title_and_highlighted_snippet(index):
+    result = index.search("lists", session_id="session-2")["results"][0]
+    assert result["title"] == "Meal planner 2"
+    assert "<mark>list</mark>" in result["snippet"]
+    assert result["pricing_tier"] == "premium"
+    assert make_snippet("Nothing to see", []) == "Nothing to see"
+
+
+def test_unparseable_query_falls_back_to_its_words(index):
+    assert plain_query('shopping AND "list') == '"shopping" AND "AND" AND "list"'
+    assert sessions(index.search('shopping "list', session_id="session-5")) == ["session-5"]
+    for query in ("", "   ", "!!!", "*"):
+        with pytest.raises(InvalidQueryError):
+            index.search(query)
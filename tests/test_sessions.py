@@ -0,0 +1,50 @@
+"""Tests for per-session storage of task outputs."""
+
+import pytest
+
+from prd_generator.catalog import DocumentCatalog
+from prd_generator.search import SearchIndex
+from prd_generator.sessions import InvalidSessionError, SessionStore
+from prd_generator.storage import BackgroundWriter, LocalStorage, SqliteBlobStorage
+from prd_generator.warm_start import WarmStartIndex
+
+
+def make_store(directory, writer=None) -> SessionStore:
+    directory.mkdir(parents=True, exist_ok=True)
+    return SessionStore(
+        directory / "sessions",
+        catalog=DocumentCatalog(directory / "catalog.db"),
+        search_index=SearchIndex(directory / "search.db"),
+        warm_start=WarmStartIndex(directory / "runs.db"),
+        writer=writer,
+    )
+
+
+def test_sessions_are_fetched_from_document_storage(tmp_path):
+    writer = BackgroundWriter(SqliteBlobStorage(tmp_path / "shared.db"))
+    replica_a, replica_b = make_store(tmp_path / "a", writer), make_store(tmp_path / "b", writer)
+    replica_a.start("s1", {"idea_description": "a recipe app", "pricing_tier": "free"})
+    replica_a.save_task_output("s1", "prd_task", "# PRD\n", input_hash="h1")
+    replica_a.save_task_output("s1", "summary_task", "# Summary\n", input_hash="h2")
+    assert writer.flush(10)
+
+    assert not (tmp_path / "b" / "sessions" / "s1").exists()
+    assert replica_b.exists("s1")
+    assert replica_b.load_task_records("s1") == replica_a.load_task_records("s1")
+    assert replica_b.load_task_outputs("s1") == {"prd_task": "# PRD\n", "summary_task": "# Summary\n"}
+    assert not replica_b.exists("s2")
+
+
+def test_session_files_are_not_published_onto_themselves(tmp_path):
+    writer = BackgroundWriter(LocalStorage(tmp_path / "outputs"))
+    store = make_store(tmp_path / "outputs", writer)
+    store.save_task_output("s1", "prd_task", "# PRD\n")
+    assert writer.flush(10)
+    assert writer.stats()["written"] == 0
+    assert store.load_task_outputs("s1") == {"prd_task": "# PRD\n"}
+
+
+@pytest.mark.parametrize("session_id", ["", "..", "a/b", "x" * 129])
+def test_invalid_session_ids_are_rejected(tmp_path, session_id):
+    with pytest.raises(InvalidSessionError):
+        make_store(tmp_path).exists(session_id)
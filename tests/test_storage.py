@@ -0,0 +1,176 @@
+"""Tests for the document storage backends and the background writer."""
+
+import socket
+import threading
+import uuid
+
+import pytest
+
+from prd_generator import storage
+from prd_generator.content_store import ContentAddressedStorage
+from prd_generator.storage import (
+    BackgroundWriter,
+    DocumentNotFoundError,
+    LocalStorage,
+    SqliteBlobStorage,
+    check_key,
+    create_storage,
+)
+
+BACKENDS = ["local", "sqlite", "s3"]
+
+
+@pytest.fixture(scope="module")
+def standin_url(tmp_path_factory):
+    pytest.importorskip("boto3")
+    from prd_generator.storage_standin import serve_in_thread
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server, thread = serve_in_thread(tmp_path_factory.mktemp("s3"), port=port)
+    with pytest.MonkeyPatch.context() as env:
+        for name, value in (("AWS_ACCESS_KEY_ID", "standin"), ("AWS_SECRET_ACCESS_KEY", "standin"),
+                            ("AWS_DEFAULT_REGION", "us-east-1")):
+            env.setenv(name, value)
+        yield f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join(10)
+
+
+def s3_storage(url: str, bucket: str, create: bool = True) -> storage.S3Storage:
+    store = storage.S3Storage(bucket=bucket, endpoint_url=url, prefix="")
+    if create:
+        store.client.create_bucket(Bucket=bucket)
+    return store
+
+
+@pytest.fixture(params=BACKENDS)
+def store(request, tmp_path) -> storage.DocumentStorage:
+    if request.param == "local":
+        return LocalStorage(tmp_path)
+    if request.param == "sqlite":
+        return SqliteBlobStorage(tmp_path / "documents.db")
+    return s3_storage(request.getfixturevalue("standin_url"), f"test-{uuid.uuid4().hex[:12]}")
+
+
+def keys(objects):
+    return [obj.key for obj in objects]
+
+
+def test_put_get_stat_list_delete(store):
+    store.put("prd.md", b"latest")
+    store.put("sessions/s1/prd_task.md", b"# PRD\n")
+    store.put("sessions/s1/manifest.json", b"{}")
+    store.put("sessions/s1/profiles/job.txt", b"profile")
+    store.put("prd.md", b"# Latest PRD\n")
+
+    assert store.get("prd.md") == b"# Latest PRD\n"
+    stat = store.stat("sessions/s1/prd_task.md")
+    assert (stat.key, stat.size) == ("sessions/s1/prd_task.md", 6)
+    assert stat.modified > 0
+    assert store.stat("sessions/s1/missing.md") is None
+
+    assert keys(store.list()) == ["prd.md"]
+    assert keys(store.list("sessions/s1/")) == ["sessions/s1/manifest.json", "sessions/s1/prd_task.md"]
+    assert keys(store.list("sessions/", recursive=True)) == [
+        "sessions/s1/manifest.json", "sessions/s1/prd_task.md", "sessions/s1/profiles/job.txt",
+    ]
+    assert store.list("sessions/s2/") == []
+
+    store.delete("sessions/s1/prd_task.md")
+    store.delete("sessions/s1/prd_task.md")
+    assert store.stat("sessions/s1/prd_task.md") is None
+    with pytest.raises(DocumentNotFoundError):
+        store.get("sessions/s1/prd_task.md")
+    assert keys(store.list("sessions/s1/")) == ["sessions/s1/manifest.json"]
+
+
+@pytest.mark.parametrize("key", ["", "/etc/passwd", "../outside.md", "sessions/../../x", "a//b", "a/./b", "dir/"])
+def test_invalid_keys_are_rejected(store, key):
+    with pytest.raises(ValueError):
+        check_key(key)
+    with pytest.raises(ValueError):
+        store.put(key, b"data")
+
+
+def test_auto_compression_leaves_local_documents_plain():
+    assert isinstance(create_storage("local", "auto"), LocalStorage)
+    assert isinstance(create_storage("local", "zlib"), ContentAddressedStorage)
+    assert isinstance(create_storage("sqlite", "auto"), ContentAddressedStorage)
+    assert isinstance(create_storage("sqlite", "none"), SqliteBlobStorage)
+
+
+def test_s3_put_into_a_missing_bucket_fails(standin_url):
+    from botocore.exceptions import ClientError
+
+    store = s3_storage(standin_url, "never-created", create=False)
+    with pytest.raises(ClientError) as excinfo:
+        store.put("prd.md", b"data")
+    assert excinfo.value.response["Error"]["Code"] == "NoSuchBucket"
+
+
+class FlakyStorage(LocalStorage):
+    """Local storage whose puts fail a number of times, or wait until released."""
+
+    def __init__(self, root, failures: int = 0):
+        super().__init__(root)
+        self.failures = failures
+        self.attempts = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def put(self, key: str, data: bytes) -> None:
+        self.release.wait()
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise OSError("storage unavailable")
+        super().put(key, data)
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(storage.time, "sleep", lambda seconds: None)
+
+
+def test_writer_retries_failed_writes(tmp_path, no_backoff):
+    flaky = FlakyStorage(tmp_path, failures=2)
+    writer = BackgroundWriter(flaky)
+    writer.write("prd.md", b"# PRD\n")
+    assert writer.flush(10)
+    assert flaky.get("prd.md") == b"# PRD\n"
+    assert flaky.attempts == 3
+    assert writer.stats() == {"pending": 0, "written": 1, "failed": 0}
+
+
+def test_writer_gives_up_after_its_attempts(tmp_path, no_backoff):
+    flaky = FlakyStorage(tmp_path, failures=3)
+    writer = BackgroundWriter(flaky, attempts=3)
+    writer.write("prd.md", b"lost")
+    writer.write("stack.md", b"# Stack\n")
+    assert writer.flush(10)
+    assert flaky.stat("prd.md") is None
+    assert flaky.get("stack.md") == b"# Stack\n"
+    assert writer.stats() == {"pending": 0, "written": 1, "failed": 1}
+
+
+def test_flush_waits_for_queued_writes(tmp_path):
+    flaky = FlakyStorage(tmp_path)
+    flaky.release.clear()
+    writer = BackgroundWriter(flaky)
+    writer.write("prd.md", b"first")
+    writer.write("prd.md", b"second")
+    assert not writer.flush(0.1)
+    assert writer.stats()["pending"] == 2
+
+    flaky.release.set()
+    assert writer.flush(10)
+    assert flaky.get("prd.md") == b"second"
+    assert writer.stats()["pending"] == 0
+
+
+def test_writer_rejects_invalid_keys_up_front(tmp_path):
+    writer = BackgroundWriter(LocalStorage(tmp_path))
+    with pytest.raises(ValueError):
+        writer.write("../prd.md", b"data")
+    assert writer.stats()["pending"] == 0
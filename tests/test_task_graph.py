@@ -0,0 +1,110 @@
+"""Tests for the task dependency graph."""
+
+import pytest
+
+from prd_generator.task_graph import TaskGraph, UnknownDocumentError, hash_text, interpolate
+
+INPUTS = {"idea": "A recipe app", "tier": "free", "selected": ["react", "django"]}
+
+TASKS = {
+    "analyze": {"description": "Analyze {idea}", "expected_output": "Analysis"},
+    "prd": {"description": "PRD for {idea}", "context": ["analyze"], "document": "prd.md"},
+    "stack": {
+        "description": "Stack for tier {tier} with {selected}",
+        "context": ["prd"],
+        "document": "stack.md",
+    },
+    "summary": {"description": "Summary of {idea}", "document": "summary.md"},
+}
+
+
+@pytest.fixture
+def graph() -> TaskGraph:
+    return TaskGraph(TASKS)
+
+
+def test_plan_runs_targets_and_their_upstream_tasks(graph):
+    assert graph.plan(["stack.md"]) == (["analyze", "prd", "stack"], [])
+
+
+def test_plan_reuses_cached_upstream_tasks(graph):
+    assert graph.plan(["stack.md"], cached=["analyze"]) == (["prd", "stack"], ["analyze"])
+    assert graph.plan(["stack.md"], cached=["prd", "analyze"]) == (["stack"], ["prd"])
+
+
+def test_plan_can_reuse_cached_targets(graph):
+    assert graph.plan(["prd.md", "summary.md"], cached=["prd"], regenerate_targets=False) == (["summary"], ["prd"])
+
+
+def test_plan_without_documents_runs_everything(graph):
+    assert graph.plan() == (list(TASKS), [])
+
+
+def test_unknown_document_and_context_are_rejected(graph):
+    with pytest.raises(UnknownDocumentError):
+        graph.plan(["missing.md"])
+    with pytest.raises(ValueError):
+        TaskGraph({"a": {"description": "x", "context": ["nope"]}})
+
+
+def test_documents_map_to_tasks(graph):
+    assert graph.task_for_document("outputs/stack.md") == "stack"
+    assert graph.document_for_task("prd") == "prd.md"
+    assert graph.document_for_task("analyze") is None
+
+
+def test_shipped_tasks_config_loads():
+    graph = TaskGraph.from_yaml()
+    for document, task_name in graph.documents.items():
+        assert graph.task_for_document(document) == task_name
+
+
+def records_for(graph: TaskGraph, inputs, outputs=None):
+    """Records of a run of every task with the given inputs."""
+    outputs = outputs or {}
+    records, output_hashes = {}, {}
+    for name in graph.order:
+        output_hashes[name] = hash_text(outputs.get(name, f"{name} output"))
+        records[name] = {
+            "input_hash": graph.input_hash(name, inputs, output_hashes),
+            "output_hash": output_hashes[name],
+        }
+    return records
+
+
+def test_interpolate_is_canonical_and_keeps_unknown_placeholders():
+    assert interpolate("{a} {b} {missing}", {"a": {"y": 1, "x": 2}, "b": 3}) == '{"x": 2, "y": 1} 3 {missing}'
+    assert interpolate(None, {}) == ""
+
+
+def test_input_hash_ignores_key_order_and_covers_upstream_outputs(graph):
+    reordered = {"selected": INPUTS["selected"], "tier": "free", "idea": "A recipe app"}
+    hashes = {"prd": hash_text("prd output")}
+    assert graph.input_hash("stack", INPUTS, hashes) == graph.input_hash("stack", reordered, hashes)
+    assert graph.input_hash("stack", INPUTS, hashes) != graph.input_hash("stack", INPUTS, {"prd": hash_text("other")})
+
+
+def test_unchanged_inputs_keep_every_task_fresh(graph):
+    assert graph.fresh_tasks(INPUTS, records_for(graph, INPUTS)) == set(TASKS)
+
+
+def test_changed_input_makes_only_its_tasks_stale(graph):
+    records = records_for(graph, INPUTS)
+    assert graph.fresh_tasks({**INPUTS, "tier": "premium"}, records) == {"analyze", "prd", "summary"}
+    assert graph.fresh_tasks({**INPUTS, "selected": ["vue"]}, records) == {"analyze", "prd", "summary"}
+    assert graph.fresh_tasks({**INPUTS, "idea": "A chess app"}, records) == set()
+
+
+def test_changed_upstream_output_makes_dependents_stale(graph):
+    records = records_for(graph, INPUTS)
+    records["prd"] = records_for(graph, INPUTS, {"prd": "rewritten prd"})["prd"]
+    assert graph.fresh_tasks(INPUTS, records) == {"analyze", "prd", "summary"}
+
+
+def test_missing_record_makes_task_and_dependents_stale(graph):
+    records = records_for(graph, INPUTS)
+    del records["analyze"]
+    assert graph.fresh_tasks(INPUTS, records) == {"summary"}
+    records = records_for(graph, INPUTS)
+    records["prd"] = {"input_hash": records["prd"]["input_hash"]}
+    assert graph.fresh_tasks(INPUTS, records) == {"analyze", "summary"}
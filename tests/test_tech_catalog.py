@@ -0,0 +1,121 @@
+"""Tests for tech stack ranking from the technology catalog."""
+
+import copy
+
+import pytest
+
+from prd_generator.tech_catalog import CatalogError, TechCatalog, normalize_platform, normalize_scale
+
+CATALOG = {
+    "version": 1,
+    "categories": {
+        "backend": {"section": "Backend Technologies", "label": "Backend Framework"},
+        "frontend": {"section": "Frontend Technologies", "label": "Web Framework"},
+        "mobile": {"section": "Frontend Technologies", "label": "Mobile Framework"},
+        "database": {"section": "Database Solutions", "label": "Primary Database"},
+    },
+    "technologies": [
+        {"id": "express", "name": "Express", "category": "backend", "tier": "free",
+         "languages": ["javascript"], "weight": 0.8, "aliases": ["nodejs"]},
+        {"id": "fastapi", "name": "FastAPI", "category": "backend", "tier": "free",
+         "languages": ["python"], "weight": 0.85, "aliases": ["python"]},
+        {"id": "react", "name": "React", "category": "frontend", "tier": "free", "platforms": ["web"],
+         "languages": ["javascript"], "weight": 0.8},
+        {"id": "htmx", "name": "htmx", "category": "frontend", "tier": "free", "platforms": ["web"],
+         "scales": ["small", "medium"], "languages": ["python"], "weight": 0.65},
+        {"id": "flutter", "name": "Flutter", "category": "mobile", "tier": "free", "platforms": ["mobile"],
+         "weight": 0.8},
+        {"id": "postgres", "name": "PostgreSQL", "category": "database", "tier": "free",
+         "weight": 0.7, "pairs_with": ["express", "fastapi"]},
+        {"id": "sqlite", "name": "SQLite", "category": "database", "tier": "free", "scales": ["small"],
+         "weight": 0.6},
+        {"id": "clouddb", "name": "CloudDB", "category": "database", "tier": "paid", "weight": 1.5},
+    ],
+}
+
+
+@pytest.fixture
+def catalog() -> TechCatalog:
+    return TechCatalog(CATALOG)
+
+
+def picks(catalog: TechCatalog, *args, **kwargs):
+    return {pick.category: (pick.chosen, pick.alternatives) for pick in catalog.recommend(*args, **kwargs)}
+
+
+def test_normalization():
+    assert normalize_scale("MVP") == "small"
+    assert normalize_scale(" Enterprise ") == "large"
+    assert normalize_scale("") == normalize_scale("unheard of") == "medium"
+    assert normalize_platform("iOS") == "mobile"
+    assert normalize_platform("desktop") == "desktop"
+    assert normalize_platform(None) == normalize_platform("smart fridge") == "web"
+
+
+def test_stack_follows_the_languages_of_earlier_picks(catalog):
+    assert picks(catalog, "web", "medium") == {
+        "backend": (("FastAPI",), ("Express",)),
+        "frontend": (("htmx",), ("React",)),
+        "database": (("CloudDB",), ("PostgreSQL",)),
+    }
+
+
+def test_pick_is_limited_to_platform_scale_and_tier(catalog):
+    result = picks(catalog, "android", "enterprise", pricing_tier="free")
+    assert "frontend" not in result
+    assert result["mobile"] == (("Flutter",), ())
+    assert result["database"] == (("PostgreSQL",), ())
+    assert picks(catalog, "web", "small", pricing_tier="free")["database"] == (("PostgreSQL",), ("SQLite",))
+
+
+def test_selected_technologies_are_pinned(catalog):
+    result = picks(catalog, "web", "medium", selected_technologies={"backend": "NodeJS", "extra": 3, "db": "oracle"})
+    assert result["backend"] == (("Express",), ("FastAPI",))
+    assert result["frontend"] == (("React",), ("htmx",))
+
+
+def test_compatible_technologies_win_close_calls(catalog):
+    data = copy.deepcopy(CATALOG)
+    data["technologies"][-1]["weight"] = 0.95
+    assert picks(TechCatalog(data), "web")["database"] == (("PostgreSQL",), ("CloudDB",))
+
+
+def test_rankings_are_memoized_on_normalized_arguments(catalog):
+    assert catalog.recommend("website", "MVP") is catalog.recommend("web", "small")
+    assert catalog.recommend("web", "small") is not catalog.recommend("web", "small", pricing_tier="free")
+
+
+@pytest.mark.parametrize("change", [
+    lambda data: data.update(version=2),
+    lambda data: data["technologies"][0].update(category="frontend_backend"),
+    lambda data: data["technologies"][0].update(tier="enterprise"),
+    lambda data: data["technologies"][0].update(scales=["huge"]),
+    lambda data: data["technologies"][0].update(pairs_with=["cobol"]),
+    lambda data: data["technologies"].append(dict(data["technologies"][0])),
+])
+def test_invalid_catalogs_are_rejected(change):
+    data = copy.deepcopy(CATALOG)
+    change(data)
+    with pytest.raises(CatalogError):
+        TechCatalog(data)
+
+
+def test_shipped_catalog_covers_every_platform():
+    catalog = TechCatalog.from_file()
+    for project_type, category in (("web", "frontend"), ("mobile", "mobile"), ("desktop", "desktop")):
+        for pricing_tier in ("free", "premium"):
+            result = picks(catalog, project_type, "medium", pricing_tier=pricing_tier)
+            assert result[category][0]
+            assert result["backend"][0] or result["backend_service"][0]
+
+
+def test_free_tier_advisor_ranks_free_technologies():
+    from prd_generator.tools.prd_tools import TechStackAdvisor
+
+    catalog = TechCatalog.from_file()
+    paid = {name for name, free in zip(catalog.names, catalog.free) if not free}
+    text = TechStackAdvisor()._run("web", {"pricing_tier": "free", "selected_technologies": {"hosting": "render"}}, "large")
+    assert "(Free Tier Only)" in text
+    assert "**Hosting:**\n- Render (recommended)" in text
+    assert "### Hosting Platform\n- **Selected:** Render" in text
+    assert not [name for name in paid if name in text]